@@ -1,16 +1,29 @@
 # Imports
-from flask import Flask, render_template, redirect, jsonify
+from flask import Flask, render_template, redirect, jsonify, request, g, Response
 from flask_bootstrap import Bootstrap5
 from flask_wtf import FlaskForm
-from wtforms import SubmitField, TextAreaField
-from wtforms.validators import DataRequired
-from threading import Thread
-from os import urandom
+from wtforms import SubmitField, TextAreaField, SelectField, SelectMultipleField, BooleanField, IntegerField, \
+    FloatField
+from wtforms.validators import DataRequired, NumberRange, Optional, ValidationError
+from threading import Lock, Thread, active_count
+from os import getpid, urandom, environ
+from time import perf_counter
 from atexit import register
 
 from utils.benchmark import benchmark_async
+from utils.engine import BenchmarkConfig, DEFAULT_EXECUTOR
+from utils.sandbox import APP_USER, drop_privileges, get_sandbox_pool
+from utils.scaling import MAX_SCALING_WORKERS
+from utils.params_cache import get_params_cache
+from utils.jobs import JobError, QueueFull, authorized, get_job_scheduler
+from utils.interpreters import INTERPRETERS
+from utils.runner import describe_interpreter
+from utils.counters import COUNTER_LABELS, summarize_counters
 from utils.html_utils import get_html
-from utils.ai_utils import generate_ai_feedback_async, warmup_ollama, clear_cache
+from utils.ai_utils import generate_ai_feedback_async, cancel_ai_feedback, warmup_ollama, clear_cache, cache_size, \
+    ping_ollama, ollama_manager
+from utils.metrics import registry, http_request_seconds
+from utils.tracing import NULL_TRACER, Tracer
 from utils.flask_utils import *
 
 # Flask App Config
@@ -18,38 +31,139 @@ app = Flask(__name__)
 app.config['SECRET_KEY'] = urandom(32)
 bootstrap = Bootstrap5(app)
 
-first_request = True
+# Thread switch interval (seconds) used when quiet measurement is requested
+QUIET_SWITCH_INTERVAL = 0.05
 
 # Code Form
 class CodeForm(FlaskForm):
     program1 = TextAreaField("Function 1", validators=[DataRequired()])
     program2 = TextAreaField("Function 2", validators=[DataRequired()])
     params = TextAreaField('Enter Parameters for your Functions', validators=[DataRequired()])
+    input_mode = SelectField("Input Handling", choices=[
+        ("copy", "Fresh copy per call"),
+        ("shared", "Shared between calls"),
+        ("factory", "Factory per call (params entries are callables)")
+    ], default="copy")
+    detect_mutation = BooleanField("Detect input mutation")
+    params_seed = IntegerField("Random Seed for Parameters", validators=[Optional()])
+    cache_params = BooleanField("Reuse previously built parameters (seeded parameters only)", default=True)
+    repeats = IntegerField("Timed Runs per Test", default=1, validators=[NumberRange(min=1, max=100)])
+    warmup = IntegerField("Warmup Runs per Test", default=0, validators=[NumberRange(min=0, max=100)])
+    timer = SelectField("Timer", choices=[
+        ("perf_counter_ns", "Wall clock (perf_counter)"),
+        ("process_time", "Process CPU time"),
+        ("thread_time", "Thread CPU time")
+    ], default="perf_counter_ns")
+    gc_mode = SelectField("Garbage Collection", choices=[
+        ("disabled", "Collected between tests, off while timing"),
+        ("inclusive", "GC-inclusive (realistic)")
+    ], default="disabled")
+    quiet_threads = BooleanField("Reduce thread switching while timing")
+    counters = BooleanField("Record CPU time and hardware counters")
+    verify = BooleanField("Verify both functions compute the same result")
+    subtract_floor = BooleanField("Subtract measured harness overhead from timings")
+    # Running in the web process is only offered when the server itself runs benchmarks inline
+    executor = SelectField("Execution", choices=[
+        ("inline", "In the web process"),
+        ("sandbox", "Sandboxed worker process")
+    ] if DEFAULT_EXECUTOR == "inline" else [("sandbox", "Sandboxed worker process")], default=DEFAULT_EXECUTOR)
+    compare_interpreters = SelectMultipleField("Also run on", choices=[
+        (name, name) for name in INTERPRETERS
+    ])
+    scaling_workers = IntegerField("Concurrency Scaling up to N Workers (0 = off)", default=0,
+                                   validators=[NumberRange(min=0, max=MAX_SCALING_WORKERS)])
+    scaling_duration = FloatField("Seconds per Worker Count", default=0.5, validators=[NumberRange(min=0.1, max=10)])
     submit = SubmitField("Evaluate")
 
+    def validate_compare_interpreters(self, field):
+        if field.data and self.executor.data == "sandbox":
+            raise ValidationError("Other interpreters cannot run in the sandbox; choose in-process execution")
+
 # Initialize AI system on startup
 def init_ai_system():
     """Initialize AI system with warmup and optimizations"""
     print("🚀 Initializing AI system...")
     try:
-        # Warm up Ollama in a separate thread to avoid blocking startup
-        warmup_thread = Thread(target=warmup_ollama)
-        warmup_thread.daemon = True
-        warmup_thread.start()
+        # Preload runs on the AI event loop, so startup is not blocked
+        warmup_ollama()
         print("✅ AI system initialization started")
     except Exception as e:
         print(f"⚠️ AI system initialization failed: {e}")
 
+# Process the AI system was started in; forked servers such as gunicorn workers start their own
+_ai_system_pid = None
+_ai_system_lock = Lock()
+
+def ensure_ai_system():
+    """Initialize the AI system once in the process serving requests"""
+    global _ai_system_pid
+    with _ai_system_lock:
+        if _ai_system_pid == getpid():
+            return
+        _ai_system_pid = getpid()
+    init_ai_system()
+
+# Fork sandbox workers ahead of the first sandboxed run. The fork server starts before
+# the web process gives up root, so it can still switch every worker to the sandbox user.
+# This runs in the process serving requests: the development server below runs without
+# the reloader, whose child would re-import this module after the switch
+if DEFAULT_EXECUTOR == "sandbox" or APP_USER:
+    get_sandbox_pool().start()
+drop_privileges(APP_USER)
+
 # Cleanup function for app shutdown
 def cleanup_on_exit():
     """Clean up resources on app shutdown"""
     print("🧹 Cleaning up AI resources...")
     clear_cache()
     cleanup_old_sessions()
+    get_sandbox_pool().close()
 
 # Register cleanup function
 register(cleanup_on_exit)
 
+# Gauges computed when /metrics is scraped
+def session_memory_stats():
+    sizes = get_session_memory()
+    return {
+        ("total",): sum(sizes),
+        ("max",): max(sizes, default=0),
+        ("mean",): sum(sizes) / len(sizes) if sizes else 0
+    }
+
+registry.gauge("benchmarker_active_threads", "Live threads in the app process",
+               callback=lambda: {(): active_count()})
+registry.gauge("benchmarker_sessions", "Users with stored results",
+               callback=lambda: {(): len(user_data)})
+registry.gauge("benchmarker_session_memory_bytes", "Approximate memory held by stored user data", ("stat",),
+               callback=session_memory_stats)
+registry.gauge("benchmarker_llm_cache_entries", "Cached AI responses",
+               callback=lambda: {(): cache_size()})
+registry.gauge("benchmarker_params_cache_bytes", "Disk used by cached parameter sets",
+               callback=lambda: {(): get_params_cache().stats()["bytes"]})
+registry.gauge("benchmarker_jobs", "API jobs held by the scheduler", ("status",),
+               callback=lambda: {(status,): count for status, count in get_job_scheduler().counts().items()})
+registry.gauge("benchmarker_llm_in_flight", "Ollama generations in progress",
+               callback=lambda: {(): ollama_manager.get_stats()["in_flight"]})
+
+# Preload the model on the first request, under the development server or any WSGI server
+@app.before_request
+def initialize_app():
+    ensure_ai_system()
+
+# Per-route request latency
+@app.before_request
+def start_request_timer():
+    g.request_start = perf_counter()
+
+@app.after_request
+def record_request_latency(response):
+    if "request_start" in g:
+        route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+        http_request_seconds.observe(perf_counter() - g.request_start, method=request.method, route=route,
+                                     status=str(response.status_code))
+    return response
+
 # Homepage Route
 @app.route("/")
 def homepage():
@@ -61,20 +175,46 @@ def benchmark():
     user_id = get_user_id()
     
     program = CodeForm()
-    if program.validate_on_submit():
+    tracer = Tracer(f"benchmark for {user_id}")
+    with tracer.span("validate form", "web"):
+        valid = program.validate_on_submit()
+    if valid:
         program1 = program.program1.data
         program2 = program.program2.data
         params = program.params.data
+        config = BenchmarkConfig(
+            repeats=program.repeats.data,
+            warmup=program.warmup.data,
+            timer=program.timer.data,
+            input_mode=program.input_mode.data,
+            detect_mutation=program.detect_mutation.data,
+            params_seed=program.params_seed.data,
+            cache_params=program.cache_params.data,
+            gc_mode=program.gc_mode.data,
+            switch_interval=QUIET_SWITCH_INTERVAL if program.quiet_threads.data else None,
+            counters=program.counters.data,
+            verify=program.verify.data,
+            subtract_floor=program.subtract_floor.data,
+            executor=program.executor.data if DEFAULT_EXECUTOR == "inline" else DEFAULT_EXECUTOR,
+            compare_interpreters=program.compare_interpreters.data or (),
+            scaling_workers=program.scaling_workers.data,
+            scaling_duration=program.scaling_duration.data
+        )
 
         # Updating Parameters
         if params.strip() == "": params = "[i for i in range(10)]"
         else: params = params.strip()
 
+        # A new submission supersedes any feedback still being generated
+        cancel_ai_feedback(user_id)
+
         # Initialize benchmark status
-        update_user_benchmark_status(user_id, "pending", 0, None, program1, program2, params)
+        update_user_benchmark_status(user_id, "pending", 0, None, program1, program2, params, config.to_dict())
+        user_traces[user_id] = tracer
+        tracer.instant("submitted", "web")
         
         # Start benchmark in background thread
-        benchmark_thread = Thread(target=benchmark_async, args=(user_id, program1, program2, params, user_data, user_benchmark_status))
+        benchmark_thread = Thread(target=benchmark_async, args=(user_id, program1, program2, params, user_data, user_benchmark_status, config, tracer))
         benchmark_thread.daemon = True
         benchmark_thread.start()
         
@@ -114,15 +254,13 @@ def chart():
     
     # Check if AI feedback is still being generated and start if needed
     ai_status = get_user_ai_status(user_id)
-    if not ai_status or ai_status.get("status") in ["pending", "not_started"]:
+    if not ai_status or ai_status.get("status") in ["pending", "not_started", "cancelled"]:
         # Initialize AI status if not exists
         if user_id not in user_ai_status:
             user_ai_status[user_id] = {"status": "pending", "progress": 0, "error": None}
         
-        # Start AI feedback generation in background
-        ai_thread = Thread(target=generate_ai_feedback_async, args=(user_id, user_data, user_ai_status))
-        ai_thread.daemon = True
-        ai_thread.start()
+        # Start AI feedback generation on the AI event loop
+        generate_ai_feedback_async(user_id, user_data, user_ai_status, user_traces.get(user_id, NULL_TRACER))
         print(f"Started AI feedback generation for user {user_id}")
     
     return render_template("chart.html",
@@ -136,7 +274,22 @@ def chart():
                         ai_feedback2=ai_feedback2_html,
                         comparative_feedback=comparative_feedback_html,
                         program1_code=result.get("Program1Code", ""),
-                        program2_code=result.get("Program2Code", "")
+                        program2_code=result.get("Program2Code", ""),
+                        func1_mutated=result.get("Func1Mutated", []),
+                        func2_mutated=result.get("Func2Mutated", []),
+                        counters1=summarize_counters(result.get("Func1Counters", [])),
+                        counters2=summarize_counters(result.get("Func2Counters", [])),
+                        counter_labels=COUNTER_LABELS,
+                        gc1=sum(result.get("Func1GCCollections", [])),
+                        gc2=sum(result.get("Func2GCCollections", [])),
+                        floor=result.get("HarnessFloor"),
+                        floor_subtracted=result.get("Config", {}).get("subtract_floor", False),
+                        near_floor1=result.get("Func1NearFloor", []),
+                        near_floor2=result.get("Func2NearFloor", []),
+                        scaling1=result.get("Func1Scaling", []),
+                        scaling2=result.get("Func2Scaling", []),
+                        interpreters=result.get("Interpreters", []),
+                        local_interpreter=describe_interpreter()
                         )
 
 # API Routes for benchmark status
@@ -168,14 +321,17 @@ def restart_benchmark():
     program1 = benchmark_status.get("program1", "")
     program2 = benchmark_status.get("program2", "")
     params = benchmark_status.get("params", "")
+    config = BenchmarkConfig.from_dict(benchmark_status.get("config"))
     
     if not all([program1, program2, params]):
         return jsonify({"error": "No previous benchmark data found"}), 400
     
     # Reset status and start new benchmark
-    update_user_benchmark_status(user_id, "pending", 0, None, program1, program2, params)
+    update_user_benchmark_status(user_id, "pending", 0, None, program1, program2, params, config.to_dict())
+    tracer = user_traces[user_id] = Tracer(f"benchmark restart for {user_id}")
+    tracer.instant("submitted", "web")
     
-    benchmark_thread = Thread(target=benchmark_async, args=(user_id, program1, program2, params, user_data, user_benchmark_status))
+    benchmark_thread = Thread(target=benchmark_async, args=(user_id, program1, program2, params, user_data, user_benchmark_status, config, tracer))
     benchmark_thread.daemon = True
     benchmark_thread.start()
     
@@ -233,12 +389,94 @@ def refresh_feedback():
     })
     
     # Start new AI feedback generation
-    ai_thread = Thread(target=generate_ai_feedback_async, args=(user_id, user_data, user_ai_status))
-    ai_thread.daemon = True
-    ai_thread.start()
+    generate_ai_feedback_async(user_id, user_data, user_ai_status, user_traces.get(user_id, NULL_TRACER))
     
     return jsonify({"message": "AI feedback refresh started"})
 
+@app.route("/api/feedback/cancel", methods=['POST'])
+def cancel_feedback():
+    """API endpoint to cancel in-flight AI feedback, e.g. when the user leaves the page"""
+    user_id = get_user_id()
+    if cancel_ai_feedback(user_id):
+        return jsonify({"message": "AI feedback generation cancelled"})
+    return jsonify({"message": "No AI feedback generation in progress"})
+
+@app.route("/api/trace")
+def api_trace():
+    """API endpoint to download the user's latest run as a Chrome trace (chrome://tracing, Perfetto)"""
+    tracer = user_traces.get(get_user_id())
+    if tracer is None:
+        return jsonify({"error": "No traced run found"}), 404
+    response = jsonify(tracer.to_chrome_trace())
+    if request.args.get("download"):
+        response.headers["Content-Disposition"] = f"attachment; filename=trace-{tracer.trace_id}.json"
+    return response
+
+@app.route("/api/trace/summary")
+def api_trace_summary():
+    """API endpoint to get time spent per stage of the user's latest run"""
+    tracer = user_traces.get(get_user_id())
+    if tracer is None:
+        return jsonify({"stages": []})
+    return jsonify({"trace_id": tracer.trace_id, "stages": tracer.summary()})
+
+# JSON job API, independent of browser sessions; every request needs the API token
+def job_api_denied():
+    """Error response for a request without the API token, or None if it may proceed"""
+    if not authorized(request.headers.get("Authorization")):
+        return jsonify({"error": "A valid API token is required"}), 401
+    return None
+
+@app.route("/api/jobs", methods=['POST'])
+def submit_jobs():
+    """
+    API endpoint to queue one job, or many with {"jobs": [...]}
+
+    A job is {"programs": [code, ...], "params": code, "config": {...}, "name": optional label}
+    where config takes BenchmarkConfig fields. Jobs run back to back in submission order.
+    """
+    denied = job_api_denied()
+    if denied:
+        return denied
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"error": "Request body must be a JSON object"}), 400
+    batch = "jobs" in data
+    descriptions = data["jobs"] if batch else [data]
+    if not isinstance(descriptions, list):
+        return jsonify({"error": '"jobs" must be a list of jobs'}), 400
+    try:
+        jobs = get_job_scheduler().submit(descriptions)
+    except QueueFull as e:
+        return jsonify({"error": str(e)}), 429
+    except JobError as e:
+        return jsonify({"error": str(e)}), 400
+
+    queued = [{"id": job["id"], "name": job["name"], "status": job["status"], "url": f"/api/jobs/{job['id']}"}
+              for job in jobs]
+    return jsonify({"jobs": queued} if batch else queued[0]), 202
+
+@app.route("/api/jobs")
+def get_jobs():
+    """API endpoint to get several jobs at once, ?ids=<id>,<id>,..."""
+    denied = job_api_denied()
+    if denied:
+        return denied
+    scheduler = get_job_scheduler()
+    ids = [job_id for job_id in request.args.get("ids", "").split(",") if job_id]
+    return jsonify({"jobs": {job_id: scheduler.get(job_id) for job_id in ids}})
+
+@app.route("/api/jobs/<job_id>")
+def get_job(job_id):
+    """API endpoint to get a job's status, and its result once complete"""
+    denied = job_api_denied()
+    if denied:
+        return denied
+    job = get_job_scheduler().get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job, or finished too long ago"}), 404
+    return jsonify(job)
+
 @app.route("/api/cache/clear")
 def clear_ai_cache():
     """API endpoint to clear AI response cache"""
@@ -248,23 +486,29 @@ def clear_ai_cache():
     except Exception as e:
         return jsonify({"error": f"Failed to clear cache: {str(e)}"}), 500
 
+@app.route("/api/cache/params/clear")
+def clear_params_cache():
+    """API endpoint to clear the cache of built parameters"""
+    try:
+        get_params_cache().clear()
+        return jsonify({"message": "Parameters cache cleared successfully"})
+    except Exception as e:
+        return jsonify({"error": f"Failed to clear cache: {str(e)}"}), 500
+
 @app.route("/api/system/status")
 def system_status():
     """API endpoint to get system status"""
     try:
-        # Check Ollama connectivity
-        from utils.ai_utils import request_ollama
-        import os
-        
-        ollama_host = os.environ.get("OLLAMA_HOST", "http://localhost:11434")
-        test_response = request_ollama("Test", ollama_host)
-        ollama_status = "online" if not test_response.startswith("Error") else "offline"
+        # Listing models is enough to know Ollama is up, no generation needed
+        ollama_status = "online" if ping_ollama() else "offline"
         
         return jsonify({
             "ollama_status": ollama_status,
             "active_users": len(user_data),
             "active_ai_sessions": len(user_ai_status),
-            "cache_size": len(getattr(clear_cache, '_cache', {})) if hasattr(clear_cache, '_cache') else 0
+            "cache_size": cache_size(),
+            "params_cache": get_params_cache().stats(),
+            "model": ollama_manager.get_stats()
         })
     except Exception as e:
         return jsonify({
@@ -274,6 +518,11 @@ def system_status():
             "active_ai_sessions": len(user_ai_status)
         })
 
+@app.route("/metrics")
+def metrics():
+    """Prometheus scrape endpoint"""
+    return Response(registry.render(), mimetype="text/plain; version=0.0.4")
+
 # Periodic cleanup task
 @app.route("/api/cleanup")
 def manual_cleanup():
@@ -285,17 +534,8 @@ def manual_cleanup():
     except Exception as e:
         return jsonify({"error": f"Cleanup failed: {str(e)}"}), 500
 
-# Initialize AI system when app starts
-@app.before_request
-def initialize_app():
-    """Initialize the application on first request"""
-    global first_request
-    if not first_request: return
-    first_request = False
-    
-    init_ai_system()
-
 if __name__ == '__main__':
-    # Initialize AI system for development
-    init_ai_system()
-    app.run(debug=True, port=5000, host="0.0.0.0")
\ No newline at end of file
+    # Preload the model when the server starts rather than on the first HTTP request
+    ensure_ai_system()
+    app.run(debug=environ.get("FLASK_DEBUG", "").lower() in ("1", "true", "yes"), use_reloader=False,
+            port=5000, host="0.0.0.0")
\ No newline at end of file
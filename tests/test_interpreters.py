@@ -0,0 +1,46 @@
+import json
+import sys
+
+import pytest
+
+from utils import interpreters
+from utils.engine import BenchmarkConfig, BenchmarkEngine, BenchmarkError
+from utils.interpreters import Interpreter, RunnerError, run_on_interpreter
+
+def fake_runner(tmp_path, monkeypatch, final: str) -> str:
+    """Configure an interpreter whose runner ignores the job and ends with ``final``"""
+    script = tmp_path / "runner.py"
+    script.write_text("import sys\nsys.stdin.read()\n"
+                      f"print('{{\"type\": \"progress\", \"progress\": 50}}')\nprint({final!r})\n")
+    wrapper = tmp_path / "python"
+    wrapper.write_text(f"#!/bin/sh\nexec {sys.executable} {script}\n")
+    wrapper.chmod(0o755)
+    monkeypatch.setitem(interpreters.INTERPRETERS, "fake", Interpreter("fake", str(wrapper)))
+    return "fake"
+
+@pytest.mark.parametrize("final", [
+    {"type": "failure"},
+    {"type": "failure", "message": "boom", "kind": "not a kind", "program": None, "test": None},
+    {"type": "failure", "message": "boom", "kind": "runtime", "program": "1", "test": None},
+    {"type": "result"},
+    {"type": "result", "result": [1, 2]},
+    {"type": "result", "result": {"programs": [1], "config": {}}},
+    {"type": "result", "result": {"programs": [], "config": {"repeats": 0}}},
+])
+def test_malformed_final_messages_are_rejected(tmp_path, monkeypatch, final):
+    name = fake_runner(tmp_path, monkeypatch, json.dumps(final))
+    with pytest.raises(RunnerError):
+        run_on_interpreter(name, ["result = 1"], "params = [1]", BenchmarkConfig(), lambda **event: None)
+
+def test_reported_failures_become_benchmark_errors(tmp_path, monkeypatch):
+    final = {"type": "failure", "message": "Function 2 crashed", "kind": "runtime", "program": 2, "test": 3}
+    name = fake_runner(tmp_path, monkeypatch, json.dumps(final))
+    with pytest.raises(BenchmarkError) as info:
+        run_on_interpreter(name, ["result = 1"], "params = [1]", BenchmarkConfig(), lambda **event: None)
+    assert (info.value.kind, info.value.program, info.value.test) == ("runtime", 2, 3)
+
+def test_engine_reports_a_malformed_runner_as_a_failed_run(tmp_path, monkeypatch):
+    name = fake_runner(tmp_path, monkeypatch, '{"type": "result", "result": "forged"}')
+    with pytest.raises(BenchmarkError) as info:
+        BenchmarkEngine(BenchmarkConfig(interpreter=name)).run(["result = 1", "result = 1"], "params = [1]")
+    assert info.value.kind == "runtime"
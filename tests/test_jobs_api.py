@@ -0,0 +1,38 @@
+import pytest
+
+from utils import jobs
+
+JOB = {"programs": ["result = sum(params)"], "params": "params = [[1, 2]]"}
+TOKEN = "test-token"
+
+@pytest.fixture
+def client(monkeypatch):
+    import app
+    monkeypatch.setattr(jobs, "API_TOKEN", TOKEN)
+    monkeypatch.setattr(app, "get_job_scheduler", lambda scheduler=jobs.JobScheduler(): scheduler)
+    monkeypatch.setattr(app, "ensure_ai_system", lambda: None)
+    return app.app.test_client()
+
+def bearer(token: str):
+    return {"Authorization": f"Bearer {token}"}
+
+@pytest.mark.parametrize("headers", [{}, bearer("wrong"), {"Authorization": TOKEN}, {"Authorization": f"Basic {TOKEN}"}])
+def test_requests_without_the_token_are_refused(client, headers):
+    assert client.post("/api/jobs", json=JOB, headers=headers).status_code == 401
+    assert client.get("/api/jobs?ids=x", headers=headers).status_code == 401
+    assert client.get("/api/jobs/x", headers=headers).status_code == 401
+
+def test_the_api_is_off_without_a_configured_token(client, monkeypatch):
+    monkeypatch.setattr(jobs, "API_TOKEN", "")
+    assert client.post("/api/jobs", json=JOB, headers=bearer("")).status_code == 401
+
+def test_batches_beyond_the_queue_limit_are_refused(client, monkeypatch):
+    monkeypatch.setattr(jobs, "MAX_QUEUED_JOBS", 2)
+    response = client.post("/api/jobs", json={"jobs": [JOB] * 3}, headers=bearer(TOKEN))
+    assert response.status_code == 429
+    assert "at most 2" in response.get_json()["error"]
+
+def test_settings_beyond_the_form_limits_are_refused(client):
+    response = client.post("/api/jobs", json={**JOB, "config": {"repeats": jobs.MAX_REPEATS + 1}},
+                           headers=bearer(TOKEN))
+    assert response.status_code == 400
@@ -0,0 +1,61 @@
+import os
+
+import pytest
+
+from utils.params_cache import ParamsCache, params_key
+
+KEY = params_key("params = [[1, 2, 3]] * 2", 1, ("math",))
+
+@pytest.fixture
+def cache(tmp_path):
+    directory = tmp_path / "cache"
+    cache = ParamsCache(str(directory))
+    cache.store_params(KEY, [[1, 2, 3]] * 2, None)
+    return cache
+
+def entry_path(cache: ParamsCache) -> str:
+    return cache._path(KEY)
+
+def flip_byte(path: str, position: int) -> None:
+    with open(path, "r+b") as f:
+        f.seek(position)
+        byte = f.read(1)
+        f.seek(position)
+        f.write(bytes([byte[0] ^ 1]))
+
+def test_stored_entries_load(cache):
+    loaded = cache.load(KEY)
+    try:
+        assert loaded.count == 2
+        assert list(loaded.params) == [[1, 2, 3]] * 2
+    finally:
+        loaded.close()
+
+@pytest.mark.parametrize("position", [0, 10, -1])
+def test_tampered_entries_are_discarded(cache, position):
+    path = entry_path(cache)
+    flip_byte(path, position if position >= 0 else os.path.getsize(path) + position)
+    assert cache.lookup(KEY) is None
+    assert cache.load(KEY) is None
+    assert not os.path.exists(path)
+
+def test_truncated_entries_are_discarded(cache):
+    path = entry_path(cache)
+    os.truncate(path, os.path.getsize(path) - 8)
+    assert cache.load(KEY) is None
+    assert not os.path.exists(path)
+
+def test_entries_signed_with_another_key_are_discarded(cache, monkeypatch):
+    from utils import params_cache
+    monkeypatch.setattr(params_cache, "PARAMS_CACHE_KEY", b"another key")
+    assert cache.lookup(KEY) is None
+
+def test_sandbox_built_entries_are_never_unpickled_here(cache):
+    cache.store(KEY, [b"not a pickle"], 1, untrusted=True)
+    assert cache.lookup(KEY)["untrusted"]
+    assert cache.load(KEY) is None
+
+def test_shared_directories_are_not_trusted(cache):
+    os.chmod(cache.directory, 0o755)
+    assert cache.lookup(KEY) is None
+    assert cache.load(KEY) is None
@@ -0,0 +1,136 @@
+import ast
+
+import pytest
+
+from utils.prompt_utils import fit_code, minify_code
+
+def run_program(source: str, params):
+    namespace = {"params": params}
+    exec(compile(source, "<test>", "exec"), namespace)
+    return namespace.get("result")
+
+PROGRAMS = [
+    # Helpers reached directly, through other helpers, and through a class
+    '''
+import math
+
+def unused(x):
+    """Never called"""
+    return x * 2
+
+def square(x):
+    # Squared
+    return x * x
+
+def norm(values):
+    """Euclidean norm"""
+    return math.sqrt(sum(square(v) for v in values))
+
+class Scaler:
+    """Scales by a norm"""
+
+    def scale(self, values):
+        n = norm(values)
+        return [v / n for v in values]
+
+result = Scaler().scale(params)
+''',
+    # Docstring-only bodies must stay valid
+    '''
+class Empty:
+    """Nothing here"""
+
+def noop():
+    """Nothing either"""
+
+noop()
+result = [type(Empty()).__name__] + list(params)
+''',
+    # Functions only referenced as attributes or by a decorator
+    '''
+import functools
+
+def counted(function):
+    @functools.wraps(function)
+    def wrapper(*args):
+        wrapper.calls += 1
+        return function(*args)
+    wrapper.calls = 0
+    return wrapper
+
+@counted
+def total(values):
+    return sum(values)
+
+class Box:
+    pass
+
+box = Box()
+box.total = total
+result = (box.total(params), total.calls)
+''',
+    # Decorators that register functions the top-level code never names
+    '''
+HANDLERS = []
+
+def register(function):
+    HANDLERS.append(function)
+    return function
+
+@register
+def double(values):
+    return [v * 2 for v in values]
+
+@register
+def negate(values):
+    return [-v for v in values]
+
+result = [handler(params) for handler in HANDLERS]
+''',
+    # A function redefined after use
+    '''
+def pick(values):
+    return values[0]
+
+first = pick(params)
+
+def pick(values):
+    return values[-1]
+
+result = (first, pick(params))
+''',
+    # Only definitions: everything is kept
+    '''
+def helper(values):
+    """Docstring"""
+    return max(values)
+''',
+]
+
+@pytest.mark.parametrize("source", PROGRAMS)
+def test_minified_programs_behave_the_same(source):
+    minified = minify_code(source)
+    assert run_program(minified, [3, 4]) == run_program(source, [3, 4])
+
+@pytest.mark.parametrize("source", PROGRAMS)
+def test_minified_programs_are_smaller_and_valid(source):
+    minified = minify_code(source)
+    ast.parse(minified)
+    assert len(minified) <= len(source)
+    assert "#" not in minified and '"""' not in minified
+
+def test_unused_functions_are_dropped():
+    minified = minify_code(PROGRAMS[0])
+    assert "unused" not in minified
+    assert "def square" in minified and "def norm" in minified
+
+def test_code_that_does_not_parse_only_loses_comments():
+    source = "def broken(:\n    return 1  # comment\n\n\nresult = broken()\n"
+    minified = minify_code(source)
+    assert "comment" not in minified
+    assert "def broken(:" in minified and "result = broken()" in minified
+
+def test_fit_code_keeps_small_programs_whole():
+    codes, num_predict = fit_code(["result = sum(params)"], template_tokens=100)
+    assert codes == ["result = sum(params)"]
+    assert num_predict > 0
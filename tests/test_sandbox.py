@@ -0,0 +1,116 @@
+import json
+import platform
+import sys
+
+import pytest
+
+from utils import sandbox
+from utils.engine import BenchmarkConfig, BenchmarkError
+from utils.sandbox import SandboxError, SandboxPool, _decode_message
+
+pytestmark = pytest.mark.skipif(not sys.platform.startswith("linux"), reason="the sandbox needs Linux")
+
+def run_in_sandbox(pool: SandboxPool, source: str) -> str:
+    """Run a program that reports through the error it raises, returning that report"""
+    with pytest.raises(BenchmarkError) as info:
+        pool.run([compile(source, "<test>", "exec")], "params = [1]", BenchmarkConfig(repeats=1, warmup=0),
+                 lambda **event: None)
+    return str(info.value)
+
+@pytest.fixture
+def pool(monkeypatch):
+    monkeypatch.setenv("BENCHMARK_API_TOKEN", "api-secret")
+    monkeypatch.setenv("BENCHMARK_PARAMS_CACHE_KEY", "cache-secret")
+    monkeypatch.setattr(sandbox, "USE_SECCOMP", platform.machine() in sandbox._DENIED_SYSCALLS)
+    pool = SandboxPool(size=1, timeout=60)
+    yield pool
+    pool.close()
+
+ATTEMPT = """
+import os
+def attempt(action):
+    try:
+        action()
+    except Exception as e:
+        return type(e).__name__
+    return "allowed"
+"""
+
+def test_secrets_are_not_passed_to_workers(pool):
+    report = run_in_sandbox(pool, "raise ValueError(' '.join(sorted(__import__('os').environ)))")
+    assert "BENCHMARK_API_TOKEN" not in report
+    assert "BENCHMARK_PARAMS_CACHE_KEY" not in report
+
+def test_workers_cannot_create_files(pool, tmp_path):
+    target = tmp_path / "created"
+    report = run_in_sandbox(pool, ATTEMPT + f"""
+results = [attempt(lambda: open({str(target)!r}, "w")),
+           attempt(lambda: os.open({str(target)!r}, os.O_CREAT | os.O_RDONLY))]
+raise ValueError(" ".join(results))
+""")
+    assert "allowed" not in report
+    assert not target.exists()
+
+def test_workers_cannot_fork(pool):
+    if not sandbox.USE_SECCOMP:
+        pytest.skip("seccomp filters are not available on this platform")
+    report = run_in_sandbox(pool, ATTEMPT + """
+def fork():
+    if os.fork() == 0:
+        os._exit(0)
+raise ValueError(attempt(fork))
+""")
+    assert "allowed" not in report
+
+def test_workers_can_still_read_and_start_threads(pool):
+    report = run_in_sandbox(pool, ATTEMPT + """
+import threading
+thread = threading.Thread(target=lambda: None)
+raise ValueError(attempt(lambda: open(os.__file__).read()) + " " + attempt(lambda: (thread.start(), thread.join())))
+""")
+    assert report.endswith("allowed allowed")
+
+def test_programs_run_normally(pool):
+    result = pool.run([compile("result = sorted(params)", "<test>", "exec")], "params = [[3, 1, 2]] * 3",
+                      BenchmarkConfig(repeats=2, warmup=0), lambda **event: None)
+    assert result.total_tests == 3
+
+@pytest.mark.parametrize("message", [
+    b"not json",
+    b'{"kind": "result"}',
+    b'["unknown", null]',
+    b'["result", 5]',
+    b'["result", {"programs": [1], "config": {}}]',
+    b'["benchmark_error", ["message", "not a kind", null, null]]',
+    b'["benchmark_error", ["message", "runtime", -1, null]]',
+    b'["params", [10, [1, "2"], 3]]',
+    b'["ready", true]',
+    b'["load_result", {"calls": 1, "elapsed": 1.0, "histogram": {"1": "many"}, "error": null}]',
+    b"[" * 100000,
+])
+def test_malformed_worker_messages_are_rejected(message):
+    with pytest.raises((ValueError, RecursionError)):
+        _decode_message(message)
+
+def test_worker_messages_are_never_unpickled():
+    with pytest.raises(ValueError):
+        _decode_message(b"\x80\x05\x95\x05\x00\x00\x00\x00\x00\x00\x00K\x01.")
+
+def test_well_formed_worker_messages_are_decoded():
+    assert _decode_message(json.dumps(["benchmark_error", ["bad", "runtime", 1, 2]]).encode()) \
+        == ("benchmark_error", ("bad", "runtime", 1, 2))
+    assert _decode_message(b'["params", [10, [4, 8], 3]]') == ("params", (10, [4, 8], 3))
+
+def test_a_worker_sending_garbage_fails_the_run(pool):
+    with pytest.raises(SandboxError):
+        pool.run([compile("""
+import gc
+from multiprocessing.connection import Connection
+for connection in [o for o in gc.get_objects() if isinstance(o, Connection)]:
+    try:
+        connection.send_bytes(b'["result", {"programs": "forged"}]')
+    except OSError:
+        pass
+import os
+os._exit(0)
+""", "<test>", "exec")], "params = [1]", BenchmarkConfig(repeats=1, warmup=0), lambda **event: None)
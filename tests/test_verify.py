@@ -0,0 +1,70 @@
+import math
+
+import numpy as np
+import pytest
+
+from utils.engine import BenchmarkConfig, BenchmarkEngine, BenchmarkError
+from utils.verify import outputs_match
+
+def run(programs, params_code, **settings):
+    config = BenchmarkConfig(verify=True, cache_params=False, executor="inline", repeats=1, warmup=0, **settings)
+    return BenchmarkEngine(config).run(programs, params_code)
+
+def test_matching_outputs_pass():
+    result = run(["result = sorted(params)", "result = list(sorted(params))"], "params = [[3, 1, 2], [2, 1]]")
+    assert result.total_tests == 2
+
+def test_mismatch_names_the_program_and_test():
+    with pytest.raises(BenchmarkError) as info:
+        run(["result = params", "result = params", "result = params if params < 3 else -params"], "params = range(5)")
+    error = info.value
+    assert (error.kind, error.program, error.test) == ("verify", 3, 4)
+    assert "Function 1 returned 3" in str(error) and "Function 3 returned -3" in str(error)
+
+def test_mismatch_is_reported_before_the_input_is_timed():
+    import builtins
+    builtins.TIMED_TESTS = timed = []
+    try:
+        with pytest.raises(BenchmarkError):
+            run(["TIMED_TESTS.append(params)\nresult = params", "result = params if params < 2 else None"],
+                "params = range(4)")
+    finally:
+        del builtins.TIMED_TESTS
+    # Verification calls and timed calls of tests 0 and 1, verification only of test 2
+    assert timed == [0, 0, 1, 1, 2]
+
+def test_missing_result_is_a_verify_failure():
+    with pytest.raises(BenchmarkError) as info:
+        run(["result = params", "output = params"], "params = [1]")
+    assert (info.value.kind, info.value.program) == ("verify", 2)
+
+def test_mutation_does_not_affect_the_comparison():
+    result = run(["params.sort()\nresult = params", "result = sorted(params)"], "params = [[3, 1, 2]]")
+    assert result.total_tests == 1
+
+def test_generated_inputs_are_verified_one_at_a_time():
+    import builtins
+    builtins.LIVE = live = []
+    builtins.PEAK = peak = []
+    params = ("import weakref\nclass Input(list): pass\ndef params():\n    for i in range(5):\n"
+              "        value = Input([i])\n        LIVE.append(weakref.ref(value))\n        yield value\n")
+    try:
+        result = run(["PEAK.append(sum(ref() is not None for ref in LIVE))\nresult = sum(params)",
+                      "result = sum(params)"], params)
+    finally:
+        del builtins.LIVE, builtins.PEAK
+    assert result.total_tests == 5
+    assert max(peak) == 1
+
+@pytest.mark.parametrize("a, b, expected", [
+    (1.0, 1.0 + 1e-12, True),
+    (1.0, 1.1, False),
+    (math.nan, math.nan, True),
+    ([1, (2, 3)], [1, (2, 3)], True),
+    ([1, 2], (1, 2), False),
+    ({"a": 1}, {"a": 2}, False),
+    (np.arange(3.0), np.arange(3.0) + 1e-12, True),
+    (np.arange(3.0), np.arange(4.0), False),
+])
+def test_outputs_match(a, b, expected):
+    assert outputs_match(a, b) is expected
@@ -0,0 +1,180 @@
+"""
+Load generator simulating concurrent users of the web app
+
+Each simulated user runs the full browser flow in a loop: load the form,
+submit a benchmark, poll its status, open the chart and poll AI feedback
+until it finishes. Latency is recorded per endpoint and reported as
+p50/p99 with throughput once the run ends.
+
+Usage (against the app pointed at ``python -m tools.mock_ollama``):
+    python -m tools.load_test --base-url http://localhost:5000 --users 20 --duration 60
+"""
+import argparse
+import re
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+import requests
+
+PROGRAM1 = """
+def binary_search(arr, target):
+    low, high = 0, len(arr) - 1
+    while low <= high:
+        mid = (low + high) // 2
+        if arr[mid] == target:
+            return mid
+        elif arr[mid] < target:
+            low = mid + 1
+        else:
+            high = mid - 1
+    return -1
+
+arr, target = params
+result = binary_search(arr, target)
+"""
+
+PROGRAM2 = """
+arr, target = params
+result = arr.index(target) if target in arr else -1
+"""
+
+PARAMS = """
+arr = list(range(10_000))
+params = [(arr, t) for t in (5, 500, 5000, 9999, -1)]
+"""
+
+_CSRF_PATTERN = re.compile(r'name="csrf_token"[^>]*value="([^"]+)"')
+
+class LatencyRecorder:
+    """Thread-safe per-endpoint latency and error collection"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.flows = 0
+
+    def request(self, session: requests.Session, method: str, endpoint: str, url: str,
+                **kwargs) -> Optional[requests.Response]:
+        start = time.perf_counter()
+        try:
+            response = session.request(method, url, timeout=120, **kwargs)
+        except requests.RequestException:
+            response = None
+        elapsed = time.perf_counter() - start
+        with self.lock:
+            self.latencies[endpoint].append(elapsed)
+            if response is None or response.status_code >= 400:
+                self.errors[endpoint] += 1
+        return response
+
+    def report(self, duration: float) -> str:
+        lines = [f"{'endpoint':<28}{'count':>8}{'errors':>8}{'req/s':>9}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}"]
+        with self.lock:
+            for endpoint in sorted(self.latencies):
+                samples = sorted(self.latencies[endpoint])
+                lines.append(f"{endpoint:<28}{len(samples):>8}{self.errors[endpoint]:>8}"
+                             f"{len(samples) / duration:>9.2f}{percentile(samples, 50) * 1e3:>10.1f}"
+                             f"{percentile(samples, 99) * 1e3:>10.1f}{samples[-1] * 1e3:>10.1f}")
+            lines.append(f"Completed flows: {self.flows} ({self.flows / duration:.2f}/s over {duration:.1f}s)")
+        return "\n".join(lines)
+
+def percentile(sorted_samples: List[float], pct: float) -> float:
+    """Nearest-rank percentile of already sorted samples"""
+    if not sorted_samples:
+        return 0.0
+    index = min(len(sorted_samples) - 1, max(0, round(pct / 100 * len(sorted_samples)) - 1))
+    return sorted_samples[index]
+
+def poll(recorder: LatencyRecorder, session: requests.Session, endpoint: str, url: str,
+         done_states: tuple, interval: float, deadline: float) -> Optional[dict]:
+    """Poll a JSON status endpoint until it reaches one of done_states"""
+    while time.monotonic() < deadline:
+        response = recorder.request(session, "GET", endpoint, url)
+        if response is not None and response.ok:
+            data = response.json()
+            if data.get("status") in done_states:
+                return data
+        time.sleep(interval)
+    return None
+
+def user_flow(recorder: LatencyRecorder, base_url: str, stop: threading.Event, poll_interval: float,
+              flow_timeout: float) -> None:
+    """One simulated user repeating the submit, poll, chart, feedback cycle until stopped"""
+    session = requests.Session()
+    while not stop.is_set():
+        deadline = time.monotonic() + flow_timeout
+        form = recorder.request(session, "GET", "GET /benchmark", f"{base_url}/benchmark")
+        match = _CSRF_PATTERN.search(form.text) if form is not None else None
+        if match is None:
+            time.sleep(poll_interval)
+            continue
+
+        submitted = recorder.request(session, "POST", "POST /benchmark", f"{base_url}/benchmark",
+                                     data={"csrf_token": match.group(1), "program1": PROGRAM1, "program2": PROGRAM2,
+                                           "params": PARAMS, "input_mode": "copy", "repeats": 1, "warmup": 0,
+                                           "timer": "perf_counter_ns", "gc_mode": "disabled"},
+                                     allow_redirects=False)
+        if submitted is None or submitted.status_code != 302:
+            continue
+
+        status = poll(recorder, session, "GET /api/benchmark", f"{base_url}/api/benchmark",
+                      ("complete", "error"), poll_interval, deadline)
+        if not status or status["status"] != "complete":
+            continue
+
+        recorder.request(session, "GET", "GET /chart", f"{base_url}/chart")
+        feedback = poll(recorder, session, "GET /api/feedback", f"{base_url}/api/feedback",
+                        ("complete", "error"), poll_interval, deadline)
+        if feedback is not None:
+            with recorder.lock:
+                recorder.flows += 1
+
+def run(base_url: str, users: int, duration: float, poll_interval: float = 1.0,
+        flow_timeout: float = 180, ramp_up: float = 5.0) -> LatencyRecorder:
+    """
+    Run the load test and return the collected measurements
+
+    Args:
+        base_url: Root URL of the running web app
+        users: Number of concurrent simulated users
+        duration: Seconds to keep starting new flows
+        poll_interval: Seconds between status polls, like the browser pages
+        flow_timeout: Seconds before a single flow is abandoned
+        ramp_up: Seconds over which users are started
+    """
+    recorder = LatencyRecorder()
+    stop = threading.Event()
+    threads = []
+    for i in range(users):
+        thread = threading.Thread(target=user_flow, args=(recorder, base_url, stop, poll_interval, flow_timeout),
+                                  name=f"load-user-{i}")
+        thread.daemon = True
+        thread.start()
+        threads.append(thread)
+        time.sleep(ramp_up / max(users, 1))
+    time.sleep(max(0, duration - ramp_up))
+    stop.set()
+    for thread in threads:
+        thread.join(timeout=flow_timeout)
+    return recorder
+
+def main(argv: Optional[list] = None) -> None:
+    parser = argparse.ArgumentParser(description="Simulate concurrent users of the benchmark web app")
+    parser.add_argument("--base-url", default="http://localhost:5000")
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--duration", type=float, default=60)
+    parser.add_argument("--poll-interval", type=float, default=1.0)
+    parser.add_argument("--flow-timeout", type=float, default=180)
+    parser.add_argument("--ramp-up", type=float, default=5.0)
+    args = parser.parse_args(argv)
+
+    start = time.monotonic()
+    recorder = run(args.base_url.rstrip("/"), args.users, args.duration, args.poll_interval,
+                   args.flow_timeout, args.ramp_up)
+    print(recorder.report(time.monotonic() - start))
+
+if __name__ == "__main__":
+    main()
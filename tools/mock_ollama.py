@@ -0,0 +1,253 @@
+"""
+Fake Ollama server for exercising the feedback pipeline without a model
+
+Implements the parts of the Ollama API the app uses (``/api/generate`` with
+and without streaming, ``/api/tags``) with configurable latency, token
+rate and error injection. Models are resident like in Ollama: a model stays
+loaded for its request's ``keep_alive`` after the last request finishes, and
+is reloaded, paying the load delay again, once it expired or when a request
+asks for different runner options such as ``num_ctx``.
+
+Usage:
+    python -m tools.mock_ollama --port 11434 --latency lognormal:1.5,0.5 --tokens-per-second 40 --error-rate 0.02
+"""
+import argparse
+import json
+import math
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Optional, Tuple
+
+WORDS = ("the function loops over the input list so its cost grows linearly; consider using a set "
+         "or bisect for lookups, avoid repeated attribute access in the hot loop, and prefer "
+         "built-ins like sum and sorted which run in C").split()
+
+# Options that configure the model runner; a request changing any of them reloads the model
+RUNNER_OPTIONS = ("num_ctx", "num_batch", "num_gpu", "main_gpu", "use_mmap", "use_mlock", "num_thread")
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+def parse_keep_alive(value: Any, default: float) -> float:
+    """
+    Seconds a model stays loaded after a request, as Ollama reads ``keep_alive``
+
+    Numbers are seconds and strings are durations like ``30m`` or ``1h30m``.
+    Negative values keep the model loaded forever and zero unloads it at once.
+    """
+    if value is None or value == "":
+        return default
+    if isinstance(value, (int, float)):
+        seconds = float(value)
+    else:
+        text = str(value).strip()
+        try:
+            seconds = float(text)
+        except ValueError:
+            parts = _DURATION_PART.findall(text)
+            if not parts or "".join(number + unit for number, unit in parts) != text.lstrip("-"):
+                raise ValueError(f"Invalid keep_alive duration: {value}")
+            seconds = sum(float(number) * _DURATION_UNITS[unit] for number, unit in parts)
+            seconds = -seconds if text.startswith("-") else seconds
+    return math.inf if seconds < 0 else seconds
+
+def parse_latency(spec: str) -> Callable[[], float]:
+    """
+    Build a latency sampler (seconds) from a spec string
+
+    Specs: ``fixed:S``, ``uniform:A,B``, ``lognormal:MEDIAN,SIGMA``, ``exponential:MEAN``
+    """
+    kind, _, args = spec.partition(":")
+    values = [float(v) for v in args.split(",") if v]
+    if kind == "fixed":
+        return lambda: values[0]
+    if kind == "uniform":
+        return lambda: random.uniform(values[0], values[1])
+    if kind == "lognormal":
+        return lambda: random.lognormvariate(math.log(values[0]), values[1])
+    if kind == "exponential":
+        return lambda: random.expovariate(1 / values[0])
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+class MockOllamaConfig:
+    def __init__(self, latency: Callable[[], float], tokens_per_second: float, response_tokens: int,
+                 error_rate: float, drop_rate: float, load_seconds: float, keep_alive: float = 300):
+        self.latency = latency                  # Time to first token
+        self.tokens_per_second = tokens_per_second
+        self.response_tokens = response_tokens
+        self.error_rate = error_rate            # Fraction of requests answered with HTTP 500
+        self.drop_rate = drop_rate              # Fraction of connections closed without a response
+        self.load_seconds = load_seconds        # Simulated model load after idle unload or an options change
+        self.keep_alive = keep_alive            # Seconds a model stays loaded when a request sets no keep_alive
+        # Model name -> {"runner": runner options, "ready_at", "expires_at", "in_use"}
+        self.loaded_models: Dict[str, Dict[str, Any]] = {}
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.loads = 0
+
+    def resident_models(self) -> list:
+        """Names of the models currently loaded; call with the lock held"""
+        now = time.time()
+        return [name for name, model in self.loaded_models.items()
+                if model["in_use"] or model["expires_at"] > now]
+
+class MockOllamaHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    config: MockOllamaConfig
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, payload: Dict) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/api/tags":
+            with self.config.lock:
+                models = [{"name": name} for name in self.config.resident_models()]
+            self._send_json(200, {"models": models})
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        if self.path != "/api/generate":
+            self._send_json(404, {"error": "not found"})
+            return
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        config = self.config
+        with config.lock:
+            config.requests += 1
+
+        roll = random.random()
+        if roll < config.drop_rate:
+            self.close_connection = True
+            return
+        if roll < config.drop_rate + config.error_rate:
+            self._send_json(500, {"error": "injected failure"})
+            return
+
+        model = request.get("model", "mock")
+        try:
+            keep_alive = parse_keep_alive(request.get("keep_alive"), config.keep_alive)
+        except ValueError as e:
+            self._send_json(400, {"error": str(e)})
+            return
+        started = time.perf_counter()
+        loaded, load_seconds = self._load(model, request.get("options") or {})
+        try:
+            self._generate(request, model, started, load_seconds)
+        finally:
+            self._release(loaded, keep_alive)
+
+    def _generate(self, request: Dict, model: str, started: float, load_seconds: float) -> None:
+        config = self.config
+        # An empty prompt only loads the model, as in Ollama
+        if not request.get("prompt"):
+            self._send_json(200, {"model": model, "response": "", "done": True,
+                                  "load_duration": int(load_seconds * 1e9)})
+            return
+
+        time.sleep(config.latency())
+        tokens = [random.choice(WORDS) + " " for _ in range(config.response_tokens)]
+        delay = 1 / config.tokens_per_second if config.tokens_per_second > 0 else 0
+        final = {"model": model, "done": True, "load_duration": int(load_seconds * 1e9),
+                 "eval_count": len(tokens)}
+
+        if request.get("stream", True):
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for token in tokens:
+                self._write_chunk({"model": model, "response": token, "done": False})
+                time.sleep(delay)
+            final["total_duration"] = int((time.perf_counter() - started) * 1e9)
+            self._write_chunk({**final, "response": ""})
+            self.wfile.write(b"0\r\n\r\n")
+        else:
+            time.sleep(delay * len(tokens))
+            final["total_duration"] = int((time.perf_counter() - started) * 1e9)
+            self._send_json(200, {**final, "response": "".join(tokens)})
+
+    def _write_chunk(self, payload: Dict) -> None:
+        data = json.dumps(payload).encode("utf-8") + b"\n"
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def _load(self, model: str, options: Dict[str, Any]) -> Tuple[Dict[str, Any], float]:
+        """
+        Simulate loading a model that is not resident, or resident with other runner options
+
+        Concurrent requests for a model being loaded wait for that one load.
+
+        Returns:
+            Tuple of (the loaded model's entry, seconds this request waited for a load)
+        """
+        config = self.config
+        runner = {name: options[name] for name in RUNNER_OPTIONS if name in options}
+        now = time.time()
+        with config.lock:
+            loaded = config.loaded_models.get(model)
+            if model not in config.resident_models() or loaded["runner"] != runner:
+                loaded = {"runner": runner, "ready_at": now + config.load_seconds, "expires_at": 0.0, "in_use": 0}
+                config.loaded_models[model] = loaded
+                config.loads += 1
+            loaded["in_use"] += 1
+            wait = max(loaded["ready_at"] - now, 0.0)
+        time.sleep(wait)
+        return loaded, wait
+
+    def _release(self, loaded: Dict[str, Any], keep_alive: float) -> None:
+        """Start a model's idle timer once no request is using it"""
+        with self.config.lock:
+            loaded["in_use"] -= 1
+            loaded["expires_at"] = time.time() + keep_alive
+
+def serve(host: str, port: int, config: MockOllamaConfig) -> ThreadingHTTPServer:
+    """Start the mock server on a background thread and return it"""
+    handler = type("ConfiguredMockOllamaHandler", (MockOllamaHandler,), {"config": config})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, name="mock-ollama")
+    thread.daemon = True
+    thread.start()
+    return server
+
+def main(argv: Optional[list] = None) -> None:
+    parser = argparse.ArgumentParser(description="Fake Ollama server for load testing")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--latency", default="lognormal:1.0,0.5",
+                        help="time to first token: fixed:S, uniform:A,B, lognormal:MEDIAN,SIGMA, exponential:MEAN")
+    parser.add_argument("--tokens-per-second", type=float, default=40)
+    parser.add_argument("--response-tokens", type=int, default=200)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--drop-rate", type=float, default=0.0)
+    parser.add_argument("--load-seconds", type=float, default=3.0,
+                        help="delay of every (re)load after idle expiry or a runner options change")
+    parser.add_argument("--keep-alive", default="5m",
+                        help="how long models stay loaded when a request sets no keep_alive, as in Ollama")
+    args = parser.parse_args(argv)
+
+    config = MockOllamaConfig(parse_latency(args.latency), args.tokens_per_second, args.response_tokens,
+                              args.error_rate, args.drop_rate, args.load_seconds,
+                              parse_keep_alive(args.keep_alive, 300))
+    server = serve(args.host, args.port, config)
+    print(f"Mock Ollama listening on http://{args.host}:{args.port}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
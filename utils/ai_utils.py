@@ -1,198 +1,238 @@
 from utils.html_utils import get_html
+from utils.async_http import HTTPError, HTTPStatusError, get, post_json_stream
+from utils.prompt_utils import NUM_CTX, build_feedback_prompt, build_comparative_prompt
+from utils.ollama_manager import OllamaManager
+from utils.tracing import NULL_TRACER, Tracer
 import os
-import requests
-from typing import Dict, Any
-import concurrent.futures
+import asyncio
+from concurrent.futures import Future
+from contextlib import aclosing
+from typing import Dict, Any, Optional
 import threading
 import time
 
+from utils.metrics import llm_cache_requests, llm_request_seconds, llm_time_to_first_token_seconds
+
+OLLAMA_HOST = os.environ.get("OLLAMA_HOST", "http://localhost:11434")
+
+# Deadline for a single Ollama generation and for a whole feedback run (seconds)
+REQUEST_TIMEOUT = 50
+FEEDBACK_DEADLINE = 60
+
 # Global cache for AI responses (in-memory session storage)
 response_cache = {}
 cache_lock = threading.Lock()
 
+# Generation options, num_predict is overridden per prompt by the prompt builder
+DEFAULT_OPTIONS = {
+    # One context size for every request, so the loaded model is never reloaded to resize it
+    "num_ctx": NUM_CTX,
+    "temperature": 0.3,  # Lower temperature for more focused responses
+    "top_p": 0.9,  # Nucleus sampling for efficiency
+    "top_k": 40,  # Limit vocabulary for faster generation
+    "repeat_penalty": 1.1,  # Prevent repetition
+    "num_predict": 400,  # Limit response length for speed
+    # CPU optimization (adjust based on your system)
+    "num_thread": -1,  # Let Ollama auto-detect optimal threads
+    "use_mmap": True,  # Use memory mapping for better performance
+    "use_mlock": True,  # Lock model in memory to avoid swapping
+}
+
+# Keeps the model resident and picks the model for each generation
+ollama_manager = OllamaManager.from_env(OLLAMA_HOST, DEFAULT_OPTIONS)
+
+# One event loop thread multiplexes every in-flight generation
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_lock = threading.Lock()
+
+# In-flight feedback runs by user, so they can be cancelled
+feedback_tasks: Dict[str, Future] = {}
+
+def get_event_loop() -> asyncio.AbstractEventLoop:
+    """Return the shared AI event loop, starting its thread on first use"""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=_loop.run_forever, name="ai-event-loop")
+            thread.daemon = True
+            thread.start()
+        return _loop
+
 # Function to request Ollama for AI feedback with optimizations
-def request_ollama(prompt: str, ollama_host: str) -> str:
+async def request_ollama_async(prompt: str, ollama_host: str = OLLAMA_HOST, timeout: float = REQUEST_TIMEOUT,
+                               options: Optional[Dict[str, Any]] = None, tracer: Tracer = NULL_TRACER,
+                               lane: Optional[str] = None) -> str:
+    with tracer.span("llm call", "ai", lane=lane) as span:
+        span["prompt_chars"] = len(prompt)
+        result = await _request_ollama(prompt, ollama_host, timeout, options, span)
+        span["response_chars"] = len(result)
+        return result
+
+async def _request_ollama(prompt: str, ollama_host: str, timeout: float, options: Optional[Dict[str, Any]],
+                          span: Dict[str, Any]) -> str:
     # Check cache first
     prompt_hash = hash(prompt)
     with cache_lock:
-        if prompt_hash in response_cache:
-            return response_cache[prompt_hash]
-    
+        cached = response_cache.get(prompt_hash)
+    llm_cache_requests.inc(result="hit" if cached is not None else "miss")
+    span["cached"] = cached is not None
+    if cached is not None:
+        return cached
+
+    model = ollama_manager.choose_model()
+    span["model"] = model
+    ollama_manager.begin_request()
+    start = time.perf_counter()
+    outcome = "error"
     try:
-        # Optimized parameters for faster response
-        response = requests.post(
+        # Streamed so time-to-first-token can be measured; the text is joined before returning
+        # aclosing closes the connection as soon as the loop exits early, rather than when collected
+        pieces = []
+        async with aclosing(post_json_stream(
             f"{ollama_host}/api/generate",
-            json={
-                "model": "codegemma:instruct",
+            {
+                "model": model,
                 "prompt": prompt,
-                "stream": False,
-                "options": {
-                    # Reduce context window for faster processing
-                    "num_ctx": 2048,  # Reduced from default 4096
-                    "temperature": 0.3,  # Lower temperature for more focused responses
-                    "top_p": 0.9,  # Nucleus sampling for efficiency
-                    "top_k": 40,  # Limit vocabulary for faster generation
-                    "repeat_penalty": 1.1,  # Prevent repetition
-                    "num_predict": 400,  # Limit response length for speed
-                    # CPU optimization (adjust based on your system)
-                    "num_thread": -1,  # Let Ollama auto-detect optimal threads
-                    "use_mmap": True,  # Use memory mapping for better performance
-                    "use_mlock": True,  # Lock model in memory to avoid swapping
-                }
+                "stream": True,
+                "keep_alive": ollama_manager.keep_alive,
+                "options": {**DEFAULT_OPTIONS, **(options or {})}
             },
-            timeout=60
-        )
-        
-        if response.status_code == 200:
-            result = response.json()["response"]
-            # Cache the response
-            with cache_lock:
-                response_cache[prompt_hash] = result
-            return result
-        else:
-            return f"Error: Failed to get response from Ollama (Status: {response.status_code})"
-            
-    except requests.RequestException as e:
-        return f"Error connecting to Ollama: {str(e)}"
+            timeout=timeout
+        )) as chunks:
+            async for chunk in chunks:
+                if "error" in chunk:
+                    return f"Error: Ollama reported {chunk['error']}"
+                if not pieces:
+                    ttft = time.perf_counter() - start
+                    llm_time_to_first_token_seconds.observe(ttft, model=model)
+                    span["ttft_ms"] = round(ttft * 1e3, 3)
+                pieces.append(chunk.get("response", ""))
 
-# Optimized AI Feedback with shorter, more focused prompts
-def get_ai_feedback(func_code: str, func_name: str, raw_times: list[float], score: float) -> str:
-    ollama_host = os.environ.get("OLLAMA_HOST")
+        result = "".join(pieces)
+        outcome = "success"
+        # Cache the response
+        with cache_lock:
+            response_cache[prompt_hash] = result
+        return result
 
-    avg_time = sum(raw_times) / len(raw_times)
-    
-    # Shorter, more focused prompt for faster processing
-    prompt = f"""Analyze this Python function performance (keep response under 300 words):
+    except HTTPStatusError as e:
+        return f"Error: Failed to get response from Ollama (Status: {e.status})"
+    except HTTPError as e:
+        outcome = "timeout" if "timed out" in str(e) else "error"
+        return f"Error connecting to Ollama: {str(e)}"
+    except asyncio.CancelledError:
+        outcome = "cancelled"
+        raise
+    finally:
+        span["outcome"] = outcome
+        llm_request_seconds.observe(time.perf_counter() - start, model=model, outcome=outcome)
+        ollama_manager.end_request()
 
-{func_name}:
-```python
-{func_code}
-```
+def request_ollama(prompt: str, ollama_host: str = OLLAMA_HOST, timeout: float = REQUEST_TIMEOUT) -> str:
+    """Blocking wrapper around request_ollama_async for callers outside the event loop"""
+    future = asyncio.run_coroutine_threadsafe(request_ollama_async(prompt, ollama_host, timeout), get_event_loop())
+    return future.result()
 
-Metrics: Score {score:.2f}, Avg time {avg_time:.4f}s
+async def ping_ollama_async(ollama_host: str = OLLAMA_HOST, timeout: float = 5) -> bool:
+    """Check that Ollama is reachable by listing its models, without generating anything"""
+    try:
+        status, _ = await get(f"{ollama_host}/api/tags", timeout=timeout)
+    except HTTPError:
+        return False
+    return status == 200
 
-Provide:
-1. Performance assessment
-2. Main bottlenecks
-3. 2-3 optimization tips
-4. Code quality notes
+def ping_ollama(ollama_host: str = OLLAMA_HOST, timeout: float = 5) -> bool:
+    """Blocking wrapper around ping_ollama_async"""
+    future = asyncio.run_coroutine_threadsafe(ping_ollama_async(ollama_host, timeout), get_event_loop())
+    return future.result()
 
-Be concise and actionable."""
-    
-    return request_ollama(prompt, ollama_host)
+# Optimized AI Feedback with minified code and a context sized to the prompt
+async def get_ai_feedback(func_code: str, func_name: str, raw_times: list[float], score: float,
+                          tracer: Tracer = NULL_TRACER, lane: Optional[str] = None) -> str:
+    avg_time = sum(raw_times) / len(raw_times)
+    with tracer.span("build prompt", "ai", lane=lane):
+        prompt, options = build_feedback_prompt(func_code, func_name, avg_time, score)
+    return await request_ollama_async(prompt, options=options, tracer=tracer, lane=lane)
 
 # Optimized Comparative Feedback
-def get_comparative_feedback(func1_code: str, func2_code: str, func1_times: list[float], func2_times: list[float], func1_score: float, func2_score: float):
-    ollama_host = os.environ.get("OLLAMA_HOST")
-
-    avg1 = sum(func1_times) / len(func1_times)
-    avg2 = sum(func2_times) / len(func2_times)
-    
-    better_func = "Function 1" if func1_score > func2_score else "Function 2"
-    score_diff = abs(func1_score - func2_score)
-    
-    # Shorter comparative prompt
-    comparative_prompt = f"""Compare these functions (keep under 250 words):
-
-Function 1 (Score: {func1_score:.2f}):
-```python
-{func1_code}
-```
-
-Function 2 (Score: {func2_score:.2f}):
-```python  
-{func2_code}
-```
-
-{better_func} wins by {score_diff:.2f} points.
-
-Provide:
-1. Winner and why
-2. Key performance differences
-3. When to use each
-4. Main optimization opportunity
-
-Be concise."""
-
-    return request_ollama(comparative_prompt, ollama_host)
-
-# Parallel AI feedback generation for faster processing
-def generate_ai_feedback_async(user_id: str, user_data: Dict[str, Dict[str, Any]], user_ai_status: Dict[str, Dict[str, Any]]):
-    """
-    Generate AI feedback for a specific user asynchronously with parallel processing
-    """
-    result = user_data.get(user_id, {})
-    ai_feedback_status = user_ai_status.get(user_id, {})
-    
-    if not result or not ai_feedback_status:
-        print(f"Warning: No data found for user {user_id}")
-        return
-    
+async def get_comparative_feedback(func1_code: str, func2_code: str, func1_times: list[float], func2_times: list[float], func1_score: float, func2_score: float,
+                                   tracer: Tracer = NULL_TRACER, lane: Optional[str] = None) -> str:
+    with tracer.span("build prompt", "ai", lane=lane):
+        prompt, options = build_comparative_prompt(func1_code, func2_code, func1_score, func2_score)
+    return await request_ollama_async(prompt, options=options, tracer=tracer, lane=lane)
+
+# Fallback shown for each feedback that did not finish in time
+TIMEOUT_MESSAGES = {
+    "AI_Feedback1": "AI feedback timed out. Please try refreshing.",
+    "AI_Feedback2": "AI feedback timed out. Please try refreshing.",
+    "Comparative_Feedback": "Comparative feedback timed out. Please try refreshing.",
+}
+
+async def _generate_ai_feedback(user_id: str, result: Dict[str, Any], ai_feedback_status: Dict[str, Any],
+                                tracer: Tracer = NULL_TRACER):
+    """Run the three feedback generations concurrently under one shared deadline"""
+    with tracer.span("ai feedback", "ai"):
+        await _run_feedback_jobs(user_id, result, ai_feedback_status, tracer)
+
+async def _run_feedback_jobs(user_id: str, result: Dict[str, Any], ai_feedback_status: Dict[str, Any],
+                             tracer: Tracer):
     try:
         ai_feedback_status["status"] = "generating"
         ai_feedback_status["progress"] = 0
 
-        # Use ThreadPoolExecutor for parallel processing
-        with concurrent.futures.ThreadPoolExecutor(max_workers=3) as executor:
-            # Submit all three feedback requests concurrently
-            future_feedback1 = executor.submit(
-                get_ai_feedback,
-                result["Program1Code"], 
-                "Function 1", 
-                result["Func1Times"], 
-                result["Func1Score"]
-            )
-            
-            future_feedback2 = executor.submit(
-                get_ai_feedback,
-                result["Program2Code"], 
-                "Function 2", 
-                result["Func2Times"], 
-                result["Func2Score"]
-            )
-            
-            future_comparative = executor.submit(
-                get_comparative_feedback,
-                result["Program1Code"], 
-                result["Program2Code"], 
-                result["Func1Times"], 
-                result["Func2Times"], 
-                result["Func1Score"], 
-                result["Func2Score"]
-            )
-            
-            # Update progress as tasks complete
-            ai_feedback_status["progress"] = 10
-            
-            # Wait for all tasks to complete with timeout
-            try:
-                # Get results with timeout
-                result["AI_Feedback1"] = get_html(future_feedback1.result(timeout=50))
-                ai_feedback_status["progress"] = 40
-                
-                result["AI_Feedback2"] = get_html(future_feedback2.result(timeout=50))
-                ai_feedback_status["progress"] = 70
-                
-                result["Comparative_Feedback"] = get_html(future_comparative.result(timeout=50))
-                ai_feedback_status["progress"] = 100
-                
-            except concurrent.futures.TimeoutError:
+        jobs = {
+            "AI_Feedback1": get_ai_feedback(result["Program1Code"], "Function 1",
+                                            result["Func1Times"], result["Func1Score"],
+                                            tracer, "AI_Feedback1"),
+            "AI_Feedback2": get_ai_feedback(result["Program2Code"], "Function 2",
+                                            result["Func2Times"], result["Func2Score"],
+                                            tracer, "AI_Feedback2"),
+            "Comparative_Feedback": get_comparative_feedback(result["Program1Code"], result["Program2Code"],
+                                                             result["Func1Times"], result["Func2Times"],
+                                                             result["Func1Score"], result["Func2Score"],
+                                                             tracer, "Comparative_Feedback"),
+        }
+        tasks = {key: asyncio.ensure_future(asyncio.wait_for(job, REQUEST_TIMEOUT)) for key, job in jobs.items()}
+        ai_feedback_status["progress"] = 10
+
+        # Update progress as tasks complete, all within one overall deadline
+        try:
+            for finished in asyncio.as_completed(list(tasks.values()), timeout=FEEDBACK_DEADLINE):
+                try:
+                    await finished
+                except asyncio.TimeoutError:
+                    pass  # This request hit its own deadline, reported below
+                ai_feedback_status["progress"] += 30
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            for task in tasks.values():
+                task.cancel()
+
+        timed_out = False
+        for key, task in tasks.items():
+            if task.done() and not task.cancelled() and task.exception() is None:
+                with tracer.span("render markdown", "ai", lane=key):
+                    result[key] = get_html(task.result())
+            else:
                 # Handle timeout gracefully
-                ai_feedback_status["status"] = "error"
-                ai_feedback_status["error"] = "AI feedback generation timed out"
-                
-                # Set fallback messages for any that didn't complete
-                if "AI_Feedback1" not in result:
-                    result["AI_Feedback1"] = "AI feedback timed out. Please try refreshing."
-                if "AI_Feedback2" not in result:
-                    result["AI_Feedback2"] = "AI feedback timed out. Please try refreshing."
-                if "Comparative_Feedback" not in result:
-                    result["Comparative_Feedback"] = "Comparative feedback timed out. Please try refreshing."
-                return
+                result[key] = TIMEOUT_MESSAGES[key]
+                timed_out = True
+
+        if timed_out:
+            ai_feedback_status["status"] = "error"
+            ai_feedback_status["error"] = "AI feedback generation timed out"
+            return
 
+        ai_feedback_status["progress"] = 100
         ai_feedback_status["status"] = "complete"
         print(f"AI feedback generation complete for user {user_id}!")
 
+    except asyncio.CancelledError:
+        ai_feedback_status["status"] = "cancelled"
+        print(f"AI feedback generation cancelled for user {user_id}")
+        raise
     except Exception as e:
         print(f"Error generating AI feedback for user {user_id}: {str(e)}")
         ai_feedback_status["status"] = "error"
@@ -201,7 +241,62 @@ def generate_ai_feedback_async(user_id: str, user_data: Dict[str, Dict[str, Any]
         result["AI_Feedback2"] = f"Error generating feedback: {str(e)}"
         result["Comparative_Feedback"] = f"Error generating feedback: {str(e)}"
 
+def generate_ai_feedback_async(user_id: str, user_data: Dict[str, Dict[str, Any]],
+                               user_ai_status: Dict[str, Dict[str, Any]],
+                               tracer: Tracer = NULL_TRACER) -> Optional[Future]:
+    """
+    Schedule AI feedback generation for a user on the shared event loop
+
+    Returns immediately; any earlier run for the same user is cancelled.
+
+    Args:
+        user_id: Unique identifier for the user
+        user_data: Dictionary containing all user data
+        user_ai_status: Dictionary containing all user AI feedback status data
+        tracer: Records prompt building, each LLM call and rendering, see utils.tracing
+
+    Returns:
+        Future of the feedback run, or None if the user has no benchmark data
+    """
+    result = user_data.get(user_id, {})
+    ai_feedback_status = user_ai_status.get(user_id, {})
+
+    if not result or not ai_feedback_status:
+        print(f"Warning: No data found for user {user_id}")
+        return None
+
+    cancel_ai_feedback(user_id)
+    future = asyncio.run_coroutine_threadsafe(
+        _generate_ai_feedback(user_id, result, ai_feedback_status, tracer), get_event_loop())
+    feedback_tasks[user_id] = future
+
+    def forget(done: Future):
+        if feedback_tasks.get(user_id) is done:
+            del feedback_tasks[user_id]
+    future.add_done_callback(forget)
+    return future
+
+def cancel_ai_feedback(user_id: str) -> bool:
+    """
+    Cancel a user's in-flight AI feedback generation
+
+    Args:
+        user_id: Unique identifier for the user
+
+    Returns:
+        bool: True if a running generation was cancelled
+    """
+    future = feedback_tasks.pop(user_id, None)
+    if future is None or future.done():
+        return False
+    return future.cancel()
+
 # Function to clear cache periodically (call this in your cleanup routine)
+def cache_size() -> int:
+    """Number of cached AI responses"""
+    with cache_lock:
+        return len(response_cache)
+
 def clear_cache():
     """Clear the response cache to free memory"""
     with cache_lock:
@@ -210,11 +305,9 @@ def clear_cache():
 
 # Function to warm up Ollama (call this during app startup)
 def warmup_ollama():
-    """Send a simple request to warm up Ollama"""
-    ollama_host = os.environ.get("OLLAMA_HOST")
+    """Preload the model now and keep it resident with periodic keep_alive pings"""
     try:
-        warmup_prompt = "Hello, this is a warmup request."
-        result = request_ollama(warmup_prompt, ollama_host)
-        print(f"Ollama warmup completed\nResponse: {result}")
+        ollama_manager.start(get_event_loop())
+        print(f"Ollama keep-warm started for {ollama_manager.model}")
     except Exception as e:
-        print(f"Ollama warmup failed: {e}")
\ No newline at end of file
+        print(f"Ollama warmup failed: {e}")
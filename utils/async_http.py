@@ -0,0 +1,184 @@
+import asyncio
+import json
+import ssl
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+class HTTPError(Exception):
+    """The HTTP exchange itself failed (connection, protocol or timeout)"""
+
+class HTTPStatusError(HTTPError):
+    """A streamed request was answered with a non-200 status"""
+
+    def __init__(self, status: int):
+        super().__init__(f"Unexpected status {status}")
+        self.status = status
+
+async def _read_headers(reader: asyncio.StreamReader) -> Tuple[int, Dict[str, str]]:
+    status_line = await reader.readline()
+    if not status_line:
+        raise HTTPError("Connection closed before a response was received")
+    try:
+        status = int(status_line.split()[1])
+    except (IndexError, ValueError):
+        raise HTTPError(f"Malformed status line: {status_line!r}")
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    return status, headers
+
+async def _read_body(reader: asyncio.StreamReader, headers: Dict[str, str]) -> bytes:
+    if headers.get("transfer-encoding", "").lower() == "chunked":
+        chunks = []
+        while True:
+            size_line = await reader.readline()
+            size = int(size_line.split(b";")[0].strip() or b"0", 16)
+            if size == 0:
+                await reader.readline()  # Trailing CRLF after the last chunk
+                break
+            chunks.append(await reader.readexactly(size))
+            await reader.readline()
+        return b"".join(chunks)
+    if "content-length" in headers:
+        return await reader.readexactly(int(headers["content-length"]))
+    return await reader.read()
+
+async def _iter_body(reader: asyncio.StreamReader, headers: Dict[str, str]) -> AsyncIterator[bytes]:
+    """Yield body data as it arrives instead of after the whole response"""
+    if headers.get("transfer-encoding", "").lower() == "chunked":
+        while True:
+            size_line = await reader.readline()
+            size = int(size_line.split(b";")[0].strip() or b"0", 16)
+            if size == 0:
+                await reader.readline()
+                return
+            yield await reader.readexactly(size)
+            await reader.readline()
+    remaining = int(headers["content-length"]) if "content-length" in headers else None
+    while remaining is None or remaining > 0:
+        data = await reader.read(65536 if remaining is None else min(remaining, 65536))
+        if not data:
+            return
+        if remaining is not None:
+            remaining -= len(data)
+        yield data
+
+def _build_request(method: str, url: str, payload: Optional[Dict[str, Any]]):
+    parts = urlsplit(url)
+    secure = parts.scheme == "https"
+    port = parts.port or (443 if secure else 80)
+    path = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+    body = json.dumps(payload).encode("utf-8") if payload is not None else b""
+    head = f"{method} {path} HTTP/1.1\r\nHost: {parts.netloc}\r\n"
+    if payload is not None:
+        head += f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n"
+    request = (head + "Connection: close\r\n\r\n").encode("latin-1") + body
+    return parts.hostname, port, secure, request
+
+async def _exchange(method: str, url: str, payload: Optional[Dict[str, Any]], timeout: float) -> Tuple[int, bytes]:
+    host, port, secure, request = _build_request(method, url, payload)
+
+    async def exchange() -> Tuple[int, bytes]:
+        reader, writer = await asyncio.open_connection(
+            host, port, ssl=ssl.create_default_context() if secure else None)
+        try:
+            writer.write(request)
+            await writer.drain()
+            status, headers = await _read_headers(reader)
+            return status, await _read_body(reader, headers)
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except Exception:
+                pass
+
+    try:
+        return await asyncio.wait_for(exchange(), timeout)
+    except asyncio.TimeoutError:
+        raise HTTPError(f"Request to {url} timed out after {timeout}s")
+    except (OSError, asyncio.IncompleteReadError, ValueError) as e:
+        raise HTTPError(str(e))
+
+async def post_json(url: str, payload: Dict[str, Any], timeout: float = 60) -> Tuple[int, bytes]:
+    """
+    POST a JSON document without blocking the event loop
+
+    A minimal HTTP/1.1 client on asyncio streams, so one loop thread can keep
+    many requests in flight without a thread per request.
+
+    Args:
+        url: http:// or https:// URL to post to
+        payload: JSON-serializable request body
+        timeout: Seconds allowed for the whole exchange
+
+    Returns:
+        Tuple of (status code, raw response body)
+
+    Raises:
+        HTTPError: If the connection or response is broken or times out
+    """
+    return await _exchange("POST", url, payload, timeout)
+
+async def get(url: str, timeout: float = 60) -> Tuple[int, bytes]:
+    """GET a URL without blocking the event loop, returning (status code, raw body)"""
+    return await _exchange("GET", url, None, timeout)
+
+async def post_json_stream(url: str, payload: Dict[str, Any], timeout: float = 60) -> AsyncIterator[Dict[str, Any]]:
+    """
+    POST a JSON document and yield each object of a newline-delimited JSON response
+
+    Objects are yielded as soon as their line arrives, so callers can see the
+    first token of a streamed generation long before the last one. Iterate
+    inside ``contextlib.aclosing`` so the connection is closed as soon as the
+    caller stops early, not when the generator is garbage collected.
+
+    Args:
+        url: http:// or https:// URL to post to
+        payload: JSON-serializable request body
+        timeout: Seconds allowed for the whole exchange
+
+    Yields:
+        Each decoded JSON object in the response body
+
+    Raises:
+        HTTPStatusError: If the response status is not 200
+        HTTPError: If the connection or response is broken or times out
+    """
+    host, port, secure, request = _build_request("POST", url, payload)
+    writer = None
+    try:
+        async with asyncio.timeout(timeout):
+            reader, writer = await asyncio.open_connection(
+                host, port, ssl=ssl.create_default_context() if secure else None)
+            writer.write(request)
+            await writer.drain()
+            status, headers = await _read_headers(reader)
+            if status != 200:
+                raise HTTPStatusError(status)
+
+            buffer = b""
+            async for data in _iter_body(reader, headers):
+                buffer += data
+                *lines, buffer = buffer.split(b"\n")
+                for line in lines:
+                    if line.strip():
+                        yield json.loads(line)
+            if buffer.strip():
+                yield json.loads(buffer)
+    except TimeoutError:
+        raise HTTPError(f"Request to {url} timed out after {timeout}s")
+    except (OSError, asyncio.IncompleteReadError, ValueError) as e:
+        raise HTTPError(str(e))
+    finally:
+        if writer is not None:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except Exception:
+                pass
@@ -1,108 +1,54 @@
+from typing import Dict, Any, Optional
 import time
-import numpy as np
-import math
-from typing import Dict, Any
 
-def benchmark(func1: str, func2: str, params_code: str) -> dict:
-    """Original synchronous benchmark function"""
-    func1Times = []
-    func2Times = []
-    try:
-        func1Compiled = compile(func1, "", "exec")
-    except Exception:
-        return 'Function 1 Crashed'
-    try:
-        func2Compiled = compile(func2, "", "exec")
-    except Exception:
-        return 'Function 2 Crashed'
+from utils.engine import BenchmarkConfig, BenchmarkEngine, BenchmarkError
+from utils.sinks import Sink, DictSink
+from utils.metrics import benchmark_queue_wait_seconds, benchmark_run_seconds
+from utils.tracing import NULL_TRACER, Tracer
+from utils.interpreters import compare_interpreters
 
-    # Create a global environment with common imports
-    global_env = {
-        '__builtins__': __builtins__,
-        'range': range,
-        'len': len,
-        'list': list,
-        'tuple': tuple,
-        'dict': dict,
-        'set': set,
-        'sum': sum,
-        'min': min,
-        'max': max,
-        'abs': abs,
-        'round': round,
-        'sorted': sorted,
-        'reversed': reversed,
-        'enumerate': enumerate,
-        'zip': zip,
-        'map': map,
-        'filter': filter,
-    }
-    
-    # Try to import common libraries that users might need
-    try:
-        global_env['np'] = np
-        global_env['numpy'] = np
-        global_env['array'] = np.array
-        global_env['arr'] = np.array  # Common shorthand
-    except ImportError:
-        pass
-    
-    try:
-        import random
-        global_env['random'] = random
-    except ImportError:
-        pass
-    
-    try:
-        import math
-        global_env['math'] = math
-    except ImportError:
-        pass
-    
-    local_vars = {}
+class UserDataSink(Sink):
+    """Store a finished benchmark in the web app's per-user result storage"""
+
+    def __init__(self, user_id: str, user_data: Dict[str, Dict[str, Any]], func1: str, func2: str,
+                 extra: Optional[Dict[str, Any]] = None):
+        self.user_id = user_id
+        self.user_data = user_data
+        self.func1 = func1
+        self.func2 = func2
+        self.extra = extra or {}
+
+    def emit(self, event: Dict[str, Any]) -> None:
+        if event["type"] != "result":
+            return
+        result = event["result"].to_dict()
+        result.update({
+            "Program1Code": self.func1,
+            "Program2Code": self.func2,
+            # Initialize AI feedback placeholders
+            "AI_Feedback1": "Analyzing function performance...",
+            "AI_Feedback2": "Analyzing function performance...",
+            "Comparative_Feedback": "Generating comparative analysis..."
+        })
+        result.update(self.extra)
+        self.user_data[self.user_id] = result
+
+def benchmark(func1: str, func2: str, params_code: str, config: Optional[BenchmarkConfig] = None) -> dict:
+    """Original synchronous benchmark function"""
     try:
-        exec(params_code, global_env, local_vars)
-        params = local_vars["params"]
-        iterations = len(params)
-    except Exception:
-        return 'Invalid Parameters'
-    
-    for i in range(iterations):
-        # Create scope for each function execution with common imports
-        local_scope = {"params": params[i]}
-        local_scope.update(global_env)  # Add common imports to local scope
-        
-        start = time.perf_counter()
-        try:
-            exec(func1Compiled, local_scope)
-        except Exception:
-            return 'Function 1 Crashed'
-        func1Times.append(time.perf_counter() - start)
-        
-        # Reset local scope for second function
-        local_scope = {"params": params[i]}
-        local_scope.update(global_env)
-        
-        start = time.perf_counter()
-        try:
-            exec(func2Compiled, local_scope)
-        except Exception:
-            return 'Function 2 Crashed'
-        func2Times.append(time.perf_counter() - start)
-    
-    func1Avg = sum(func1Times) / len(func1Times)
-    func2Avg = sum(func2Times) / len(func2Times)
-    
-    return {
-        "Func1Times": func1Times,
-        "Func2Times": func2Times,
-        "Func1Score": round(-math.log10(func1Avg) * 10, 3),
-        "Func2Score": round(-math.log10(func2Avg) * 10, 3)
-    }
+        result = BenchmarkEngine(config).run([func1, func2], params_code)
+    except BenchmarkError as e:
+        if e.kind == "params":
+            return 'Invalid Parameters'
+        if e.kind == "verify":
+            return 'Outputs Differ'
+        return f'Function {e.program} Crashed'
+    return result.to_dict()
 
 def benchmark_async(user_id: str, func1: str, func2: str, params_code: str, 
                    user_data: Dict[str, Dict[str, Any]], 
-                   user_benchmark_status: Dict[str, Dict[str, Any]]):
+                   user_benchmark_status: Dict[str, Dict[str, Any]],
+                   config: Optional[BenchmarkConfig] = None, tracer: Tracer = NULL_TRACER):
     """
     Asynchronous benchmark function that updates status as it progresses
     
@@ -113,6 +59,8 @@ def benchmark_async(user_id: str, func1: str, func2: str, params_code: str,
         params_code: Parameters code to execute
         user_data: Dictionary containing all user data
         user_benchmark_status: Dictionary containing all user benchmark status data
+        config: Engine settings, defaults to BenchmarkConfig()
+        tracer: Records the run's stages, see utils.tracing
     """
     
     # Get user-specific status
@@ -122,176 +70,48 @@ def benchmark_async(user_id: str, func1: str, func2: str, params_code: str,
         print(f"Warning: No benchmark status found for user {user_id}")
         return
     
-    try:
-        # Update status to running
-        status["status"] = "running"
-        status["progress"] = 5
-        status["message"] = "Compiling functions..."
-        
-        func1Times = []
-        func2Times = []
-        
-        # Compile functions
-        try:
-            func1Compiled = compile(func1, "", "exec")
-            status["progress"] = 10
-        except Exception as e:
-            status["status"] = "error"
-            status["error"] = f"Function 1 compilation error: {str(e)}"
-            print(f"Function 1 compilation error for user {user_id}: {str(e)}")
-            return
-            
-        try:
-            func2Compiled = compile(func2, "", "exec")
-            status["progress"] = 15
-        except Exception as e:
-            status["status"] = "error"
-            status["error"] = f"Function 2 compilation error: {str(e)}"
-            print(f"Function 2 compilation error for user {user_id}: {str(e)}")
-            return
+    if status.get("queued_at"):
+        benchmark_queue_wait_seconds.observe(max(time.time() - status["queued_at"], 0))
+    start = time.perf_counter()
 
-        # Create a global environment with common imports
-        global_env = {
-            '__builtins__': __builtins__,
-            'range': range,
-            'len': len,
-            'list': list,
-            'tuple': tuple,
-            'dict': dict,
-            'set': set,
-            'sum': sum,
-            'min': min,
-            'max': max,
-            'abs': abs,
-            'round': round,
-            'sorted': sorted,
-            'reversed': reversed,
-            'enumerate': enumerate,
-            'zip': zip,
-            'map': map,
-            'filter': filter,
-        }
-        
-        # Try to import common libraries that users might need
-        try:
-            global_env['np'] = np
-            global_env['numpy'] = np
-            global_env['array'] = np.array
-            global_env['arr'] = np.array  # Common shorthand
-        except ImportError:
-            pass
-        
-        try:
-            import random
-            global_env['random'] = random
-        except ImportError:
-            pass
-        
-        try:
-            import math
-            global_env['math'] = math
-        except ImportError:
-            pass
-        
-        # Parse parameters
-        status["message"] = "Parsing parameters..."
-        local_vars = {}
-        try:
-            exec(params_code, global_env, local_vars)
-            params = local_vars["params"]
-            iterations = len(params)
-            status["total_tests"] = iterations
-            status["progress"] = 20
-        except Exception as e:
-            status["status"] = "error"
-            status["error"] = f"Invalid parameters: {str(e)}"
-            print(f"Parameter parsing error for user {user_id}: {str(e)}")
-            return
-        
-        # Run benchmarks
-        status["message"] = "Running benchmark tests..."
-        
-        for i in range(iterations):
-            status["current_test"] = i + 1
-            status["message"] = f"Running test {i + 1} of {iterations}..."
-            
-            # Calculate progress (20% to 90% for tests)
-            test_progress = 20 + int((i / iterations) * 70)
-            status["progress"] = test_progress
-            
-            # Create scope for each function execution with common imports
-            local_scope = {"params": params[i]}
-            local_scope.update(global_env)  # Add common imports to local scope
-            
-            # Test Function 1
-            start = time.perf_counter()
-            try:
-                exec(func1Compiled, local_scope)
-            except Exception as e:
-                status["status"] = "error"
-                status["error"] = f"Function 1 crashed on test {i + 1}: {str(e)}"
-                print(f"Function 1 runtime error for user {user_id} on test {i + 1}: {str(e)}")
-                return
-            func1Times.append(time.perf_counter() - start)
-            
-            # Reset local scope for second function
-            local_scope = {"params": params[i]}
-            local_scope.update(global_env)
-            
-            # Test Function 2
-            start = time.perf_counter()
-            try:
-                exec(func2Compiled, local_scope)
-            except Exception as e:
-                status["status"] = "error"
-                status["error"] = f"Function 2 crashed on test {i + 1}: {str(e)}"
-                print(f"Function 2 runtime error for user {user_id} on test {i + 1}: {str(e)}")
-                return
-            func2Times.append(time.perf_counter() - start)
-        
-        # Calculate results
-        status["message"] = "Calculating results..."
-        status["progress"] = 90
-        
-        func1Avg = sum(func1Times) / len(func1Times)
-        func2Avg = sum(func2Times) / len(func2Times)
-        
-        # Store results in user_data
-        result = {
-            "Func1Times": func1Times,
-            "Func2Times": func2Times,
-            "Func1Score": round(-math.log10(func1Avg) * 10, 3),
-            "Func2Score": round(-math.log10(func2Avg) * 10, 3),
-            "Program1Code": func1,
-            "Program2Code": func2,
-            # Initialize AI feedback placeholders
-            "AI_Feedback1": "Analyzing function performance...",
-            "AI_Feedback2": "Analyzing function performance...",
-            "Comparative_Feedback": "Generating comparative analysis..."
-        }
-        
-        user_data[user_id] = result
-        
-        # Update final status
-        status["status"] = "complete"
-        status["progress"] = 100
-        status["message"] = "Benchmark completed successfully!"
-        status["current_test"] = iterations
-        
-        print(f"Benchmark completed for user {user_id}")
-        
-        # Initialize AI status for this user
-        from utils.flask_utils import user_ai_status
-        user_ai_status[user_id] = {
-            "status": "pending",
-            "progress": 0,
-            "error": None
-        }
-        
+    # Results are stored before the status flips to complete, so pollers never see a gap
+    extra = {}
+    engine = BenchmarkEngine(config, sinks=[UserDataSink(user_id, user_data, func1, func2, extra), DictSink(status)],
+                             tracer=tracer)
+    try:
+        # Other interpreters run first, so their results are stored together with this run's
+        if config is not None and config.compare_interpreters:
+            status["status"] = "running"
+            with tracer.span("compare interpreters", "engine"):
+                extra["Interpreters"] = compare_interpreters(
+                    config.compare_interpreters, [func1, func2], params_code, config,
+                    lambda message: status.update(message=message))
+        with tracer.span("benchmark", "engine"):
+            result = engine.run([func1, func2], params_code)
+    except BenchmarkError as e:
+        benchmark_run_seconds.observe(time.perf_counter() - start, outcome=e.kind)
+        print(f"Benchmark error for user {user_id}: {str(e)}")
+        return
     except Exception as e:
+        benchmark_run_seconds.observe(time.perf_counter() - start, outcome="unexpected")
         print(f"Unexpected error during benchmark for user {user_id}: {str(e)}")
         status["status"] = "error"
         status["error"] = f"Unexpected error: {str(e)}"
+        return
+    benchmark_run_seconds.observe(time.perf_counter() - start, outcome="success")
+
+    if result.mutated:
+        mutated = ", ".join(f"{program.name} tests {program.mutated}" for program in result.programs)
+        print(f"Input mutation detected for user {user_id}: {mutated}")
+    print(f"Benchmark completed for user {user_id}")
+    
+    # Initialize AI status for this user
+    from utils.flask_utils import user_ai_status
+    user_ai_status[user_id] = {
+        "status": "pending",
+        "progress": 0,
+        "error": None
+    }
 
 
 if __name__ == '__main__':
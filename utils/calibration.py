@@ -0,0 +1,52 @@
+import math
+import os
+from dataclasses import dataclass
+from typing import List, Sequence
+
+# Empty-program tests timed per run to measure the harness floor. Each one repeats the
+# real tests' warmup, collection and timed calls, so the floor is comparable per test.
+# At least one: the floor is reported and subtracted whenever a run has results
+CALIBRATION_TESTS = max(int(os.environ.get("BENCHMARK_CALIBRATION_TESTS", 20)), 1)
+
+# Slowest fraction of calibration tests dropped as interrupts rather than harness cost
+CALIBRATION_TRIM = 0.1
+
+# A test within this many standard deviations of the floor is indistinguishable from it
+NOISE_SIGMAS = 3.0
+
+# What the harness times when the program does nothing: exec dispatch and the timer calls themselves
+EMPTY_PROGRAM = compile("", "<calibration>", "exec")
+
+@dataclass
+class HarnessFloor:
+    """Per-test time of an empty program, in seconds per call"""
+    mean: float
+    std: float
+    tests: int
+
+    @property
+    def threshold(self) -> float:
+        """Test times at or below this are within noise of the floor"""
+        return self.mean + NOISE_SIGMAS * self.std
+
+    def within_noise(self, seconds: float) -> bool:
+        return seconds <= self.threshold
+
+    def subtract(self, seconds: float) -> float:
+        """A measurement with the floor taken out, never below zero"""
+        return max(seconds - self.mean, 0.0)
+
+def summarize_floor(samples: Sequence[float]) -> HarnessFloor:
+    """
+    Mean and standard deviation of calibration test times
+
+    Args:
+        samples: Seconds per call of each empty-program test
+
+    Returns:
+        HarnessFloor over the samples, without the slowest CALIBRATION_TRIM of them
+    """
+    kept: List[float] = sorted(samples)[:max(1, math.ceil(len(samples) * (1 - CALIBRATION_TRIM)))]
+    mean = sum(kept) / len(kept)
+    variance = sum((sample - mean) ** 2 for sample in kept) / max(len(kept) - 1, 1)
+    return HarnessFloor(mean, math.sqrt(variance), len(kept))
@@ -0,0 +1,175 @@
+import ctypes
+import os
+import platform
+import struct
+from typing import Dict, List, Optional
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+# perf_event_open syscall numbers by architecture
+_PERF_EVENT_OPEN = {
+    "x86_64": 298,
+    "amd64": 298,
+    "aarch64": 241,
+    "arm64": 241,
+    "i386": 336,
+    "i686": 336,
+    "armv7l": 364,
+    "ppc64le": 319,
+    "s390x": 331,
+}
+
+# Generic hardware events (PERF_TYPE_HARDWARE) recorded per test
+PERF_TYPE_HARDWARE = 0
+HARDWARE_EVENTS = {
+    "cycles": 0,
+    "instructions": 1,
+    "cache_misses": 3,
+    "branch_misses": 5,
+}
+
+# Display names of every recorded counter, in display order
+COUNTER_LABELS = {
+    "user_time": "User CPU time (s)",
+    "system_time": "System CPU time (s)",
+    "minor_faults": "Minor page faults",
+    "major_faults": "Major page faults",
+    "voluntary_switches": "Voluntary context switches",
+    "involuntary_switches": "Involuntary context switches",
+    "instructions": "Instructions",
+    "cycles": "CPU cycles",
+    "ipc": "Instructions per cycle",
+    "cache_misses": "Cache misses",
+    "branch_misses": "Branch misses",
+}
+
+_PERF_FLAG_EXCLUDE_KERNEL = 1 << 5
+_PERF_FLAG_EXCLUDE_HV = 1 << 6
+_PERF_ATTR_SIZE_VER0 = 64
+
+class _PerfEventAttr(ctypes.Structure):
+    # First 64 bytes of struct perf_event_attr (PERF_ATTR_SIZE_VER0)
+    _fields_ = [
+        ("type", ctypes.c_uint32),
+        ("size", ctypes.c_uint32),
+        ("config", ctypes.c_uint64),
+        ("sample_period", ctypes.c_uint64),
+        ("sample_type", ctypes.c_uint64),
+        ("read_format", ctypes.c_uint64),
+        ("flags", ctypes.c_uint64),
+        ("wakeup_events", ctypes.c_uint32),
+        ("bp_type", ctypes.c_uint32),
+        ("config1", ctypes.c_uint64),
+    ]
+
+class PerfCounters:
+    """
+    Hardware performance counters of the calling thread via Linux perf_event
+
+    Counters are user-space only so they work with the default
+    ``perf_event_paranoid`` setting. Use :meth:`open` rather than the
+    constructor; it returns None where perf_event is unavailable.
+    """
+
+    def __init__(self, fds: Dict[str, int]):
+        self.fds = fds
+
+    @classmethod
+    def open(cls) -> Optional["PerfCounters"]:
+        """
+        Open one counter per HARDWARE_EVENTS entry for the calling thread
+
+        Returns:
+            PerfCounters, or None if the platform or kernel does not allow it
+        """
+        syscall_number = _PERF_EVENT_OPEN.get(platform.machine().lower())
+        if platform.system() != "Linux" or syscall_number is None:
+            return None
+        try:
+            libc = ctypes.CDLL(None, use_errno=True)
+        except OSError:
+            return None
+
+        fds = {}
+        for name, config in HARDWARE_EVENTS.items():
+            attr = _PerfEventAttr(type=PERF_TYPE_HARDWARE, size=_PERF_ATTR_SIZE_VER0, config=config,
+                                  flags=_PERF_FLAG_EXCLUDE_KERNEL | _PERF_FLAG_EXCLUDE_HV)
+            # pid=0, cpu=-1: this thread on any CPU; no group, no flags
+            fd = libc.syscall(syscall_number, ctypes.byref(attr), 0, -1, -1, 0)
+            if fd >= 0:
+                fds[name] = fd
+        if not fds:
+            return None
+        return cls(fds)
+
+    def read(self) -> Dict[str, int]:
+        """Current value of every open counter"""
+        values = {}
+        for name, fd in self.fds.items():
+            values[name] = struct.unpack("Q", os.read(fd, 8))[0]
+        return values
+
+    def close(self) -> None:
+        for fd in self.fds.values():
+            os.close(fd)
+        self.fds = {}
+
+def rusage_snapshot() -> Dict[str, float]:
+    """
+    CPU time, page faults and context switches of the calling thread so far
+
+    Returns:
+        Dict of resource usage values, empty where getrusage is unavailable
+    """
+    if resource is None:
+        return {}
+    usage = resource.getrusage(getattr(resource, "RUSAGE_THREAD", resource.RUSAGE_SELF))
+    return {
+        "user_time": usage.ru_utime,
+        "system_time": usage.ru_stime,
+        "minor_faults": usage.ru_minflt,
+        "major_faults": usage.ru_majflt,
+        "voluntary_switches": usage.ru_nvcsw,
+        "involuntary_switches": usage.ru_nivcsw,
+    }
+
+class CounterSampler:
+    """Takes before/after snapshots of rusage and hardware counters around a call"""
+
+    def __init__(self):
+        self.perf = PerfCounters.open()
+
+    def snapshot(self) -> Dict[str, float]:
+        values = rusage_snapshot()
+        if self.perf is not None:
+            values.update(self.perf.read())
+        return values
+
+    @staticmethod
+    def delta(before: Dict[str, float], after: Dict[str, float]) -> Dict[str, float]:
+        return {name: after[name] - before[name] for name in before}
+
+    def close(self) -> None:
+        if self.perf is not None:
+            self.perf.close()
+
+def summarize_counters(per_test: List[Dict[str, float]]) -> Dict[str, float]:
+    """
+    Average counters across tests and derive instructions per cycle
+
+    Args:
+        per_test: Counter deltas per timed call of each test
+
+    Returns:
+        Dict of average counter values per test, plus "ipc" when available
+    """
+    tests = [counters for counters in per_test if counters]
+    if not tests:
+        return {}
+    summary = {name: sum(counters.get(name, 0) for counters in tests) / len(tests) for name in tests[0]}
+    if summary.get("cycles"):
+        summary["ipc"] = summary.get("instructions", 0) / summary["cycles"]
+    return summary
@@ -0,0 +1,588 @@
+import gc
+import math
+import os
+import time
+from dataclasses import dataclass, field, asdict, fields
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+from utils.calibration import CALIBRATION_TESTS, EMPTY_PROGRAM, HarnessFloor, summarize_floor
+from utils.inputs import INPUT_MODES, make_input_provider, fingerprint
+from utils.namespace import DEFAULT_PRELOADED_MODULES, build_base_namespace, build_params, iterate_params, load_params
+from utils.params_cache import get_params_cache, params_key
+from utils.scaling import MAX_SCALING_WORKERS, SCALING_MODES
+from utils.counters import CounterSampler
+from utils.noise import GC_MODES, controlled_interpreter, gc_collections, context_switches
+from utils.sinks import Sink, broadcast
+from utils.tracing import NULL_TRACER, Tracer
+from utils.verify import (DEFAULT_ATOL, DEFAULT_RTOL, MissingResultError, capture_result,
+                          describe_output, outputs_match)
+
+# Timers available to the engine, all returning integer nanoseconds
+TIMERS: Dict[str, Callable[[], int]] = {
+    "perf_counter_ns": time.perf_counter_ns,
+    "process_time": time.process_time_ns,
+    "thread_time": time.thread_time_ns,
+}
+
+# "inline": run in the calling thread; "sandbox": run in a warm sandboxed worker process (utils.sandbox)
+EXECUTORS = ("inline", "sandbox")
+DEFAULT_EXECUTOR = os.environ.get("BENCHMARK_EXECUTOR", "inline")
+
+@dataclass
+class BenchmarkConfig:
+    """Explicit settings for one benchmark run"""
+    repeats: int = 1                # Timed calls per program per test input
+    warmup: int = 0                 # Untimed calls per program per test input before timing
+    timer: str = "perf_counter_ns"  # Key into TIMERS
+    input_mode: str = "copy"        # One of INPUT_MODES
+    detect_mutation: bool = False   # Hash inputs before/after each call
+    gc_mode: str = "disabled"       # One of GC_MODES
+    switch_interval: Optional[float] = None  # Raised sys.setswitchinterval while timing, in seconds
+    counters: bool = False          # Record CPU time, page faults and hardware counters per test
+    verify: bool = False            # Check every program's `result` matches program 1 before timing
+    verify_rtol: float = DEFAULT_RTOL
+    verify_atol: float = DEFAULT_ATOL
+    subtract_floor: bool = False    # Take the calibrated harness floor out of every timing
+    preloaded_modules: Tuple[str, ...] = DEFAULT_PRELOADED_MODULES
+    params_seed: Optional[int] = None  # Seed random and numpy.random before the parameters code runs
+    cache_params: bool = True       # Reuse built parameters from the params cache (utils.params_cache), seeded only
+    executor: str = DEFAULT_EXECUTOR  # One of EXECUTORS
+    interpreter: Optional[str] = None  # Configured interpreter to run in (utils.interpreters), None for this one
+    compare_interpreters: Tuple[str, ...] = ()  # Other configured interpreters to run the same job on
+    scaling_workers: int = 0        # Also measure throughput at 1..N threads and processes, 0 to skip
+    scaling_duration: float = 0.5   # Seconds of load per worker count
+    scaling_modes: Tuple[str, ...] = SCALING_MODES
+
+    def __post_init__(self):
+        self.repeats = int(self.repeats)
+        self.warmup = int(self.warmup)
+        self.preloaded_modules = tuple(self.preloaded_modules)
+        self.compare_interpreters = tuple(self.compare_interpreters)
+        self.scaling_workers = int(self.scaling_workers)
+        self.scaling_duration = float(self.scaling_duration)
+        self.scaling_modes = tuple(self.scaling_modes)
+        if self.repeats < 1:
+            raise ValueError("repeats must be at least 1")
+        if self.warmup < 0:
+            raise ValueError("warmup cannot be negative")
+        if self.timer not in TIMERS:
+            raise ValueError(f"Unknown timer: {self.timer}")
+        if self.input_mode not in INPUT_MODES:
+            raise ValueError(f"Unknown input mode: {self.input_mode}")
+        if self.gc_mode not in GC_MODES:
+            raise ValueError(f"Unknown GC mode: {self.gc_mode}")
+        if self.switch_interval is not None:
+            self.switch_interval = float(self.switch_interval)
+        if self.params_seed is not None:
+            self.params_seed = int(self.params_seed)
+        if self.executor not in EXECUTORS:
+            raise ValueError(f"Unknown executor: {self.executor}")
+        if not 0 <= self.scaling_workers <= MAX_SCALING_WORKERS:
+            raise ValueError(f"scaling_workers must be between 0 and {MAX_SCALING_WORKERS}")
+        if self.scaling_duration <= 0:
+            raise ValueError("scaling_duration must be positive")
+        for mode in self.scaling_modes:
+            if mode not in SCALING_MODES:
+                raise ValueError(f"Unknown scaling mode: {mode}")
+        if self.executor == "sandbox" and (self.interpreter or self.compare_interpreters):
+            # The runner is a plain child process of the web app, without the sandbox's user and limits
+            raise ValueError("Other interpreters run outside the sandbox and cannot be used with the sandbox executor")
+
+    @classmethod
+    def from_dict(cls, data: Optional[Mapping[str, Any]]) -> "BenchmarkConfig":
+        """Build a config from a plain mapping, ignoring unknown keys"""
+        names = {f.name for f in fields(cls)}
+        return cls(**{k: v for k, v in (data or {}).items() if k in names})
+
+    @property
+    def uses_params_cache(self) -> bool:
+        """
+        Whether built parameters are shared through the params cache
+
+        Only seeded parameters are: unseeded ones are meant to differ between
+        runs, and caching them would hand every user the first user's inputs.
+        """
+        return self.cache_params and self.params_seed is not None
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data["preloaded_modules"] = list(self.preloaded_modules)
+        data["compare_interpreters"] = list(self.compare_interpreters)
+        data["scaling_modes"] = list(self.scaling_modes)
+        return data
+
+@dataclass
+class ProgramResult:
+    """Timings of one program across every test input"""
+    name: str
+    times: List[float] = field(default_factory=list)          # Seconds per test, mean of repeats
+    samples: List[List[float]] = field(default_factory=list)  # Seconds of every timed call per test
+    mutated: List[int] = field(default_factory=list)          # 1-based tests where the input was mutated
+    gc_collections: List[int] = field(default_factory=list)   # GC collections during the timed calls per test
+    context_switches: List[Optional[int]] = field(default_factory=list)  # Thread context switches per test
+    counters: List[Dict[str, float]] = field(default_factory=list)  # Counter deltas per timed call per test, if enabled
+    near_floor: List[int] = field(default_factory=list)       # 1-based tests timed within noise of the harness floor
+    scaling: List[Dict[str, Any]] = field(default_factory=list)  # Throughput points from utils.scaling, if enabled
+
+    @property
+    def average(self) -> float:
+        return sum(self.times) / len(self.times)
+
+    @property
+    def score(self) -> float:
+        # Guard against zero readings from coarse CPU-time clocks
+        return round(-math.log10(max(self.average, 1e-9)) * 10, 3)
+
+@dataclass
+class BenchmarkResult:
+    """Structured outcome of a benchmark run"""
+    programs: List[ProgramResult]
+    config: BenchmarkConfig
+    total_tests: int = 0
+    floor: Optional[HarnessFloor] = None  # Calibrated cost of timing an empty program
+
+    @property
+    def mutated(self) -> bool:
+        return any(program.mutated for program in self.programs)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Flatten into the ``Func<N>...`` keys used by the web app and templates
+
+        Returns:
+            Dict with per-program times, scores and mutation info plus the config
+        """
+        data: Dict[str, Any] = {}
+        for i, program in enumerate(self.programs, start=1):
+            data[f"Func{i}Times"] = program.times
+            data[f"Func{i}Score"] = program.score
+            data[f"Func{i}Mutated"] = program.mutated
+            data[f"Func{i}Samples"] = program.samples
+            data[f"Func{i}GCCollections"] = program.gc_collections
+            data[f"Func{i}ContextSwitches"] = program.context_switches
+            data[f"Func{i}Counters"] = program.counters
+            data[f"Func{i}NearFloor"] = program.near_floor
+            data[f"Func{i}Scaling"] = program.scaling
+        data["HarnessFloor"] = asdict(self.floor) if self.floor else None
+        data["InputMode"] = self.config.input_mode
+        data["Config"] = self.config.to_dict()
+        return data
+
+    def to_plain(self) -> Dict[str, Any]:
+        """JSON-safe form that from_plain turns back into a BenchmarkResult"""
+        return {"programs": [asdict(program) for program in self.programs], "config": self.config.to_dict(),
+                "total_tests": self.total_tests, "floor": asdict(self.floor) if self.floor else None}
+
+    @classmethod
+    def from_plain(cls, data: Mapping[str, Any]) -> "BenchmarkResult":
+        floor = data.get("floor")
+        return cls([ProgramResult(**program) for program in data["programs"]],
+                   BenchmarkConfig.from_dict(data["config"]), data.get("total_tests", 0),
+                   HarnessFloor(**floor) if floor else None)
+
+@dataclass
+class CallMeasurement:
+    """What was observed during one timed call"""
+    elapsed: int                    # Timer nanoseconds
+    mutated: bool
+    gc_collections: int
+    context_switches: Optional[int]
+    counters: Dict[str, float]
+
+# What a BenchmarkError can be about
+BENCHMARK_ERROR_KINDS = ("compile", "params", "verify", "runtime")
+
+class BenchmarkError(Exception):
+    """A benchmark run that could not complete"""
+
+    def __init__(self, message: str, kind: str, program: Optional[int] = None, test: Optional[int] = None):
+        super().__init__(message)
+        self.kind = kind          # One of BENCHMARK_ERROR_KINDS
+        self.program = program    # 1-based program number, if a program failed
+        self.test = test          # 1-based test number, if a test failed
+
+class BenchmarkEngine:
+    """
+    Runs programs against generated parameters and reports to pluggable sinks
+
+    Both the web app and batch runners drive benchmarks through this class; the
+    caller decides where progress and results go by choosing sinks.
+    """
+
+    def __init__(self, config: Optional[BenchmarkConfig] = None, sinks: Iterable[Sink] = (),
+                 tracer: Tracer = NULL_TRACER):
+        self.config = config or BenchmarkConfig()
+        self.sinks = list(sinks)
+        self.tracer = tracer
+        self._sampler: Optional[CounterSampler] = None
+
+    def _emit(self, **event: Any) -> None:
+        broadcast(self.sinks, event)
+
+    def _fail(self, message: str, kind: str, program: Optional[int] = None, test: Optional[int] = None):
+        self._emit(type="error", error=message)
+        raise BenchmarkError(message, kind, program, test)
+
+    def _measure(self, compiled, get_input: Callable[[], Any], namespace: Mapping[str, Any],
+                 timer: Callable[[], int]) -> CallMeasurement:
+        """Run one call in a fresh scope and time it"""
+        local_scope = namespace.copy()  # Clone of the prebuilt namespace
+        local_scope["params"] = get_input()
+        before = fingerprint(local_scope["params"]) if self.config.detect_mutation else None
+        collections = gc_collections()
+        switches = context_switches()
+        sampler = self._sampler
+        counters = sampler.snapshot() if sampler else None
+
+        start = timer()
+        exec(compiled, local_scope)
+        elapsed = timer() - start
+
+        counters = sampler.delta(counters, sampler.snapshot()) if sampler else {}
+        collections = gc_collections() - collections
+        if switches is not None:
+            switches = context_switches() - switches
+        mutated = before is not None and fingerprint(local_scope["params"]) != before
+        return CallMeasurement(elapsed, mutated, collections, switches, counters)
+
+    def run(self, programs: Sequence[str], params_code: str) -> BenchmarkResult:
+        """
+        Benchmark each program against every generated parameter set
+
+        Args:
+            programs: Source code of the programs to compare
+            params_code: Parameters code defining ``params``
+
+        Returns:
+            BenchmarkResult with per-program timings
+
+        Raises:
+            BenchmarkError: If a program fails to compile or crashes, or the parameters are invalid
+        """
+        config = self.config
+        tracer = self.tracer
+
+        self._emit(type="status", status="running")
+        if config.interpreter:
+            return self._run_on_interpreter(programs, params_code)
+        self._emit(type="progress", progress=5, message="Compiling functions...")
+
+        # Compile programs
+        compiled = []
+        for number, source in enumerate(programs, start=1):
+            try:
+                with tracer.span("compile", "engine", program=number):
+                    compiled.append(compile(source, "", "exec"))
+            except Exception as e:
+                self._fail(f"Function {number} compilation error: {str(e)}", "compile", number)
+            self._emit(type="progress", progress=5 + int(10 * number / len(programs)))
+
+        if config.executor == "sandbox":
+            # Imported here, the sandbox module itself builds on the engine
+            from utils.sandbox import SandboxError, get_sandbox_pool
+            pool = get_sandbox_pool()
+            shared = None
+            try:
+                descriptor = None
+                # Scaling runs the programs in further workers, which all take the same inputs
+                if config.uses_params_cache or config.scaling_workers:
+                    descriptor, shared = self._sandbox_params(pool, params_code)
+                with tracer.span("sandbox run", "engine"):
+                    result = pool.run(compiled, params_code, config, self._emit, params=descriptor)
+                if config.scaling_workers:
+                    self._run_scaling(compiled, params_code, result, descriptor, publish=False)
+            except SandboxError as e:
+                self._fail(str(e), "runtime")
+            finally:
+                if shared is not None:
+                    shared.close()
+            # The worker forwards progress only; the result is emitted here, in the caller's process
+            result.config = config
+            self._emit(type="result", result=result)
+            return result
+        return self.run_compiled(compiled, params_code)
+
+    def _sandbox_params(self, pool: Any, params_code: str) -> Tuple[Optional[Dict[str, Any]], Any]:
+        """
+        Parameters for sandbox workers, built once per run and shared by all of them
+
+        Cached parameters are used when the run may use the params cache.
+        Otherwise the parameters are built in a worker and published to shared
+        memory, so every worker of the run attaches to them instead of running
+        the parameters code again. Sandbox workers cannot write files, so when
+        caching is on the cache entry is written from the published segment,
+        marked untrusted so only other workers ever unpickle it.
+
+        Returns:
+            Tuple of (descriptor for the workers or None to build from code, shared segment to close or None)
+        """
+        from utils.shared_params import ParamsNotShareable
+        config = self.config
+        cache = get_params_cache() if config.uses_params_cache else None
+        if cache is not None:
+            key = params_key(params_code, config.params_seed, config.preloaded_modules)
+            descriptor = cache.lookup(key)
+            if descriptor is not None:
+                return descriptor, None
+        try:
+            with self.tracer.span("build params", "params", sandbox=True):
+                shared = pool.publish_params(params_code, config)
+        except ParamsNotShareable:
+            return None, None
+        except BenchmarkError as e:
+            self._fail(str(e), e.kind)
+        if cache is None:
+            return shared.descriptor, shared
+        regions = [shared.region(index) for index in range(len(shared.sizes))]
+        try:
+            cache.store(key, regions, shared.count, untrusted=True)
+        finally:
+            for region in regions:
+                region.release()
+        return shared.descriptor, shared
+
+    def _run_scaling(self, compiled: List[Any], params_code: str, result: BenchmarkResult,
+                     descriptor: Optional[Dict[str, Any]] = None, publish: bool = True) -> None:
+        """
+        Measure every program's throughput under concurrent load into ``result``
+
+        Args:
+            compiled: Code objects of the programs
+            params_code: Parameters code defining ``params``
+            result: Result of the timed run, given each program's scaling points
+            descriptor: Parameters already published for this run
+            publish: Publish the parameters once for every load worker when no descriptor is given
+        """
+        # Imported here, the sandbox module itself builds on the engine
+        from utils.sandbox import SandboxError, get_sandbox_pool
+        from utils.scaling import measure_scaling
+        config = self.config
+        pool = get_sandbox_pool()
+        shared = None
+        try:
+            if descriptor is None and publish:
+                descriptor, shared = self._sandbox_params(pool, params_code)
+            for number, (code, program) in enumerate(zip(compiled, result.programs), start=1):
+                def on_point(mode: str, workers: int, number: int = number) -> None:
+                    self._emit(type="progress", message=f"Measuring Function {number} with {workers} {mode}...")
+                with self.tracer.span(f"scaling {program.name}", "engine", workers=config.scaling_workers):
+                    program.scaling = measure_scaling(pool, code, params_code, config, descriptor, on_point)
+        except SandboxError as e:
+            self._fail(f"Scaling run failed: {str(e)}", "runtime")
+        finally:
+            if shared is not None:
+                shared.close()
+
+    def _run_on_interpreter(self, programs: Sequence[str], params_code: str) -> BenchmarkResult:
+        """Hand the whole run, compilation included, to another Python interpreter"""
+        # Imported here, the interpreters module itself builds on the engine
+        from utils.interpreters import InterpreterError, run_on_interpreter
+        config = self.config
+        try:
+            with self.tracer.span("interpreter run", "engine", interpreter=config.interpreter):
+                result = run_on_interpreter(config.interpreter, programs, params_code, config, self._emit)
+        except InterpreterError as e:
+            self._fail(str(e), "runtime")
+        result.config = config
+        self._emit(type="result", result=result)
+        return result
+
+    def run_compiled(self, compiled: List[Any], params_code: str,
+                     params: Optional[Sequence[Any]] = None) -> BenchmarkResult:
+        """
+        Benchmark already compiled programs in this thread
+
+        Args:
+            compiled: Code objects of the programs to compare
+            params_code: Parameters code defining ``params``
+            params: Already built test inputs (see utils.shared_params), used instead of running params_code
+
+        Returns:
+            BenchmarkResult with per-program timings
+        """
+        config = self.config
+        tracer = self.tracer
+        timer = TIMERS[config.timer]
+        results = [ProgramResult(f"Function {i}") for i in range(1, len(compiled) + 1)]
+
+        with tracer.span("build namespace", "engine"):
+            namespace = build_base_namespace(config.preloaded_modules)
+
+        # Parse parameters
+        self._emit(type="progress", message="Parsing parameters...")
+        try:
+            with tracer.span("build params", "params") as span:
+                params_iter, iterations = self._load_params(params_code, namespace, params)
+                span["count"] = iterations
+        except Exception as e:
+            self._fail(f"Invalid parameters: {str(e)}", "params")
+
+        self._emit(type="progress", progress=20, total_tests=iterations or 0,
+                   message="Running benchmark tests...")
+
+        # Counters are per thread, so they are opened by the thread running the tests
+        self._sampler = CounterSampler() if config.counters else None
+        try:
+            with controlled_interpreter(config.gc_mode, config.switch_interval):
+                with tracer.span("calibrate", "engine", tests=CALIBRATION_TESTS):
+                    floor = self._calibrate(namespace, timer)
+                i = self._run_tests(compiled, results, params_iter, iterations, namespace, timer)
+        finally:
+            if self._sampler:
+                self._sampler.close()
+                self._sampler = None
+
+        if i == 0:
+            self._fail("Invalid parameters: no test inputs were produced", "params")
+
+        self._emit(type="progress", progress=90, total_tests=i, message="Calculating results...")
+        self._apply_floor(results, floor)
+        result = BenchmarkResult(results, config, total_tests=i, floor=floor)
+
+        if config.scaling_workers:
+            self._run_scaling(compiled, params_code, result)
+
+        if result.mutated:
+            message = "Benchmark completed, but a function mutated its input!"
+        else:
+            message = "Benchmark completed successfully!"
+        self._emit(type="progress", current_test=i, message=message)
+        self._emit(type="result", result=result)
+        return result
+
+    def _calibrate(self, namespace: Mapping[str, Any], timer: Callable[[], int]) -> HarnessFloor:
+        """Time an empty program through the same measurement steps each test goes through"""
+        config = self.config
+        samples = []
+        for _ in range(CALIBRATION_TESTS):
+            for _ in range(config.warmup):
+                self._measure(EMPTY_PROGRAM, lambda: None, namespace, timer)
+            if config.gc_mode == "disabled":
+                gc.collect()
+            calls = [self._measure(EMPTY_PROGRAM, lambda: None, namespace, timer).elapsed
+                     for _ in range(config.repeats)]
+            samples.append(sum(calls) / len(calls) / 1e9)
+        return summarize_floor(samples)
+
+    def _apply_floor(self, results: List[ProgramResult], floor: HarnessFloor) -> None:
+        """Flag tests indistinguishable from the floor, then subtract it if configured"""
+        for result in results:
+            result.near_floor = [test for test, seconds in enumerate(result.times, start=1)
+                                 if floor.within_noise(seconds)]
+            if self.config.subtract_floor:
+                result.samples = [[floor.subtract(sample) for sample in samples] for samples in result.samples]
+                result.times = [sum(samples) / len(samples) for samples in result.samples]
+
+    def _load_params(self, params_code: str, namespace: Mapping[str, Any],
+                     params: Optional[Sequence[Any]]) -> Tuple[Iterable[Any], Optional[int]]:
+        """Test inputs given by the caller, from the params cache, or built by running the parameters code"""
+        config = self.config
+        if params is not None:
+            return iter(params), len(params)
+        if not config.uses_params_cache:
+            return load_params(params_code, namespace, config.params_seed)
+
+        cache = get_params_cache()
+        key = params_key(params_code, config.params_seed, config.preloaded_modules)
+        cached = cache.load(key)
+        if cached is not None:
+            # The mapping is released with the arrays that point into it
+            return iterate_params(cached.params, cached.count)
+        built, count = build_params(params_code, namespace, config.params_seed)
+        cache.store_params(key, built, count)
+        return iterate_params(built, count)
+
+    def _verify(self, compiled: List[Any], param: Any, namespace: Mapping[str, Any], test: int) -> None:
+        """
+        Compare every program's ``result`` against program 1 on one input, before it is timed
+
+        Programs run on copies (or factory calls), so the input is left
+        unchanged and timing measures exactly the input that was verified.
+        """
+        config = self.config
+        # Each program gets its own input so in-place mutation cannot affect the comparison
+        get_input = make_input_provider(param, "factory" if config.input_mode == "factory" else "copy")
+        outputs = []
+        for number, code in enumerate(compiled, start=1):
+            try:
+                outputs.append(capture_result(code, namespace, get_input()))
+            except MissingResultError as e:
+                self._fail(f"Cannot verify Function {number}: {str(e)}", "verify", number, test)
+            except Exception as e:
+                self._fail(f"Function {number} crashed on test {test}: {str(e)}", "runtime", number, test)
+
+        for number, output in enumerate(outputs[1:], start=2):
+            if not outputs_match(outputs[0], output, config.verify_rtol, config.verify_atol):
+                self._fail(f"Outputs differ on test {test}: Function 1 returned {describe_output(outputs[0])}, "
+                           f"Function {number} returned {describe_output(output)}", "verify", number, test)
+
+    def _run_tests(self, compiled: List[Any], results: List[ProgramResult], params_iter: Iterable[Any],
+                   iterations: Optional[int], namespace: Mapping[str, Any], timer: Callable[[], int]) -> int:
+        """Time every program on every test input, returning the number of tests run"""
+        config = self.config
+        tracer = self.tracer
+        i = 0
+        while True:
+            # Build the next input lazily, outside the timed region
+            try:
+                with tracer.span("build input", "params", test=i + 1):
+                    param = next(params_iter)
+                    get_input = make_input_provider(param, config.input_mode)
+            except StopIteration:
+                break
+            except Exception as e:
+                self._fail(f"Invalid parameters on test {i + 1}: {str(e)}", "params", test=i + 1)
+
+            # Each input is verified just before it is timed, so lazy inputs are never all held at once
+            if config.verify and len(compiled) > 1:
+                with tracer.span("verify", "engine", test=i + 1):
+                    self._verify(compiled, param, namespace, i + 1)
+
+            if iterations:
+                # Calculate progress (20% to 90% for tests)
+                self._emit(type="progress", current_test=i + 1,
+                           progress=20 + int((min(i, iterations) / iterations) * 70),
+                           message=f"Running test {i + 1} of {iterations}...")
+            else:
+                # Unknown test count, approach 90% without reaching it
+                self._emit(type="progress", current_test=i + 1, progress=20 + int(70 * i / (i + 10)),
+                           message=f"Running test {i + 1}...")
+
+            for number, (code, result) in enumerate(zip(compiled, results), start=1):
+                samples = []
+                mutated = False
+                collections = 0
+                switches = 0
+                counters: Dict[str, float] = {}
+                try:
+                    with tracer.span(f"test {result.name}", "test", test=i + 1):
+                        for _ in range(config.warmup):
+                            self._measure(code, get_input, namespace, timer)
+                        if config.gc_mode == "disabled":
+                            # Start every program from a clean heap, outside the timed region
+                            gc.collect()
+                        for _ in range(config.repeats):
+                            call = self._measure(code, get_input, namespace, timer)
+                            samples.append(call.elapsed / 1e9)
+                            mutated = mutated or call.mutated
+                            collections += call.gc_collections
+                            switches = None if call.context_switches is None or switches is None \
+                                else switches + call.context_switches
+                            for name, value in call.counters.items():
+                                counters[name] = counters.get(name, 0) + value
+                except Exception as e:
+                    self._fail(f"Function {number} crashed on test {i + 1}: {str(e)}", "runtime", number, i + 1)
+                result.samples.append(samples)
+                result.times.append(sum(samples) / len(samples))
+                result.gc_collections.append(collections)
+                result.context_switches.append(switches)
+                if config.counters:
+                    # Per timed call, like times, so the values do not grow with repeats
+                    result.counters.append({name: value / config.repeats for name, value in counters.items()})
+                if mutated:
+                    result.mutated.append(i + 1)
+
+            # Release this input before building the next one
+            del param, get_input
+            i += 1
+        return i
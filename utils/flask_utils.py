@@ -1,12 +1,18 @@
 from flask import session
-from typing import Dict, Any
+from typing import Dict, Any, List
+import sys
+import time
 import uuid
 
+from utils.ai_utils import cancel_ai_feedback
+from utils.tracing import Tracer
+
 # In-memory storage for user sessions (in production, consider using Redis or database)
 user_data: Dict[str, Dict[str, Any]] = {}
 user_ai_status: Dict[str, Dict[str, Any]] = {}
 user_benchmark_status: Dict[str, Dict[str, Any]] = {}
 user_sessions: Dict[str, float] = {}  # Track session timestamps
+user_traces: Dict[str, Tracer] = {}  # Trace of each user's latest run
 
 def get_user_id() -> str:
     """
@@ -78,10 +84,12 @@ def cleanup_old_sessions(max_sessions: int = 100, cleanup_count: int = 50) -> No
         # Remove oldest sessions (simple FIFO approach)
         old_keys = list(user_data.keys())[:cleanup_count]
         for user_id in old_keys:
+            cancel_ai_feedback(user_id)
             if user_id in user_data: del user_data[user_id]
             if user_id in user_ai_status: del user_ai_status[user_id]
             if user_id in user_benchmark_status: del user_benchmark_status[user_id]
             if user_id in user_sessions: del user_sessions[user_id]
+            if user_id in user_traces: del user_traces[user_id]
         print(f"Cleaned up {len(old_keys)} old sessions")
 
 def get_session_stats() -> Dict[str, int]:
@@ -97,6 +105,40 @@ def get_session_stats() -> Dict[str, int]:
         "total_results": sum(1 for data in user_data.values() if data.get("Func1Times"))
     }
 
+def deep_sizeof(obj: Any, seen: set = None) -> int:
+    """
+    Approximate memory held by an object and everything it contains
+    
+    Args:
+        obj: Object to measure
+        seen: ids already counted, so shared objects are counted once
+        
+    Returns:
+        int: Size in bytes
+    """
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(key, seen) + deep_sizeof(value, seen) for key, value in list(obj.items()))
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_sizeof(item, seen) for item in list(obj))
+    return size
+
+def get_session_memory() -> List[int]:
+    """
+    Get the approximate memory held by each user's stored data
+    
+    Returns:
+        List of sizes in bytes, one per user with any stored data
+    """
+    user_ids = set(user_data) | set(user_ai_status) | set(user_benchmark_status)
+    return [sum(deep_sizeof(store[user_id]) for store in (user_data, user_ai_status, user_benchmark_status)
+                if user_id in store)
+            for user_id in list(user_ids)]
+
 def clear_user_data(user_id: str) -> bool:
     """
     Clear all data for a specific user
@@ -107,13 +149,14 @@ def clear_user_data(user_id: str) -> bool:
     Returns:
         bool: True if data was found and cleared, False otherwise
     """
-    cleared = False
+    cleared = cancel_ai_feedback(user_id)
     if user_id in user_data:
         del user_data[user_id]
         cleared = True
     if user_id in user_ai_status:
         del user_ai_status[user_id]
         cleared = True
+    user_traces.pop(user_id, None)
     return cleared
 
 def user_has_complete_data(user_id: str) -> bool:
@@ -187,12 +230,15 @@ def get_user_benchmark_status(user_id: str) -> Dict[str, Any]:
             "message": "",
             "program1": "",
             "program2": "",
-            "params": ""
+            "params": "",
+            "config": {},
+            "queued_at": None
         }
     return user_benchmark_status[user_id]
 
 def update_user_benchmark_status(user_id: str, status: str, progress: int, error: str = None, 
-                                program1: str = "", program2: str = "", params: str = ""):
+                                program1: str = "", program2: str = "", params: str = "",
+                                config: Dict[str, Any] = None):
     """Update benchmark status for a specific user"""
     if user_id not in user_benchmark_status:
         user_benchmark_status[user_id] = {}
@@ -206,7 +252,9 @@ def update_user_benchmark_status(user_id: str, status: str, progress: int, error
         "message": "",
         "program1": program1,
         "program2": program2,
-        "params": params
+        "params": params,
+        "config": config or {},
+        "queued_at": time.time()
     })
 
 def update_user_benchmark_results(user_id: str, benchmark_result: dict, program1: str, program2: str):
@@ -0,0 +1,102 @@
+import copy
+import hashlib
+import pickle
+import numpy as np
+from typing import Any, Callable, Dict, Optional
+
+# How each benchmarked call receives its input
+INPUT_MODES = ("shared", "copy", "factory")
+
+# Values that can never be mutated in place and can be handed out as-is
+_ATOMIC_TYPES = (int, float, complex, bool, str, bytes, type(None), range)
+
+def fast_copy(obj: Any, memo: Optional[Dict[int, Any]] = None) -> Any:
+    """
+    Copy an input so a mutating function cannot affect later runs
+
+    Common containers (lists, tuples, dicts, sets, NumPy arrays) are copied with
+    their cheap native constructors instead of the generic ``copy.deepcopy``
+    machinery. Objects referenced more than once (e.g. the same list in every
+    tuple) are copied once and the aliasing is preserved.
+
+    Args:
+        obj: Input to copy
+        memo: Objects already copied in this pass, keyed by id
+
+    Returns:
+        An independent copy of obj
+    """
+    if isinstance(obj, _ATOMIC_TYPES):
+        return obj
+    if memo is None:
+        memo = {}
+    key = id(obj)
+    if key in memo:
+        return memo[key]
+
+    if isinstance(obj, np.ndarray):
+        copied = obj.copy()
+    elif type(obj) is list:
+        if all(isinstance(item, _ATOMIC_TYPES) for item in obj):
+            copied = obj.copy()
+        else:
+            copied = []
+            memo[key] = copied
+            copied.extend(fast_copy(item, memo) for item in obj)
+            return copied
+    elif type(obj) is tuple:
+        copied = tuple(fast_copy(item, memo) for item in obj)
+    elif type(obj) is dict:
+        copied = {}
+        memo[key] = copied
+        for k, v in obj.items():
+            copied[k] = fast_copy(v, memo)
+        return copied
+    elif type(obj) in (set, frozenset) and all(isinstance(item, _ATOMIC_TYPES) for item in obj):
+        copied = obj.copy() if type(obj) is set else obj
+    elif type(obj) is bytearray:
+        copied = bytearray(obj)
+    else:
+        copied = copy.deepcopy(obj, memo)
+
+    memo[key] = copied
+    return copied
+
+def make_input_provider(param: Any, input_mode: str) -> Callable[[], Any]:
+    """
+    Return a callable producing the input for one benchmarked call
+
+    Args:
+        param: Parameter set produced by the parameters code
+        input_mode: "shared" passes the same object to every call, "copy" gives
+            each call a fresh copy, "factory" treats param as a callable that
+            builds a fresh input
+
+    Returns:
+        Zero-argument callable returning the input to use
+    """
+    if input_mode == "shared":
+        return lambda: param
+    if input_mode == "copy":
+        return lambda: fast_copy(param)
+    if input_mode == "factory":
+        if not callable(param):
+            raise TypeError("factory input mode requires each params entry to be callable")
+        return param
+    raise ValueError(f"Unknown input mode: {input_mode}")
+
+def fingerprint(obj: Any) -> Optional[str]:
+    """
+    Hash an input so in-place mutation can be detected
+
+    Args:
+        obj: Input to hash
+
+    Returns:
+        Hex digest of the pickled input, or None if it cannot be pickled
+    """
+    try:
+        data = pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)
+    except Exception:
+        return None
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
@@ -0,0 +1,244 @@
+import json
+import os
+import subprocess
+import threading
+from collections import deque
+from dataclasses import dataclass, replace
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from utils.engine import BENCHMARK_ERROR_KINDS, BenchmarkConfig, BenchmarkEngine, BenchmarkError, BenchmarkResult
+from utils.sinks import relayed_event
+
+# Other interpreters jobs can run on, as comma separated "name=path" entries (or bare paths).
+# A path may be a python binary or a virtualenv directory, e.g.
+#   BENCHMARK_INTERPRETERS="py311=/usr/bin/python3.11,np1=/opt/venvs/numpy1"
+INTERPRETERS_ENV = os.environ.get("BENCHMARK_INTERPRETERS", "")
+
+# Seconds allowed for one run on another interpreter, start-up included
+RUN_TIMEOUT = float(os.environ.get("BENCHMARK_INTERPRETER_TIMEOUT", 300))
+
+# Directory containing the utils package; runners start here so `-m utils.runner` resolves
+_PACKAGE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+class InterpreterError(Exception):
+    """The other interpreter is not configured, could not start, crashed or timed out"""
+
+class RunnerError(InterpreterError):
+    """The runner ended with a message that does not follow its protocol"""
+
+@dataclass(frozen=True)
+class Interpreter:
+    name: str
+    path: str
+
+def _resolve_path(path: str) -> str:
+    """Accept a virtualenv directory in place of its python binary"""
+    if os.path.isdir(path):
+        for candidate in (os.path.join(path, "bin", "python"), os.path.join(path, "Scripts", "python.exe")):
+            if os.path.exists(candidate):
+                return candidate
+    return path
+
+def parse_interpreters(spec: str) -> Dict[str, Interpreter]:
+    """
+    Parse a BENCHMARK_INTERPRETERS style specification
+
+    Args:
+        spec: Comma separated "name=path" or bare path entries
+
+    Returns:
+        Dict of interpreters by name, bare paths are named after their final component
+    """
+    interpreters = {}
+    for entry in spec.split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        name, _, path = entry.rpartition("=") if "=" in entry else ("", "", entry)
+        path = _resolve_path(os.path.expanduser(path.strip()))
+        name = name.strip() or os.path.basename(path.rstrip("/"))
+        interpreters[name] = Interpreter(name, path)
+    return interpreters
+
+# Configured interpreters, read once at import
+INTERPRETERS = parse_interpreters(INTERPRETERS_ENV)
+
+# Successful interpreter_info probes by configured name; failures are retried next time
+_interpreter_infos: Dict[str, Dict[str, Any]] = {}
+
+def interpreter_info(name: str) -> Dict[str, Any]:
+    """
+    Python and NumPy versions of a configured interpreter, probed until it succeeds once
+
+    Returns:
+        Dict with python, implementation, numpy and executable, or an error key
+    """
+    interpreter = INTERPRETERS.get(name)
+    if interpreter is None:
+        return {"error": f"Interpreter {name} is not configured"}
+    if name in _interpreter_infos:
+        return _interpreter_infos[name]
+    try:
+        completed = subprocess.run([interpreter.path, "-m", "utils.runner", "--info"], cwd=_PACKAGE_ROOT,
+                                   capture_output=True, text=True, timeout=60)
+    except OSError as e:
+        return {"error": f"Interpreter {name} could not be started: {e.strerror or type(e).__name__}"}
+    except subprocess.TimeoutExpired:
+        return {"error": f"Interpreter {name} did not answer within 60s"}
+    try:
+        info = json.loads(completed.stdout.strip().splitlines()[-1])
+    except (ValueError, IndexError):
+        info = None
+    if not isinstance(info, dict) or "error" in info:
+        # Usually NumPy or a newer-syntax dependency of the engine missing in that environment
+        detail = completed.stderr.strip().splitlines()
+        return {"error": f"Interpreter {name} cannot run the benchmark runner" + (f": {detail[-1]}" if detail else "")}
+    _interpreter_infos[name] = info
+    return info
+
+def run_on_interpreter(name: str, programs: Sequence[str], params_code: str, config: BenchmarkConfig,
+                       emit: Callable[..., None], timeout: float = RUN_TIMEOUT) -> BenchmarkResult:
+    """
+    Run a benchmark job in another interpreter through utils.runner
+
+    Args:
+        name: Configured interpreter name
+        programs: Source code of the programs to compare
+        params_code: Parameters code defining ``params``
+        config: Engine settings for the run
+        emit: Receives the runner's progress and error events
+        timeout: Seconds before the runner is killed
+
+    Returns:
+        BenchmarkResult measured by the other interpreter
+
+    Raises:
+        BenchmarkError: If the programs or parameters failed in the other interpreter
+        InterpreterError: If the interpreter is missing, crashed or timed out
+        RunnerError: If the runner's final message is malformed
+    """
+    interpreter = INTERPRETERS.get(name)
+    if interpreter is None:
+        raise InterpreterError(f"Interpreter {name} is not configured")
+    try:
+        process = subprocess.Popen([interpreter.path, "-m", "utils.runner"], cwd=_PACKAGE_ROOT, text=True,
+                                   stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    except OSError as e:
+        raise InterpreterError(f"Could not start interpreter {name}: {str(e)}")
+
+    # Drain stderr (user prints, tracebacks) in the background, keeping the tail for error messages
+    stderr_tail: deque = deque(maxlen=20)
+    stderr_thread = threading.Thread(target=lambda: stderr_tail.extend(process.stderr), name=f"runner-{name}-stderr")
+    stderr_thread.daemon = True
+    stderr_thread.start()
+    timed_out = threading.Event()
+
+    def kill():
+        timed_out.set()
+        process.kill()
+    timer = threading.Timer(timeout, kill)
+    timer.daemon = True
+    timer.start()
+
+    final: Optional[Dict[str, Any]] = None
+    try:
+        try:
+            process.stdin.write(json.dumps({"programs": list(programs), "params_code": params_code,
+                                            "config": config.to_dict()}))
+            process.stdin.close()
+        except OSError:
+            pass  # The runner exited early, reported below
+        for line in process.stdout:
+            try:
+                event = json.loads(line)
+            except ValueError:
+                continue
+            if not isinstance(event, dict):
+                continue
+            if event.get("type") in ("result", "failure"):
+                final = event
+            else:
+                try:
+                    emit(**relayed_event(event))
+                except ValueError:
+                    continue  # Not an engine event; the benchmarked code may have written to the stream
+        process.wait()
+    finally:
+        timer.cancel()
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+    stderr_thread.join(1)
+
+    if final is None:
+        if timed_out.is_set():
+            raise InterpreterError(f"Run on {name} timed out after {timeout:.0f}s")
+        detail = "".join(stderr_tail).strip().splitlines()
+        raise InterpreterError(f"Interpreter {name} exited with code {process.returncode}"
+                               + (f": {detail[-1]}" if detail else ""))
+    return _final_outcome(name, final)
+
+def _optional_count(value: Any) -> bool:
+    return value is None or (isinstance(value, int) and not isinstance(value, bool) and value >= 0)
+
+def _final_outcome(name: str, final: Dict[str, Any]) -> BenchmarkResult:
+    """
+    Check the runner's last message and turn it into a result or a benchmark failure
+
+    The benchmarked code shares the runner's process and can write to its stream,
+    so nothing in the message is trusted before it is checked.
+
+    Raises:
+        BenchmarkError: If the message reports a failed run
+        RunnerError: If the message is malformed
+    """
+    if final["type"] == "failure":
+        if not (isinstance(final.get("message"), str) and final.get("kind") in BENCHMARK_ERROR_KINDS
+                and _optional_count(final.get("program")) and _optional_count(final.get("test"))):
+            raise RunnerError(f"Interpreter {name} sent a malformed failure")
+        raise BenchmarkError(final["message"], final["kind"], final["program"], final["test"])
+    if not isinstance(final.get("result"), dict):
+        raise RunnerError(f"Interpreter {name} sent a malformed result")
+    try:
+        return BenchmarkResult.from_plain(final["result"])
+    except (TypeError, ValueError, KeyError, AttributeError) as e:
+        raise RunnerError(f"Interpreter {name} sent a malformed result: {str(e)}")
+
+def compare_interpreters(names: Sequence[str], programs: Sequence[str], params_code: str, config: BenchmarkConfig,
+                         on_progress: Optional[Callable[[str], None]] = None) -> List[Dict[str, Any]]:
+    """
+    Run the same job on each named interpreter, one after another
+
+    A failure on one interpreter is recorded in its entry and does not stop the others.
+
+    Args:
+        names: Configured interpreter names
+        programs: Source code of the programs to compare
+        params_code: Parameters code defining ``params``
+        config: Engine settings shared by every run
+        on_progress: Called with a status message before each interpreter runs
+
+    Returns:
+        One JSON-safe entry per interpreter with versions, per-program averages and scores, or an error
+    """
+    entries = []
+    for index, name in enumerate(names, start=1):
+        if on_progress:
+            on_progress(f"Running on interpreter {name} ({index} of {len(names)})...")
+        # Results are shown to users, who see interpreters by name only, not where they are installed
+        info = {key: value for key, value in interpreter_info(name).items() if key != "executable"}
+        entry: Dict[str, Any] = {"name": name, **info}
+        if "error" in entry:
+            entries.append(entry)
+            continue
+        engine = BenchmarkEngine(replace(config, interpreter=name, compare_interpreters=()))
+        try:
+            result = engine.run(programs, params_code)
+        except BenchmarkError as e:
+            entry["error"] = str(e)
+        else:
+            entry["averages"] = [program.average for program in result.programs]
+            entry["scores"] = [program.score for program in result.programs]
+            entry["times"] = [program.times for program in result.programs]
+        entries.append(entry)
+    return entries
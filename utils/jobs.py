@@ -0,0 +1,252 @@
+import hmac
+import os
+import queue
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+from utils.engine import DEFAULT_EXECUTOR, BenchmarkConfig, BenchmarkEngine, BenchmarkError
+from utils.interpreters import INTERPRETERS, compare_interpreters
+from utils.metrics import benchmark_queue_wait_seconds, benchmark_run_seconds
+from utils.namespace import DEFAULT_PRELOADED_MODULES
+from utils.sinks import DictSink, Sink
+
+# Token clients send as "Authorization: Bearer <token>"; the job API is off while unset
+API_TOKEN = os.environ.get("BENCHMARK_API_TOKEN", "")
+
+# Most jobs one request may submit
+MAX_BATCH_SIZE = int(os.environ.get("BENCHMARK_MAX_BATCH_JOBS", 500))
+
+# Most jobs waiting to run at once, across every client
+MAX_QUEUED_JOBS = int(os.environ.get("BENCHMARK_MAX_QUEUED_JOBS", 1000))
+
+# Limits on job settings, the same the web form enforces
+MAX_REPEATS = 100
+MAX_WARMUP = 100
+MIN_SCALING_DURATION = 0.1
+MAX_SCALING_DURATION = 10
+MAX_SWITCH_INTERVAL = 0.05
+
+# Finished jobs kept for retrieval, the oldest are dropped first
+MAX_STORED_JOBS = int(os.environ.get("BENCHMARK_MAX_STORED_JOBS", 5000))
+
+# Seconds a finished job stays retrievable
+JOB_RETENTION = float(os.environ.get("BENCHMARK_JOB_RETENTION", 24 * 3600))
+
+FINISHED_STATUSES = ("complete", "error")
+
+class JobError(ValueError):
+    """A submitted job description is invalid"""
+
+class QueueFull(JobError):
+    """Accepting the submitted jobs would exceed MAX_QUEUED_JOBS"""
+
+def authorized(authorization: Optional[str]) -> bool:
+    """Whether an Authorization header carries the API token; always False while no token is configured"""
+    scheme, _, token = (authorization or "").partition(" ")
+    return bool(API_TOKEN) and scheme.lower() == "bearer" and hmac.compare_digest(token.encode(), API_TOKEN.encode())
+
+def _check_limits(config: BenchmarkConfig) -> None:
+    """
+    Hold a job to the web form's limits and the configured interpreters and modules
+
+    Raises:
+        JobError: If a setting is out of bounds or names something not configured
+    """
+    if config.repeats > MAX_REPEATS:
+        raise JobError(f"repeats must be at most {MAX_REPEATS}")
+    if config.warmup > MAX_WARMUP:
+        raise JobError(f"warmup must be at most {MAX_WARMUP}")
+    if not MIN_SCALING_DURATION <= config.scaling_duration <= MAX_SCALING_DURATION:
+        raise JobError(f"scaling_duration must be between {MIN_SCALING_DURATION} and {MAX_SCALING_DURATION}")
+    if config.switch_interval is not None and not 0 < config.switch_interval <= MAX_SWITCH_INTERVAL:
+        raise JobError(f"switch_interval must be between 0 and {MAX_SWITCH_INTERVAL}")
+    for name in (config.interpreter, *config.compare_interpreters):
+        if name is not None and name not in INTERPRETERS:
+            raise JobError(f"Unknown interpreter: {name}")
+    for module in config.preloaded_modules:
+        if module not in DEFAULT_PRELOADED_MODULES:
+            raise JobError(f"Module {module} is not available; choose from {', '.join(DEFAULT_PRELOADED_MODULES)}")
+
+def parse_job(data: Any) -> Tuple[List[str], str, BenchmarkConfig]:
+    """
+    Validate one job description
+
+    Jobs always run with the server's default executor, whatever their config
+    asks for, and within the limits of the web form.
+
+    Args:
+        data: JSON object with ``programs`` (list of source code), ``params``
+            (parameters code defining ``params``) and optional ``config``
+            (BenchmarkConfig fields) and ``name``
+
+    Returns:
+        Tuple of (programs, params code, config)
+
+    Raises:
+        JobError: If a field is missing or invalid
+    """
+    if not isinstance(data, Mapping):
+        raise JobError("Each job must be a JSON object")
+    programs = data.get("programs")
+    if not isinstance(programs, list) or not programs or \
+            not all(isinstance(program, str) and program.strip() for program in programs):
+        raise JobError('"programs" must be a non-empty list of source code strings')
+    params = data.get("params")
+    if not isinstance(params, str) or not params.strip():
+        raise JobError('"params" must be parameters code defining params')
+    config = data.get("config") or {}
+    if not isinstance(config, Mapping):
+        raise JobError('"config" must be an object of engine settings')
+    try:
+        config = BenchmarkConfig.from_dict({**config, "executor": DEFAULT_EXECUTOR})
+    except (TypeError, ValueError) as e:
+        raise JobError(f"Invalid config: {str(e)}")
+    _check_limits(config)
+    return programs, params.strip(), config
+
+class _JobResultSink(Sink):
+    """Store a finished run on its job, ahead of the DictSink marking it complete"""
+
+    def __init__(self, job: Dict[str, Any], extra: Dict[str, Any]):
+        self.job = job
+        self.extra = extra
+
+    def emit(self, event: Dict[str, Any]) -> None:
+        if event["type"] == "result":
+            self.job["result"] = {**event["result"].to_dict(), **self.extra}
+
+class JobScheduler:
+    """
+    Queue of benchmark jobs submitted through the JSON API, run back to back
+
+    Jobs are not tied to a browser session: anyone holding a job's ID can
+    read its status and result. A single background thread runs them in
+    submission order, so a large batch never competes with itself for CPU.
+    """
+
+    def __init__(self):
+        self.jobs: Dict[str, Dict[str, Any]] = {}  # Insertion ordered, oldest first
+        self.pending: "queue.Queue[Tuple[Dict[str, Any], List[str], str, BenchmarkConfig]]" = queue.Queue()
+        self.lock = threading.Lock()
+        self.thread: Optional[threading.Thread] = None
+
+    def submit(self, descriptions: Sequence[Any]) -> List[Dict[str, Any]]:
+        """
+        Validate and queue jobs, all or none
+
+        Returns:
+            The queued jobs' public views
+
+        Raises:
+            JobError: If any description is invalid or the batch is too large
+            QueueFull: If the jobs would not fit in the queue
+        """
+        if not descriptions:
+            raise JobError("No jobs submitted")
+        if len(descriptions) > MAX_BATCH_SIZE:
+            raise JobError(f"At most {MAX_BATCH_SIZE} jobs can be submitted at once")
+        parsed = []
+        for index, data in enumerate(descriptions):
+            try:
+                parsed.append(parse_job(data))
+            except JobError as e:
+                raise JobError(f"Job {index}: {str(e)}" if len(descriptions) > 1 else str(e))
+
+        queued = []
+        with self.lock:
+            if self.pending.qsize() + len(parsed) > MAX_QUEUED_JOBS:
+                raise QueueFull(f"Too many jobs are waiting; at most {MAX_QUEUED_JOBS} can be queued")
+            for data, (programs, params, config) in zip(descriptions, parsed):
+                job = {"id": uuid.uuid4().hex, "name": data.get("name"), "status": "queued", "progress": 0,
+                       "message": "", "error": None, "failure": None, "current_test": 0, "total_tests": 0,
+                       "config": config.to_dict(), "submitted_at": time.time(), "started_at": None,
+                       "finished_at": None, "result": None}
+                self.jobs[job["id"]] = job
+                self.pending.put((job, programs, params, config))
+                queued.append(job)
+            self._start()
+        return [self._view(job) for job in queued]
+
+    def _start(self) -> None:
+        if self.thread is None or not self.thread.is_alive():
+            self.thread = threading.Thread(target=self._work, name="job-scheduler")
+            self.thread.daemon = True
+            self.thread.start()
+
+    def _work(self) -> None:
+        while True:
+            job, programs, params, config = self.pending.get()
+            try:
+                self._run(job, programs, params, config)
+            finally:
+                self._prune()
+
+    def _run(self, job: Dict[str, Any], programs: List[str], params: str, config: BenchmarkConfig) -> None:
+        job["started_at"] = time.time()
+        job["status"] = "running"
+        benchmark_queue_wait_seconds.observe(max(job["started_at"] - job["submitted_at"], 0))
+        start = time.perf_counter()
+
+        extra = {}
+        engine = BenchmarkEngine(config, sinks=[_JobResultSink(job, extra), DictSink(job)])
+        try:
+            if config.compare_interpreters:
+                extra["Interpreters"] = compare_interpreters(config.compare_interpreters, programs, params, config,
+                                                             lambda message: job.update(message=message))
+            engine.run(programs, params)
+            outcome = "success"
+        except BenchmarkError as e:
+            job["failure"] = {"kind": e.kind, "program": e.program, "test": e.test}
+            outcome = e.kind
+        except Exception as e:
+            print(f"Unexpected error in job {job['id']}: {str(e)}")
+            job["status"] = "error"
+            job["error"] = f"Unexpected error: {str(e)}"
+            outcome = "unexpected"
+        job["finished_at"] = time.time()
+        benchmark_run_seconds.observe(time.perf_counter() - start, outcome=outcome)
+
+    def _prune(self) -> None:
+        """Forget finished jobs past their retention, then the oldest beyond the storage limit"""
+        cutoff = time.time() - JOB_RETENTION
+        with self.lock:
+            finished = [job_id for job_id, job in self.jobs.items() if job["status"] in FINISHED_STATUSES]
+            excess = len(finished) - MAX_STORED_JOBS
+            for index, job_id in enumerate(finished):
+                if index < excess or self.jobs[job_id]["finished_at"] < cutoff:
+                    del self.jobs[job_id]
+
+    def _view(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        view = dict(job)
+        if job["status"] == "queued":
+            view["position"] = sum(1 for other in self.jobs.values()
+                                   if other["status"] == "queued" and other["submitted_at"] < job["submitted_at"])
+        return view
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Public view of a job, or None if unknown or already pruned"""
+        with self.lock:
+            job = self.jobs.get(job_id)
+            return self._view(job) if job else None
+
+    def counts(self) -> Dict[str, int]:
+        """Number of stored jobs per status"""
+        with self.lock:
+            counts = {status: 0 for status in ("queued", "running", *FINISHED_STATUSES)}
+            for job in self.jobs.values():
+                counts[job["status"]] = counts.get(job["status"], 0) + 1
+            return counts
+
+# Process-wide scheduler, created on first use
+_scheduler: Optional[JobScheduler] = None
+_scheduler_lock = threading.Lock()
+
+def get_job_scheduler() -> JobScheduler:
+    """Return the shared job scheduler, creating it on first use"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = JobScheduler()
+        return _scheduler
@@ -0,0 +1,163 @@
+import math
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# Default histogram buckets (seconds), from sub-millisecond requests to multi-minute LLM runs
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+LabelValues = Tuple[str, ...]
+
+def _format_labels(names: Tuple[str, ...], values: LabelValues, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    escaped = (f'{name}="{str(value).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+               for name, value in pairs)
+    return "{" + ",".join(escaped) + "}"
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+class Metric:
+    """Base class for metrics rendered in the Prometheus text format"""
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labels: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self.lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Iterable[str] = ()):
+        super().__init__(name, documentation, labels)
+        self.values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def samples(self) -> List[str]:
+        with self.lock:
+            return [f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}"
+                    for key, value in sorted(self.values.items())]
+
+class Gauge(Metric):
+    """Gauge set directly or computed at scrape time by a callback"""
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labels: Iterable[str] = (),
+                 callback: Optional[Callable[[], Dict[LabelValues, float]]] = None):
+        super().__init__(name, documentation, labels)
+        self.values: Dict[LabelValues, float] = {}
+        self.callback = callback
+
+    def set(self, value: float, **labels: str) -> None:
+        with self.lock:
+            self.values[self._key(labels)] = value
+
+    def samples(self) -> List[str]:
+        if self.callback is not None:
+            values = self.callback()
+        else:
+            with self.lock:
+                values = dict(self.values)
+        return [f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}"
+                for key, value in sorted(values.items())]
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: Iterable[str] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self.counts: Dict[LabelValues, List[int]] = {}
+        self.sums: Dict[LabelValues, float] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self.lock:
+            counts = self.counts.setdefault(key, [0] * len(self.buckets))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            self.sums[key] = self.sums.get(key, 0.0) + value
+
+    def samples(self) -> List[str]:
+        lines = []
+        with self.lock:
+            for key in sorted(self.counts):
+                cumulative = 0
+                for bound, count in zip(self.buckets, self.counts[key]):
+                    cumulative += count
+                    labels = _format_labels(self.label_names, key, ("le", _format_value(bound)))
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                labels = _format_labels(self.label_names, key)
+                lines.append(f"{self.name}_sum{labels} {_format_value(self.sums[key])}")
+                lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+class Registry:
+    def __init__(self):
+        self.metrics: Dict[str, Metric] = {}
+        self.lock = threading.Lock()
+
+    def register(self, metric: Metric) -> Metric:
+        with self.lock:
+            return self.metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, documentation: str, labels: Iterable[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labels))
+
+    def gauge(self, name: str, documentation: str, labels: Iterable[str] = (),
+              callback: Optional[Callable[[], Dict[LabelValues, float]]] = None) -> Gauge:
+        return self.register(Gauge(name, documentation, labels, callback))
+
+    def histogram(self, name: str, documentation: str, labels: Iterable[str] = (),
+                  buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labels, buckets))
+
+    def render(self) -> str:
+        """Every registered metric in the Prometheus text exposition format"""
+        with self.lock:
+            metrics = list(self.metrics.values())
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+# Process-wide registry, served at /metrics
+registry = Registry()
+
+# Pipeline stage metrics shared across modules
+http_request_seconds = registry.histogram(
+    "benchmarker_http_request_duration_seconds", "HTTP request latency by route", ("method", "route", "status"))
+benchmark_queue_wait_seconds = registry.histogram(
+    "benchmarker_benchmark_queue_wait_seconds", "Time from benchmark submission until the engine starts")
+benchmark_run_seconds = registry.histogram(
+    "benchmarker_benchmark_run_seconds", "Benchmark engine run time", ("outcome",))
+llm_time_to_first_token_seconds = registry.histogram(
+    "benchmarker_llm_time_to_first_token_seconds", "Time until Ollama streams the first token", ("model",))
+llm_request_seconds = registry.histogram(
+    "benchmarker_llm_request_duration_seconds", "Total Ollama generation time", ("model", "outcome"))
+llm_cache_requests = registry.counter(
+    "benchmarker_llm_cache_requests_total", "AI response cache lookups", ("result",))
+params_cache_requests = registry.counter(
+    "benchmarker_params_cache_requests_total", "Built parameter cache lookups", ("result",))
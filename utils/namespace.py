@@ -0,0 +1,124 @@
+import numpy as np
+import os
+import random
+import builtins
+from importlib import import_module
+from functools import lru_cache
+from types import MappingProxyType
+from collections.abc import Sequence
+from typing import Any, Iterator, Mapping, Optional, Tuple
+
+# Modules preloaded into the sandbox namespace (comma separated allowlist)
+DEFAULT_PRELOADED_MODULES = tuple(
+    name.strip() for name in os.environ.get("BENCHMARK_PRELOADED_MODULES", "numpy,random,math").split(",")
+    if name.strip()
+)
+
+# Extra names bound for preloaded modules, on top of the module name itself
+MODULE_ALIASES = {
+    "numpy": {"np": None, "array": "array", "arr": "array"},  # arr: common shorthand
+}
+
+@lru_cache(maxsize=16)
+def build_base_namespace(modules: Tuple[str, ...] = DEFAULT_PRELOADED_MODULES) -> Mapping[str, Any]:
+    """
+    Build the read-only namespace user code runs against
+
+    Built once per allowlist and shared by every run; each test clones it with a
+    single ``copy()`` instead of re-importing modules and re-populating builtins.
+
+    Args:
+        modules: Names of modules to preload, missing modules are skipped
+
+    Returns:
+        Immutable mapping of the common builtins and preloaded modules
+    """
+    namespace = {'__builtins__': builtins}
+    for name in ('range', 'len', 'list', 'tuple', 'dict', 'set', 'sum', 'min', 'max', 'abs',
+                 'round', 'sorted', 'reversed', 'enumerate', 'zip', 'map', 'filter'):
+        namespace[name] = getattr(builtins, name)
+
+    for module_name in modules:
+        try:
+            module = import_module(module_name)
+        except ImportError:
+            print(f"Warning: preloaded module {module_name} is not available")
+            continue
+        namespace[module_name] = module
+        for alias, attr in MODULE_ALIASES.get(module_name, {}).items():
+            namespace[alias] = getattr(module, attr) if attr else module
+
+    return MappingProxyType(namespace)
+
+BASE_NAMESPACE = build_base_namespace()
+
+def seed_generators(seed: int) -> None:
+    """Seed the global ``random`` and ``numpy.random`` generators params code usually draws from"""
+    random.seed(seed)
+    np.random.seed(seed % 2**32)
+
+def build_params(params_code: str, global_env: Mapping[str, Any],
+                 seed: Optional[int] = None) -> Tuple[Any, Optional[int]]:
+    """
+    Execute the parameters code and return ``params`` as it defines them
+
+    A callable factory is called; generators are returned unconsumed.
+
+    Args:
+        params_code: Parameters code to execute
+        global_env: Environment the parameters code runs in
+        seed: If set, seed the global random generators first so the inputs are reproducible
+
+    Returns:
+        Tuple of (params, declared ``params_count`` or None)
+    """
+    # A single namespace so factories defined in params_code can see its other names
+    namespace = global_env.copy()
+    if seed is not None:
+        seed_generators(seed)
+    exec(params_code, namespace)
+    params = namespace["params"]
+    if callable(params):
+        params = params()
+    return params, namespace.get("params_count")
+
+def is_materialized(params: Any) -> bool:
+    """Whether every test input already exists, so the whole set can be stored or shared"""
+    return isinstance(params, (Sequence, np.ndarray))
+
+def iterate_params(params: Any, count: Optional[int] = None) -> Tuple[Iterator[Any], Optional[int]]:
+    """Lazy iterator over built params and the number of tests, or None if unknown"""
+    if is_materialized(params):
+        if count is None:
+            count = len(params)
+        return _iter_sequence(params), count
+
+    if count is None and hasattr(params, "__len__"):
+        count = len(params)
+    return iter(params), count
+
+def load_params(params_code: str, global_env: Mapping[str, Any],
+                seed: Optional[int] = None) -> Tuple[Iterator[Any], Optional[int]]:
+    """
+    Execute the parameters code and return a lazy iterator over the test inputs
+
+    ``params`` may be a sequence (the classic form), an iterable/generator, or a
+    callable factory returning an iterable. Generator and factory inputs are only
+    built when the next test asks for them, so large inputs never have to be held
+    in memory all at once. An optional ``params_count`` declares the number of
+    tests when ``params`` has no length.
+
+    Args:
+        params_code: Parameters code to execute
+        global_env: Environment the parameters code runs in
+        seed: If set, seed the global random generators first
+
+    Returns:
+        Tuple of (iterator over test inputs, number of tests or None if unknown)
+    """
+    return iterate_params(*build_params(params_code, global_env, seed))
+
+def _iter_sequence(params: Sequence) -> Iterator[Any]:
+    """Yield items of a sequence by index without copying it"""
+    for i in range(len(params)):
+        yield params[i]
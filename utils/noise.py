@@ -0,0 +1,78 @@
+import gc
+import sys
+import threading
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+# "disabled": collect between tests and keep the collector off while timing
+# "inclusive": leave the collector running so its pauses are part of the timing
+GC_MODES = ("disabled", "inclusive")
+
+# gc.disable() and sys.setswitchinterval() are process wide, so overlapping runs
+# share one reference-counted change and the last run out restores the originals
+_state_lock = threading.Lock()
+_active_runs = 0
+_saved_gc_enabled = True
+_saved_switch_interval = 0.005
+_gc_disabled_runs = 0
+_switch_interval_runs = 0
+
+@contextmanager
+def controlled_interpreter(gc_mode: str = "disabled", switch_interval: Optional[float] = None) -> Iterator[None]:
+    """
+    Reduce interpreter noise for the duration of a benchmark run
+
+    Args:
+        gc_mode: One of GC_MODES
+        switch_interval: If set, raise sys.setswitchinterval to this many seconds so
+            other Python threads (Flask handlers, AI feedback) preempt the run less often
+    """
+    global _active_runs, _saved_gc_enabled, _saved_switch_interval, _gc_disabled_runs, _switch_interval_runs
+    if gc_mode not in GC_MODES:
+        raise ValueError(f"Unknown GC mode: {gc_mode}")
+
+    with _state_lock:
+        if _active_runs == 0:
+            _saved_gc_enabled = gc.isenabled()
+            _saved_switch_interval = sys.getswitchinterval()
+        _active_runs += 1
+        if gc_mode == "disabled":
+            _gc_disabled_runs += 1
+            gc.disable()
+        if switch_interval is not None:
+            _switch_interval_runs += 1
+            sys.setswitchinterval(max(switch_interval, sys.getswitchinterval()))
+    try:
+        yield
+    finally:
+        with _state_lock:
+            _active_runs -= 1
+            if gc_mode == "disabled":
+                _gc_disabled_runs -= 1
+                if _gc_disabled_runs == 0 and _saved_gc_enabled:
+                    gc.enable()
+            if switch_interval is not None:
+                _switch_interval_runs -= 1
+                if _switch_interval_runs == 0:
+                    sys.setswitchinterval(_saved_switch_interval)
+
+def gc_collections() -> int:
+    """Total number of garbage collections run so far, across all generations"""
+    return sum(generation["collections"] for generation in gc.get_stats())
+
+def context_switches() -> Optional[int]:
+    """
+    Voluntary plus involuntary context switches of the calling thread so far
+
+    Returns:
+        Switch count, or None where getrusage is unavailable
+    """
+    if resource is None:
+        return None
+    usage = resource.getrusage(getattr(resource, "RUSAGE_THREAD", resource.RUSAGE_SELF))
+    return usage.ru_nvcsw + usage.ru_nivcsw
@@ -0,0 +1,138 @@
+import asyncio
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from utils.async_http import HTTPError, post_json
+
+class OllamaManager:
+    """
+    Keeps the feedback model resident in Ollama and picks a model per request
+
+    Preloads the model when the process starts, then re-sends an empty
+    generate request with ``keep_alive`` before Ollama's idle timer would
+    unload it. Tracks how long loads take and how many generations are in
+    flight; when the queue is deep and a faster model is configured,
+    new generations are routed to it.
+    """
+
+    def __init__(self, ollama_host: str, model: str, fast_model: Optional[str] = None,
+                 keep_alive: str = "30m", ping_interval: float = 240, fast_queue_depth: int = 6,
+                 options: Optional[Dict[str, Any]] = None):
+        self.ollama_host = ollama_host
+        self.model = model
+        # Sent with every load: Ollama reloads the model when a request's runner options differ
+        self.options = dict(options or {})
+        self.fast_model = fast_model
+        self.keep_alive = keep_alive
+        self.ping_interval = ping_interval
+        self.fast_queue_depth = fast_queue_depth
+
+        self.in_flight = 0
+        self.stats: Dict[str, Any] = {
+            "resident": False,
+            "loads": 0,
+            "last_load_seconds": None,
+            "last_ping": None,
+            "failures": 0,
+            "fast_model_requests": 0,
+        }
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Future] = None
+
+    @classmethod
+    def from_env(cls, ollama_host: str, options: Optional[Dict[str, Any]] = None) -> "OllamaManager":
+        """Configure from OLLAMA_MODEL, OLLAMA_FAST_MODEL, OLLAMA_KEEP_ALIVE and friends"""
+        return cls(
+            ollama_host,
+            model=os.environ.get("OLLAMA_MODEL", "codegemma:instruct"),
+            fast_model=os.environ.get("OLLAMA_FAST_MODEL") or None,
+            keep_alive=os.environ.get("OLLAMA_KEEP_ALIVE", "30m"),
+            ping_interval=float(os.environ.get("OLLAMA_PING_INTERVAL", 240)),
+            fast_queue_depth=int(os.environ.get("OLLAMA_FAST_QUEUE_DEPTH", 6)),
+            options=options,
+        )
+
+    def start(self, loop: asyncio.AbstractEventLoop) -> None:
+        """Start preloading and keep-alive pings on the given event loop (idempotent)"""
+        with self._lock:
+            if self._task is None:
+                self._task = asyncio.run_coroutine_threadsafe(self._keep_warm(), loop)
+
+    def stop(self) -> None:
+        with self._lock:
+            if self._task is not None:
+                self._task.cancel()
+                self._task = None
+
+    async def load(self, model: str) -> Optional[float]:
+        """
+        Ask Ollama to load a model without generating anything
+
+        The load carries the same options as real generations, so the first
+        generation finds the model loaded as it needs it.
+
+        Args:
+            model: Model name to load
+
+        Returns:
+            Seconds Ollama spent loading the model, or None on failure
+        """
+        start = time.perf_counter()
+        try:
+            status, body = await post_json(f"{self.ollama_host}/api/generate",
+                                           {"model": model, "keep_alive": self.keep_alive, "options": self.options},
+                                           timeout=300)
+        except HTTPError as e:
+            print(f"Ollama preload of {model} failed: {str(e)}")
+            status, body = None, b""
+        elapsed = time.perf_counter() - start
+
+        with self._lock:
+            self.stats["last_ping"] = time.time()
+            if status != 200:
+                self.stats["failures"] += 1
+                if model == self.model:
+                    self.stats["resident"] = False
+                return None
+            try:
+                # Ollama reports its own load time in nanoseconds; zero means it was already resident
+                load_seconds = json.loads(body).get("load_duration", 0) / 1e9
+            except (ValueError, AttributeError):
+                load_seconds = elapsed
+            if model == self.model:
+                self.stats["resident"] = True
+            if load_seconds > 0.5:
+                self.stats["loads"] += 1
+                self.stats["last_load_seconds"] = round(load_seconds, 3)
+                print(f"Ollama loaded {model} in {load_seconds:.2f}s")
+        return load_seconds
+
+    async def _keep_warm(self) -> None:
+        while True:
+            await self.load(self.model)
+            if self.fast_model:
+                await self.load(self.fast_model)
+            await asyncio.sleep(self.ping_interval)
+
+    def choose_model(self) -> str:
+        """Model for the next generation, switching to the fast model under load"""
+        with self._lock:
+            if self.fast_model and self.in_flight >= self.fast_queue_depth:
+                self.stats["fast_model_requests"] += 1
+                return self.fast_model
+            return self.model
+
+    def begin_request(self) -> None:
+        with self._lock:
+            self.in_flight += 1
+
+    def end_request(self) -> None:
+        with self._lock:
+            self.in_flight -= 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self.stats, "model": self.model, "fast_model": self.fast_model, "in_flight": self.in_flight}
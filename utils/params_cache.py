@@ -0,0 +1,293 @@
+import hashlib
+import hmac
+import json
+import mmap
+import os
+import platform
+import stat
+import struct
+import tempfile
+import threading
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+from utils.metrics import params_cache_requests
+from utils.namespace import is_materialized
+from utils.shared_params import ALIGNMENT, AttachedParams, ParamsNotShareable, dump_params, layout
+
+# Where built parameter sets are kept, shared by every run and user. The directory must
+# belong to this process's user and be private to it, or the cache stays unused
+PARAMS_CACHE_DIR = os.environ.get("BENCHMARK_PARAMS_CACHE_DIR",
+                                  os.path.join(tempfile.gettempdir(), "benchmarker-params"))
+
+# Key authenticating entries before they are unpickled. Random per process unless set,
+# so entries survive a restart only when the key is configured
+PARAMS_CACHE_KEY = os.environ.get("BENCHMARK_PARAMS_CACHE_KEY", "").encode() or os.urandom(32)
+
+# Total size the cache may use before the least recently used entries are removed
+PARAMS_CACHE_MB = float(os.environ.get("BENCHMARK_PARAMS_CACHE_MB", 1024))
+
+# File layout: magic, HMAC-SHA256 tag, header length, JSON header, then the pickle and each
+# buffer at aligned offsets. The tag covers the header and every region
+_MAGIC = b"BMPARAM2"
+_TAG_SIZE = hashlib.sha256().digest_size
+_LENGTH = struct.Struct("<I")
+_SUFFIX = ".params"
+
+def params_key(params_code: str, seed: Optional[int], preloaded_modules: Sequence[str]) -> str:
+    """
+    Cache key of the parameters a run would build
+
+    Pickled NumPy arrays and other objects refer to version specific
+    reconstructors, so the interpreter and NumPy versions are part of the key.
+    """
+    source = json.dumps([params_code, seed, list(preloaded_modules), platform.python_implementation(),
+                         platform.python_version(), np.__version__])
+    return hashlib.sha256(source.encode()).hexdigest()
+
+def _data_start(header_size: int) -> int:
+    return -(-(len(_MAGIC) + _TAG_SIZE + _LENGTH.size + header_size) // ALIGNMENT) * ALIGNMENT
+
+def _tag(header: bytes, regions: Sequence[Any]) -> bytes:
+    mac = hmac.new(PARAMS_CACHE_KEY, header, hashlib.sha256)
+    for region in regions:
+        mac.update(region)
+    return mac.digest()
+
+class ParamsCache:
+    """
+    Size-bounded on-disk cache of built parameter sets
+
+    Each entry is one file holding the protocol 5 pickle of the parameters with
+    their NumPy arrays stored raw at aligned offsets, the same layout the shared
+    memory segments use. Loading maps the file copy-on-write, so a hit costs a
+    page-cache lookup rather than re-running the parameters code. A file's
+    modification time records its last use; the oldest entries are removed once
+    the cache exceeds its size limit.
+
+    Entries are only read from a directory this process owns and nobody else can
+    enter, and only after their HMAC checks out. Entries built by a sandbox
+    worker are marked untrusted: they are handed to other workers but never
+    unpickled in this process.
+    """
+
+    def __init__(self, directory: str = PARAMS_CACHE_DIR, max_bytes: int = int(PARAMS_CACHE_MB * 1024 * 1024)):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + _SUFFIX)
+
+    def _private_directory(self, create: bool) -> bool:
+        """Whether the cache directory exists (after creating it if asked), is ours and is private"""
+        if create:
+            try:
+                os.makedirs(self.directory, mode=0o700, exist_ok=True)
+            except OSError as e:
+                print(f"Could not create params cache directory {self.directory}: {str(e)}")
+                return False
+        try:
+            info = os.lstat(self.directory)
+        except OSError:
+            return False
+        if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.geteuid() or info.st_mode & 0o077:
+            print(f"Params cache directory {self.directory} is not private to this user, not using it")
+            return False
+        return True
+
+    def _read(self, path: str) -> Dict[str, Any]:
+        """
+        Header of an entry whose tag matches its contents
+
+        Raises:
+            ValueError: If the file is not an entry or fails authentication
+        """
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            if data[:len(_MAGIC)] != _MAGIC:
+                raise ValueError("not a params cache file")
+            tag = data[len(_MAGIC):len(_MAGIC) + _TAG_SIZE]
+            position = len(_MAGIC) + _TAG_SIZE
+            (header_size,) = _LENGTH.unpack(data[position:position + _LENGTH.size])
+            position += _LENGTH.size
+            header_bytes = data[position:position + header_size]
+            header = json.loads(header_bytes)
+            start = _data_start(header_size)
+            if start + header["size"] > len(data):
+                raise ValueError("truncated params cache file")
+            with memoryview(data) as view:
+                regions = [view[start + offset:start + offset + size]
+                           for offset, size in zip(header["offsets"], header["sizes"])]
+                try:
+                    valid = hmac.compare_digest(tag, _tag(header_bytes, regions))
+                finally:
+                    for region in regions:
+                        region.release()
+        if not valid:
+            raise ValueError("params cache entry failed authentication")
+        header["start"] = start
+        return header
+
+    def lookup(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Descriptor of an authenticated entry for AttachedParams or a sandbox worker, marking it used
+
+        Returns:
+            Descriptor dict, with ``untrusted`` set for entries built in a sandbox,
+            or None if the entry is missing, unreadable or forged
+        """
+        path = self._path(key)
+        if not self._private_directory(create=False):
+            params_cache_requests.inc(result="miss")
+            return None
+        try:
+            header = self._read(path)
+            os.utime(path)
+        except FileNotFoundError:
+            params_cache_requests.inc(result="miss")
+            return None
+        except (OSError, ValueError, KeyError, TypeError, struct.error) as e:
+            print(f"Discarding unreadable params cache entry {key}: {str(e)}")
+            self.discard(key)
+            params_cache_requests.inc(result="miss")
+            return None
+        params_cache_requests.inc(result="hit")
+        start = header["start"]
+        return {"file": path, "size": start + header["size"],
+                "offsets": [start + offset for offset in header["offsets"]], "sizes": header["sizes"],
+                "count": header["count"], "untrusted": header["untrusted"]}
+
+    def load(self, key: str) -> Optional[AttachedParams]:
+        """
+        Map a cached entry into this process, or None on a miss
+
+        Entries built in a sandbox count as misses: their pickle came from user
+        code and is only ever unpickled inside another sandbox worker.
+        """
+        descriptor = self.lookup(key)
+        if descriptor is None or descriptor["untrusted"]:
+            return None
+        try:
+            return AttachedParams(descriptor)
+        except Exception as e:
+            print(f"Discarding unreadable params cache entry {key}: {str(e)}")
+            self.discard(key)
+            return None
+
+    def store(self, key: str, regions: Sequence[Any], count: Optional[int], untrusted: bool = False) -> None:
+        """
+        Write an authenticated entry from its pickle and out-of-band buffers
+
+        Args:
+            key: From params_key
+            regions: The pickle, then each buffer, as bytes-like objects
+            count: Number of tests, or None to use the length of the parameters
+            untrusted: The pickle was produced by a sandbox worker and must not be unpickled here
+        """
+        sizes = [memoryview(region).nbytes for region in regions]
+        offsets, size = layout(sizes)
+        if size > self.max_bytes:
+            return
+        header = json.dumps({"offsets": offsets, "sizes": sizes, "size": size, "count": count,
+                             "untrusted": untrusted}).encode()
+        start = _data_start(len(header))
+        if not self._private_directory(create=True):
+            return
+        # Written under a temporary name and renamed, so readers never see a partial file
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(_MAGIC + _tag(header, regions) + _LENGTH.pack(len(header)) + header)
+                for offset, region in zip(offsets, regions):
+                    f.seek(start + offset)
+                    f.write(region)
+                f.truncate(start + size)
+            os.replace(temp_path, self._path(key))
+        except OSError as e:
+            print(f"Could not write params cache entry {key}: {str(e)}")
+            try:
+                os.unlink(temp_path)
+            except OSError:
+                pass
+            return
+        self._evict()
+
+    def store_params(self, key: str, params: Any, count: Optional[int]) -> bool:
+        """
+        Cache built parameters if they can be stored
+
+        Generators and factory iterables are left alone so they stay lazy, and
+        parameters that cannot be pickled (e.g. lambdas) are skipped.
+
+        Returns:
+            True if an entry was written
+        """
+        if not is_materialized(params):
+            return False
+        try:
+            meta, buffers = dump_params(params)
+        except ParamsNotShareable:
+            return False
+        self.store(key, [meta, *buffers], count if count is not None else len(params))
+        return True
+
+    def discard(self, key: str) -> None:
+        try:
+            os.unlink(self._path(key))
+        except OSError:
+            pass
+
+    def _entries(self) -> Sequence[Tuple[float, int, str]]:
+        """(last used, size, path) of every entry"""
+        entries = []
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return entries
+        for name in names:
+            if name.endswith(_SUFFIX):
+                path = os.path.join(self.directory, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def _evict(self) -> None:
+        """Remove least recently used entries until the cache fits its limit"""
+        with self.lock:
+            entries = sorted(self._entries())
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.unlink(path)  # Runs still mapping the file keep their pages
+                except OSError:
+                    continue
+                total -= size
+
+    def stats(self) -> Dict[str, int]:
+        entries = self._entries()
+        return {"entries": len(entries), "bytes": sum(size for _, size, _ in entries)}
+
+    def clear(self) -> None:
+        for _, _, path in self._entries():
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+
+# Process-wide cache, created on first use
+_cache: Optional[ParamsCache] = None
+_cache_lock = threading.Lock()
+
+def get_params_cache() -> ParamsCache:
+    """Return the shared params cache, creating it on first use"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ParamsCache()
+        return _cache
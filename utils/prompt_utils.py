@@ -0,0 +1,205 @@
+import ast
+import io
+import math
+import tokenize
+from typing import Any, Dict, List, Set, Tuple
+
+# Context window of every generation (tokens). Fixed, because Ollama reloads the model
+# whenever num_ctx changes between requests; prompts are fitted to it instead
+NUM_CTX = 4096
+
+# Response length bounds (tokens)
+DEFAULT_PREDICT = 400
+MIN_PREDICT = 150
+
+# Rough characters per token for source code; erring low over-reserves context
+CHARS_PER_TOKEN = 3.5
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate for a prompt, no tokenizer required"""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+def _strip_docstrings(tree: ast.AST) -> None:
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.Module, ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            body = node.body
+            if body and isinstance(body[0], ast.Expr) and isinstance(body[0].value, ast.Constant) \
+                    and isinstance(body[0].value.value, str):
+                # Keep the block syntactically valid when the docstring was all there was
+                node.body = body[1:] or [ast.Pass()]
+
+def _names_used(node: ast.AST) -> Set[str]:
+    return {n.id for n in ast.walk(node) if isinstance(n, ast.Name)} | \
+           {n.attr for n in ast.walk(node) if isinstance(n, ast.Attribute)}
+
+def _relevant_statements(tree: ast.Module) -> List[ast.stmt]:
+    """
+    Keep top-level code plus only the functions and classes it reaches
+
+    Definitions never referenced (directly or through other kept definitions)
+    by the module-level statements are dropped. Decorated definitions always
+    stay, since their decorators may register them where no name shows it. If
+    the program has no module-level statements, everything is kept.
+    """
+    definitions = {node.name: node for node in tree.body
+                   if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef))}
+    roots = [node for node in tree.body
+             if node.__class__ not in (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef) or node.decorator_list]
+    if not roots or not definitions:
+        return tree.body
+
+    wanted: Set[str] = set()
+    frontier = set().union(*(_names_used(node) for node in roots)) & definitions.keys()
+    while frontier:
+        name = frontier.pop()
+        wanted.add(name)
+        frontier |= (_names_used(definitions[name]) & definitions.keys()) - wanted
+    return [node for node in tree.body if node in roots or getattr(node, "name", None) in wanted]
+
+def _strip_comments(source: str) -> str:
+    """Token-based comment removal for code that does not parse"""
+    lines = source.splitlines(keepends=True)
+    try:
+        for tok in tokenize.generate_tokens(io.StringIO(source).readline):
+            if tok.type == tokenize.COMMENT:
+                row, col = tok.start
+                lines[row - 1] = lines[row - 1][:col].rstrip() + "\n"
+    except (tokenize.TokenError, IndentationError, SyntaxError):
+        pass  # Comments before the point the tokenizer gave up are still removed
+    return "".join(lines)
+
+def minify_code(source: str) -> str:
+    """
+    Shrink a program for inclusion in an LLM prompt
+
+    Removes comments and docstrings, drops functions the program never uses,
+    and collapses blank lines and trailing whitespace. Code that does not parse
+    only has its comments and blank lines stripped.
+
+    Args:
+        source: Program source code
+
+    Returns:
+        Minified source code
+    """
+    try:
+        tree = ast.parse(source)
+        _strip_docstrings(tree)
+        tree.body = _relevant_statements(tree)
+        source = ast.unparse(tree)
+    except (SyntaxError, ValueError):
+        source = _strip_comments(source)
+    lines = (line.rstrip() for line in source.splitlines())
+    return "\n".join(line for line in lines if line)
+
+def truncate_code(source: str, max_tokens: int) -> str:
+    """Cut code to roughly max_tokens, ending on a whole line"""
+    max_chars = int(max_tokens * CHARS_PER_TOKEN)
+    if len(source) <= max_chars:
+        return source
+    cut = source.rfind("\n", 0, max_chars)
+    return source[:cut if cut > 0 else max_chars] + "\n# ... (truncated)"
+
+def fit_code(codes: List[str], template_tokens: int, num_predict: int = DEFAULT_PREDICT) -> Tuple[List[str], int]:
+    """
+    Minify programs and trim them so the whole prompt fits the context window
+
+    Args:
+        codes: Program sources to embed in the prompt
+        template_tokens: Estimated tokens of the prompt text around the code
+        num_predict: Tokens reserved for the response
+
+    Returns:
+        Tuple of (minified programs, tokens reserved for the response)
+    """
+    codes = [minify_code(code) for code in codes]
+    budget = NUM_CTX - template_tokens - num_predict
+    if sum(estimate_tokens(code) for code in codes) > budget:
+        # Give up some response length before cutting code
+        num_predict = MIN_PREDICT
+        budget = NUM_CTX - template_tokens - num_predict
+        share = max(budget // len(codes), 1)
+        codes = [truncate_code(code, share) for code in codes]
+    return codes, num_predict
+
+def prompt_options(prompt: str, num_predict: int = DEFAULT_PREDICT) -> Dict[str, Any]:
+    """
+    Response length that fits beside the prompt in the fixed context window
+
+    Only num_predict varies per prompt; it does not affect the loaded model.
+
+    Args:
+        prompt: Final prompt text
+        num_predict: Tokens reserved for the response
+
+    Returns:
+        Dict with the num_predict Ollama option
+    """
+    return {"num_predict": min(num_predict, max(NUM_CTX - estimate_tokens(prompt), MIN_PREDICT))}
+
+_FEEDBACK_TEMPLATE = """Analyze this Python function performance (keep response under 300 words):
+
+{func_name}:
+```python
+{func_code}
+```
+
+Metrics: Score {score:.2f}, Avg time {avg_time:.4f}s
+
+Provide:
+1. Performance assessment
+2. Main bottlenecks
+3. 2-3 optimization tips
+4. Code quality notes
+
+Be concise and actionable."""
+
+_COMPARATIVE_TEMPLATE = """Compare these functions (keep under 250 words):
+
+Function 1 (Score: {func1_score:.2f}):
+```python
+{func1_code}
+```
+
+Function 2 (Score: {func2_score:.2f}):
+```python
+{func2_code}
+```
+
+{better_func} wins by {score_diff:.2f} points.
+
+Provide:
+1. Winner and why
+2. Key performance differences
+3. When to use each
+4. Main optimization opportunity
+
+Be concise."""
+
+def build_feedback_prompt(func_code: str, func_name: str, avg_time: float, score: float) -> Tuple[str, Dict[str, Any]]:
+    """
+    Build the single-function analysis prompt and its Ollama options
+
+    Returns:
+        Tuple of (prompt, options)
+    """
+    template_tokens = estimate_tokens(_FEEDBACK_TEMPLATE) + 16
+    (func_code,), num_predict = fit_code([func_code], template_tokens)
+    prompt = _FEEDBACK_TEMPLATE.format(func_name=func_name, func_code=func_code, score=score, avg_time=avg_time)
+    return prompt, prompt_options(prompt, num_predict)
+
+def build_comparative_prompt(func1_code: str, func2_code: str, func1_score: float,
+                             func2_score: float) -> Tuple[str, Dict[str, Any]]:
+    """
+    Build the head-to-head comparison prompt and its Ollama options
+
+    Returns:
+        Tuple of (prompt, options)
+    """
+    better_func = "Function 1" if func1_score > func2_score else "Function 2"
+    score_diff = abs(func1_score - func2_score)
+    template_tokens = estimate_tokens(_COMPARATIVE_TEMPLATE) + 16
+    (func1_code, func2_code), num_predict = fit_code([func1_code, func2_code], template_tokens)
+    prompt = _COMPARATIVE_TEMPLATE.format(func1_code=func1_code, func2_code=func2_code, func1_score=func1_score,
+                                          func2_score=func2_score, better_func=better_func, score_diff=score_diff)
+    return prompt, prompt_options(prompt, num_predict)
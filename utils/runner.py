@@ -0,0 +1,69 @@
+"""
+Benchmark runner for other Python interpreters
+
+Run as ``python -m utils.runner`` from the repository root by the interpreter
+under test. Reads one job as JSON on stdin:
+
+    {"programs": ["...", "..."], "params_code": "...", "config": {...}}
+
+and writes engine events to stdout as JSON lines, ending with either
+``{"type": "result", ...}`` or ``{"type": "failure", ...}``. Anything the
+benchmarked code prints goes to stderr so it cannot corrupt the stream.
+"""
+import json
+import os
+import platform
+import sys
+from typing import Any, Dict, TextIO
+
+from utils.engine import BenchmarkConfig, BenchmarkEngine, BenchmarkError
+from utils.sinks import Sink
+
+def describe_interpreter() -> Dict[str, Any]:
+    """Version details of the running interpreter and its NumPy"""
+    try:
+        import numpy
+        numpy_version = numpy.__version__
+    except ImportError:
+        numpy_version = None
+    return {"python": platform.python_version(), "implementation": platform.python_implementation(),
+            "numpy": numpy_version, "executable": sys.executable}
+
+class _StreamSink(Sink):
+    """Write progress events as JSON lines; the result is written by main"""
+
+    def __init__(self, stream: TextIO):
+        self.stream = stream
+
+    def emit(self, event: Dict[str, Any]) -> None:
+        if event["type"] != "result":
+            self.stream.write(json.dumps(event) + "\n")
+            self.stream.flush()
+
+def main() -> None:
+    # Keep the protocol on the real stdout and send everything else to stderr
+    protocol = os.fdopen(os.dup(1), "w", encoding="utf-8")
+    os.dup2(2, 1)
+    sys.stdout = sys.stderr
+
+    if sys.argv[1:] == ["--info"]:
+        protocol.write(json.dumps(describe_interpreter()) + "\n")
+        protocol.flush()
+        return
+
+    job = json.load(sys.stdin)
+    # Only sent inline runs: BenchmarkConfig refuses other interpreters under the sandbox executor
+    config = BenchmarkConfig.from_dict({**job.get("config", {}), "interpreter": None, "compare_interpreters": [],
+                                        "executor": "inline", "scaling_workers": 0})
+    engine = BenchmarkEngine(config, sinks=[_StreamSink(protocol)])
+    try:
+        result = engine.run(job["programs"], job["params_code"])
+    except BenchmarkError as e:
+        line = {"type": "failure", "message": str(e), "kind": e.kind, "program": e.program, "test": e.test}
+    else:
+        line = {"type": "result", "result": result.to_plain(), "interpreter": describe_interpreter()}
+    protocol.write(json.dumps(line) + "\n")
+    protocol.flush()
+
+if __name__ == "__main__":
+    main()
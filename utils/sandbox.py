@@ -0,0 +1,888 @@
+import ctypes
+import json
+import marshal
+import os
+import platform
+import queue
+import signal
+import socket
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from dataclasses import replace
+from multiprocessing import BufferTooShort
+from multiprocessing.connection import Connection, Pipe
+from multiprocessing.reduction import recv_handle, send_handle
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+try:
+    import pwd
+    import resource
+except ImportError:  # Not available on Windows
+    pwd = None
+    resource = None
+
+from utils.engine import BENCHMARK_ERROR_KINDS, BenchmarkConfig, BenchmarkEngine, BenchmarkError, BenchmarkResult
+from utils.namespace import build_base_namespace, build_params, is_materialized
+from utils.scaling import prepare_inputs, run_load
+from utils.shared_params import AttachedParams, ParamsNotShareable, SharedParams, dump_params, layout, \
+    params_path
+from utils.sinks import Sink, relayed_event
+
+# Pool settings, overridable from the environment
+POOL_SIZE = int(os.environ.get("BENCHMARK_SANDBOX_WORKERS", 2))
+RUN_TIMEOUT = float(os.environ.get("BENCHMARK_SANDBOX_TIMEOUT", 300))     # Wall-clock seconds per run
+CPU_LIMIT = float(os.environ.get("BENCHMARK_SANDBOX_CPU_SECONDS", 240))     # CPU seconds per run
+MEMORY_LIMIT_MB = int(os.environ.get("BENCHMARK_SANDBOX_MEMORY_MB", 2048))
+USE_SECCOMP = os.environ.get("BENCHMARK_SANDBOX_SECCOMP", "").lower() in ("1", "true", "yes")
+# User the workers run as, name or uid; it should own no files. Switching needs a fork server started as root
+SANDBOX_USER = os.environ.get("BENCHMARK_SANDBOX_USER", "")
+# User the web process switches to once the fork server runs, when started as root
+APP_USER = os.environ.get("BENCHMARK_APP_USER", "")
+
+# Seconds between releasing load workers and the shared start of their window
+LOAD_START_DELAY = 0.05
+
+# Largest message a worker may send, results included
+MAX_MESSAGE_BYTES = 64 * 1024 * 1024
+
+# Processes and threads the sandbox user may have at once, across every worker
+MAX_SANDBOX_TASKS = int(os.environ.get("BENCHMARK_SANDBOX_MAX_TASKS", 1024))
+
+# Syscalls refused with EPERM once the seccomp filter is installed: no new programs,
+# no child processes, no network, no tracing or signalling others, no raising limits,
+# and no changing the file system: removing, renaming, truncating or re-permissioning
+# files. Creating files and processes is refused by _FILTERED_SYSCALLS below; openat2
+# is refused outright because its flags sit behind a pointer the filter cannot read.
+_DENIED_SYSCALLS = {
+    "x86_64": {"execve": 59, "execveat": 322, "fork": 57, "vfork": 58, "socket": 41, "connect": 42, "bind": 49,
+               "listen": 50, "accept": 43, "accept4": 288, "ptrace": 101, "kill": 62, "tkill": 200, "tgkill": 234,
+               "setrlimit": 160, "prlimit64": 302, "creat": 85, "unlink": 87, "unlinkat": 263, "rename": 82,
+               "renameat": 264, "renameat2": 316, "truncate": 76, "ftruncate": 77, "mkdir": 83, "mkdirat": 258,
+               "rmdir": 84, "link": 86, "linkat": 265, "symlink": 88, "symlinkat": 266, "chmod": 90, "fchmod": 91,
+               "fchmodat": 268, "chown": 92, "fchown": 93, "lchown": 94, "fchownat": 260, "openat2": 437},
+    "aarch64": {"execve": 221, "execveat": 281, "socket": 198, "connect": 203, "bind": 200, "listen": 201,
+                "accept": 202, "accept4": 242, "ptrace": 117, "kill": 129, "tkill": 130, "tgkill": 131,
+                "setrlimit": 164, "prlimit64": 261, "unlinkat": 35, "renameat": 38, "renameat2": 276,
+                "truncate": 45, "ftruncate": 46, "mkdirat": 34, "linkat": 37, "symlinkat": 36, "fchmod": 52,
+                "fchmodat": 53, "fchown": 55, "fchownat": 54, "openat2": 437},
+}
+
+# Syscalls allowed only with some arguments: clone only for threads (CLONE_THREAD), and
+# open/openat only read-only, without O_CREAT or O_TRUNC. clone3 passes its flags behind
+# a pointer, so it fails with ENOSYS and the C library falls back to clone.
+# Entries map a name to (number, index of the checked argument)
+_FILTERED_SYSCALLS = {
+    "x86_64": {"clone": (56, 0), "open": (2, 1), "openat": (257, 2)},
+    "aarch64": {"clone": (220, 0), "openat": (56, 2)},
+}
+_CLONE3 = 435  # The same on both architectures
+_CLONE_THREAD = 0x00010000
+_OPEN_WRITE_FLAGS = os.O_WRONLY | os.O_RDWR | os.O_CREAT | os.O_TRUNC
+_AUDIT_ARCH = {"x86_64": 0xC000003E, "aarch64": 0xC00000B7}
+_ARCH_ALIASES = {"amd64": "x86_64", "arm64": "aarch64"}
+
+_PR_SET_NO_NEW_PRIVS = 38
+_PR_SET_SECCOMP = 22
+_SECCOMP_MODE_FILTER = 2
+_SECCOMP_RET_ALLOW = 0x7FFF0000
+_SECCOMP_RET_ERRNO = 0x00050000
+_SECCOMP_RET_KILL_PROCESS = 0x80000000
+_SECCOMP_DATA_ARGS = 16  # Offset of args[0] in struct seccomp_data; each argument takes 8 bytes
+_BPF_LD_W_ABS = 0x20
+_BPF_JEQ_K = 0x15
+_BPF_JSET_K = 0x45
+_BPF_RET_K = 0x06
+_ENOSYS = 38
+
+# The only environment variables the fork server and its workers see; everything else,
+# API tokens and cache keys in particular, stays in the web process
+SANDBOX_ENVIRONMENT = ("PATH", "PYTHONPATH", "PYTHONHOME", "LANG", "LC_ALL", "PYTHONDONTWRITEBYTECODE",
+                       "PYTHONUNBUFFERED", "OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS")
+
+# Directory containing the utils package, the fork server's working directory
+_PACKAGE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+class SandboxError(Exception):
+    """A sandboxed run could not complete: the worker crashed, timed out or could not start"""
+
+class _SockFprog(ctypes.Structure):
+    _fields_ = [("len", ctypes.c_ushort), ("filter", ctypes.c_void_p)]
+
+def _prctl(option: int, arg: int = 0, pointer: Optional[int] = None) -> None:
+    libc = ctypes.CDLL(None, use_errno=True)
+    libc.prctl.argtypes = [ctypes.c_int, ctypes.c_ulong, ctypes.c_void_p, ctypes.c_ulong, ctypes.c_ulong]
+    if libc.prctl(option, arg, pointer, 0, 0) != 0:
+        raise OSError(ctypes.get_errno(), f"prctl({option}) failed")
+
+def _seccomp_program(arch: str) -> bytes:
+    """
+    BPF program applying _DENIED_SYSCALLS and _FILTERED_SYSCALLS, killing the process on a foreign architecture
+
+    Instructions jump to named labels, all placed after the jumps as BPF
+    only jumps forward: the shared returns come last.
+    """
+    instructions: List[List[Any]] = []  # [code, true target, false target, k]; targets are labels or 0
+    labels: Dict[str, int] = {}
+
+    def emit(code: int, k: int, true: Any = 0, false: Any = 0) -> None:
+        instructions.append([code, true, false, k])
+
+    emit(_BPF_LD_W_ABS, 4)                                   # seccomp_data.arch
+    emit(_BPF_JEQ_K, _AUDIT_ARCH[arch], false="kill")
+    emit(_BPF_LD_W_ABS, 0)                                   # seccomp_data.nr
+    for number in _DENIED_SYSCALLS[arch].values():
+        emit(_BPF_JEQ_K, number, true="deny")
+    for name, (number, _) in _FILTERED_SYSCALLS[arch].items():
+        emit(_BPF_JEQ_K, number, true=name)
+    emit(_BPF_JEQ_K, _CLONE3, true="nosys")
+    emit(_BPF_RET_K, _SECCOMP_RET_ALLOW)
+    for name, (_, argument) in _FILTERED_SYSCALLS[arch].items():
+        labels[name] = len(instructions)
+        emit(_BPF_LD_W_ABS, _SECCOMP_DATA_ARGS + 8 * argument)  # Low 32 bits, the flags
+        if name == "clone":
+            emit(_BPF_JSET_K, _CLONE_THREAD, true="allow", false="deny")
+        else:
+            emit(_BPF_JSET_K, _OPEN_WRITE_FLAGS, true="deny", false="allow")
+    for label, action in (("allow", _SECCOMP_RET_ALLOW), ("deny", _SECCOMP_RET_ERRNO | 1),  # EPERM
+                          ("nosys", _SECCOMP_RET_ERRNO | _ENOSYS), ("kill", _SECCOMP_RET_KILL_PROCESS)):
+        labels[label] = len(instructions)
+        emit(_BPF_RET_K, action)
+
+    program = []
+    for index, (code, true, false, k) in enumerate(instructions):
+        # Jump offsets count from the next instruction
+        true = labels[true] - index - 1 if true else 0
+        false = labels[false] - index - 1 if false else 0
+        program.append(struct.pack("HBBI", code, true, false, k))
+    return b"".join(program)
+
+def _install_seccomp() -> bool:
+    arch = platform.machine().lower()
+    arch = _ARCH_ALIASES.get(arch, arch)
+    if arch not in _DENIED_SYSCALLS:
+        print(f"Sandbox: seccomp filter not available on {arch}")
+        return False
+    program = _seccomp_program(arch)
+    buffer = ctypes.create_string_buffer(program, len(program))
+    fprog = _SockFprog(len(program) // 8, ctypes.cast(buffer, ctypes.c_void_p))
+    _prctl(_PR_SET_SECCOMP, _SECCOMP_MODE_FILTER, ctypes.addressof(fprog))
+    return True
+
+def user_ids(user: str) -> Tuple[int, int]:
+    """
+    uid and primary gid of a user given by name or uid
+
+    Raises:
+        ValueError: If no such user exists
+    """
+    if pwd is None:
+        raise ValueError("Switching users is not supported on this platform")
+    try:
+        entry = pwd.getpwuid(int(user)) if user.isdigit() else pwd.getpwnam(user)
+    except KeyError:
+        if user.isdigit():
+            return int(user), int(user)  # A uid without a passwd entry owns nothing either
+        raise ValueError(f"Unknown user: {user}")
+    return entry.pw_uid, entry.pw_gid
+
+def drop_privileges(user: str) -> None:
+    """
+    Switch this process to ``user`` for good, dropping supplementary groups
+
+    A no-op unless running as root, so the same code runs in development.
+    """
+    if not user or os.geteuid() != 0:
+        return
+    uid, gid = user_ids(user)
+    os.setgroups([])
+    os.setgid(gid)
+    os.setuid(uid)
+
+def _switch_worker_user(uid: Optional[int], gid: Optional[int], workdir: str) -> None:
+    """
+    Move the worker into an empty directory and to the sandbox user, or fail
+
+    The sandbox user's process count is capped too. The cap would also bind the
+    application if the workers ran as its user, so it only applies when the
+    worker actually switches.
+
+    Raises:
+        OSError: If the worker cannot become the sandbox user, so it never runs
+            user code with the fork server's privileges
+    """
+    os.chdir(workdir)
+    if uid is None or (os.getuid() == uid and os.geteuid() == uid):
+        return
+    if resource is not None and MAX_SANDBOX_TASKS > 0:
+        resource.setrlimit(resource.RLIMIT_NPROC, (MAX_SANDBOX_TASKS, MAX_SANDBOX_TASKS))
+    os.setgroups([])
+    os.setgid(gid)
+    os.setuid(uid)
+
+def _restrict_worker(memory_limit_mb: int, use_seccomp: bool) -> None:
+    """Apply the limits that last for the worker's whole life"""
+    if resource is not None:
+        if memory_limit_mb > 0:
+            limit = memory_limit_mb * 1024 * 1024
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+        resource.setrlimit(resource.RLIMIT_FSIZE, (0, 0))  # No writing files
+        resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+    try:
+        # Exec'd setuid binaries can no longer gain privileges; also required for seccomp
+        _prctl(_PR_SET_NO_NEW_PRIVS, 1)
+        if use_seccomp:
+            _install_seccomp()
+    except (OSError, AttributeError) as e:
+        print(f"Sandbox: could not restrict worker: {str(e)}")
+
+def _limit_cpu(cpu_limit: float) -> None:
+    """
+    Allow the next run cpu_limit CPU seconds; exceeding it raises SIGPROF
+
+    A profiling timer rather than RLIMIT_CPU, which counts the worker's whole
+    life and could not be raised again once seccomp forbids setrlimit.
+    """
+    if cpu_limit > 0:
+        signal.setitimer(signal.ITIMER_PROF, cpu_limit)
+
+class CPULimitExceeded(BaseException):
+    """Raised inside the worker when a run uses up its CPU seconds, past the engine's crash handling"""
+
+def _on_cpu_limit(signum, frame):
+    raise CPULimitExceeded()
+
+def _send(conn: Connection, kind: str, payload: Any = None) -> None:
+    """Send one message to the parent as JSON, which the parent checks rather than unpickles"""
+    conn.send_bytes(json.dumps([kind, payload]).encode())
+
+class _PipeSink(Sink):
+    """Forward engine events from the worker to the parent process"""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def emit(self, event: Dict[str, Any]) -> None:
+        if event["type"] != "result":
+            _send(self.conn, "event", event)
+
+def _build_params(conn: Connection, params_code: str, config: BenchmarkConfig) -> None:
+    """Build the parameters and stream them to the parent: the pickle, then each out-of-band buffer"""
+    try:
+        params, count = build_params(params_code, build_base_namespace(config.preloaded_modules), config.params_seed)
+    except Exception as e:
+        raise BenchmarkError(f"Invalid parameters: {str(e)}", "params")
+    if not is_materialized(params):
+        raise ParamsNotShareable("Generated parameters are built lazily per test and cannot be shared")
+    meta, buffers = dump_params(params)
+    _send(conn, "params", [len(meta), [buffer.nbytes for buffer in buffers],
+                           count if count is not None else len(params)])
+    for data in [meta, *buffers]:
+        conn.send_bytes(data)
+
+def _receive_params_fd(conn: Connection, descriptor: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """The descriptor with the file the parent opened for it, which the sandbox user may not open itself"""
+    if descriptor is None or not descriptor.get("pass_fd"):
+        return descriptor
+    return {**descriptor, "fd": recv_handle(conn)}
+
+def _run_load(conn: Connection, cpu_limit: float, code_blob: bytes, params_code: str, config: BenchmarkConfig,
+              descriptor: Optional[Dict[str, Any]]) -> None:
+    """
+    Load one program at every point the parent asks for, until it sends None
+
+    Inputs are prepared once for all points. For each point: receive
+    (threads, duration), report ready, then load the program from the start
+    time the parent sends.
+    """
+    code = marshal.loads(code_blob)
+    descriptor = _receive_params_fd(conn, descriptor)
+    try:
+        inputs, attached = prepare_inputs(params_code, config, descriptor)
+    except Exception as e:
+        raise BenchmarkError(f"Invalid parameters: {str(e)}", "params")
+    namespace = build_base_namespace(config.preloaded_modules)
+    try:
+        while True:
+            point = conn.recv()
+            if point is None:
+                return
+            threads, duration = point
+            _limit_cpu(cpu_limit)  # Per point: a threaded point may use threads x duration CPU seconds
+            _send(conn, "load_ready", len(inputs))
+            start_at = conn.recv()
+            _send(conn, "load_result", run_load(code, inputs, namespace, config.input_mode, threads, start_at,
+                                                duration))
+    finally:
+        inputs = []
+        if attached is not None:
+            attached.close()
+
+def _run_job(conn: Connection, job: Tuple[Any, ...], cpu_limit: float) -> None:
+    kind, *args = job
+    if kind == "build_params":
+        _build_params(conn, *args)
+        return
+    if kind == "load":
+        _run_load(conn, cpu_limit, *args)
+        return
+    code_blobs, params_code, config, descriptor = args
+    descriptor = _receive_params_fd(conn, descriptor)
+    compiled = [marshal.loads(blob) for blob in code_blobs]
+    engine = BenchmarkEngine(config, sinks=[_PipeSink(conn)])
+    if descriptor is None:
+        _send(conn, "result", engine.run_compiled(compiled, params_code).to_plain())
+        return
+    attached = AttachedParams(descriptor)
+    try:
+        _send(conn, "result", engine.run_compiled(compiled, params_code, attached.params).to_plain())
+    finally:
+        attached.close()
+
+def _worker_main(conn: Connection, settings: Dict[str, Any]) -> None:
+    """Sandbox worker: receive one job, run it, send back events and the outcome, then exit"""
+    cpu_limit = settings["cpu_limit"]
+    signal.signal(signal.SIGPROF, _on_cpu_limit)
+    try:
+        _switch_worker_user(settings["uid"], settings["gid"], settings["workdir"])
+    except OSError as e:
+        _send(conn, "failed", f"Sandbox worker could not switch to its user: {str(e)}")
+        return
+    _restrict_worker(settings["memory_limit_mb"], settings["use_seccomp"])
+    _send(conn, "ready", os.getpid())
+    try:
+        job = conn.recv()
+    except (EOFError, OSError):
+        return
+    if job is None:
+        return
+    try:
+        _limit_cpu(cpu_limit)
+        _run_job(conn, job, cpu_limit)
+    except BenchmarkError as e:
+        _send(conn, "benchmark_error", [str(e), e.kind, e.program, e.test])
+    except ParamsNotShareable as e:
+        _send(conn, "unshareable", str(e))
+    except CPULimitExceeded:
+        _send(conn, "failed", f"Sandboxed run exceeded its CPU time limit of {cpu_limit:g}s")
+    except MemoryError:
+        _send(conn, "failed", "Sandboxed run exceeded its memory limit")
+    except Exception as e:
+        _send(conn, "failed", f"Sandbox worker error: {str(e)}")
+    finally:
+        signal.setitimer(signal.ITIMER_PROF, 0)
+
+def _is_count(value: Any) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool) and value >= 0
+
+def _optional_count(value: Any) -> bool:
+    return value is None or _is_count(value)
+
+def _check_text(payload: Any) -> str:
+    if not isinstance(payload, str):
+        raise ValueError("expected text")
+    return payload
+
+def _check_count(payload: Any) -> int:
+    if not _is_count(payload):
+        raise ValueError("expected a count")
+    return payload
+
+def _check_result(payload: Any) -> BenchmarkResult:
+    if not isinstance(payload, dict):
+        raise ValueError("expected a result")
+    try:
+        return BenchmarkResult.from_plain(payload)
+    except (TypeError, KeyError, AttributeError) as e:
+        raise ValueError(f"malformed result: {str(e)}")
+
+def _check_benchmark_error(payload: Any) -> Tuple[str, str, Optional[int], Optional[int]]:
+    if not (isinstance(payload, list) and len(payload) == 4 and isinstance(payload[0], str)
+            and payload[1] in BENCHMARK_ERROR_KINDS and _optional_count(payload[2]) and _optional_count(payload[3])):
+        raise ValueError("malformed benchmark error")
+    return tuple(payload)
+
+def _check_params(payload: Any) -> Tuple[int, List[int], int]:
+    if not (isinstance(payload, list) and len(payload) == 3 and _is_count(payload[0])
+            and isinstance(payload[1], list) and all(_is_count(size) for size in payload[1])
+            and _is_count(payload[2])):
+        raise ValueError("malformed parameters header")
+    return payload[0], payload[1], payload[2]
+
+def _check_load_result(payload: Any) -> Dict[str, Any]:
+    if not (isinstance(payload, dict) and _is_count(payload.get("calls"))
+            and isinstance(payload.get("elapsed"), (int, float)) and isinstance(payload.get("histogram"), dict)
+            and (payload.get("error") is None or isinstance(payload["error"], str))):
+        raise ValueError("malformed load result")
+    histogram = {}
+    for bucket, count in payload["histogram"].items():
+        if not _is_count(count):
+            raise ValueError("malformed load histogram")
+        histogram[int(bucket)] = count  # JSON object keys are strings
+    return {"calls": payload["calls"], "elapsed": float(payload["elapsed"]), "histogram": histogram,
+            "error": payload["error"]}
+
+# What each kind of worker message may hold, checked before the parent acts on it
+_MESSAGE_CHECKS: Dict[str, Callable[[Any], Any]] = {
+    "ready": _check_count,
+    "event": relayed_event,
+    "result": _check_result,
+    "benchmark_error": _check_benchmark_error,
+    "unshareable": _check_text,
+    "failed": _check_text,
+    "params": _check_params,
+    "load_ready": _check_count,
+    "load_result": _check_load_result,
+}
+
+def _decode_message(data: bytes) -> Tuple[str, Any]:
+    """
+    Parse one worker message and check it against the shape its kind allows
+
+    Workers run untrusted code, so messages are plain JSON and never unpickled.
+
+    Raises:
+        ValueError: If the message is malformed
+    """
+    message = json.loads(data)
+    if not (isinstance(message, list) and len(message) == 2 and message[0] in _MESSAGE_CHECKS):
+        raise ValueError("unknown message")
+    kind, payload = message
+    return kind, _MESSAGE_CHECKS[kind](payload)
+
+def _read_message(conn: Connection) -> Tuple[str, Any]:
+    """
+    Receive and decode the next worker message
+
+    Raises:
+        SandboxError: If the worker died or sent something malformed or too large
+    """
+    try:
+        data = conn.recv_bytes(MAX_MESSAGE_BYTES)
+    except (EOFError, OSError):
+        raise SandboxError("Sandbox worker crashed")
+    try:
+        return _decode_message(data)
+    except (ValueError, RecursionError) as e:  # RecursionError: absurdly deeply nested JSON
+        raise SandboxError(f"Sandbox worker sent an invalid message: {str(e)}")
+
+def _zygote_main(control_fd: int, settings: Dict[str, Any]) -> None:
+    """
+    Fork server for sandbox workers
+
+    Imports the engine and the preloaded modules once, then forks a worker
+    for every socket received on the control channel, so each worker starts
+    warm in a few milliseconds.
+    """
+    build_base_namespace(tuple(settings["preloaded_modules"]))
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)  # Workers are reaped automatically
+    control = socket.socket(fileno=control_fd)
+    # Workers start in an empty directory nobody can write to, away from the application's files
+    settings["workdir"] = tempfile.mkdtemp(prefix="benchmarker-sandbox-")
+    os.chmod(settings["workdir"], 0o555)
+    try:
+        while True:
+            try:
+                _, fds, _, _ = socket.recv_fds(control, 1, 1)
+            except OSError:
+                return
+            if not fds:
+                return  # Parent closed the control channel
+            pid = os.fork()
+            if pid == 0:
+                control.close()
+                try:
+                    _worker_main(Connection(fds[0]), settings)
+                finally:
+                    os._exit(0)
+            os.close(fds[0])
+            control.sendall(struct.pack("q", pid))
+    finally:
+        os.rmdir(settings["workdir"])
+
+class _Zygote:
+    """Handle on the fork server process, started with a clean interpreter"""
+
+    def __init__(self, preloaded_modules: Tuple[str, ...]):
+        uid, gid = user_ids(SANDBOX_USER) if SANDBOX_USER else (None, None)
+        self.control, child = socket.socketpair()
+        settings = {"preloaded_modules": list(preloaded_modules), "memory_limit_mb": MEMORY_LIMIT_MB,
+                    "use_seccomp": USE_SECCOMP, "cpu_limit": CPU_LIMIT, "uid": uid, "gid": gid}
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "utils.sandbox", str(child.fileno()), json.dumps(settings)],
+            cwd=_PACKAGE_ROOT, pass_fds=[child.fileno()],
+            env={name: os.environ[name] for name in SANDBOX_ENVIRONMENT if name in os.environ})
+        child.close()
+        self.lock = threading.Lock()
+
+    def fork(self) -> Tuple[int, Connection]:
+        """Fork a new worker, returning its pid and the parent's end of its pipe"""
+        parent_conn, child_conn = Pipe()
+        try:
+            with self.lock:
+                socket.send_fds(self.control, [b"F"], [child_conn.fileno()])
+                data = b""
+                while len(data) < 8:
+                    chunk = self.control.recv(8 - len(data))
+                    if not chunk:
+                        raise SandboxError("Sandbox fork server exited")
+                    data += chunk
+        except OSError as e:
+            parent_conn.close()
+            raise SandboxError(f"Sandbox fork server unavailable: {str(e)}")
+        finally:
+            child_conn.close()
+        return struct.unpack("q", data)[0], parent_conn
+
+    def alive(self) -> bool:
+        return self.process.poll() is None
+
+    def close(self) -> None:
+        self.control.close()
+        try:
+            self.process.wait(5)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+class _Worker:
+    def __init__(self, zygote: _Zygote):
+        self.pid, self.conn = zygote.fork()
+        # Wait until the worker has applied its limits so a checked-out worker is always ready
+        try:
+            if not self.conn.poll(30):
+                raise SandboxError("Sandbox worker failed to start")
+            kind, payload = _read_message(self.conn)
+            if kind != "ready":
+                raise SandboxError(payload if kind == "failed" else "Sandbox worker failed to start")
+        except SandboxError:
+            self.kill()
+            raise
+
+    def alive(self) -> bool:
+        try:
+            os.kill(self.pid, 0)
+        except OSError:
+            return False
+        return not self.conn.closed
+
+    def kill(self) -> None:
+        try:
+            os.kill(self.pid, signal.SIGKILL)
+        except OSError:
+            pass
+        self.conn.close()
+
+    def stop(self) -> None:
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+        self.conn.close()
+
+class SandboxPool:
+    """
+    Warm pool of sandboxed worker processes that run benchmarks out of the web process
+
+    Workers are forked from a fork server that has already imported the engine
+    and the preloaded modules (NumPy, math, random), so a new worker is ready in
+    milliseconds rather than paying interpreter and NumPy start-up. Each worker
+    runs under rlimits (address space, CPU seconds per run, no file writes),
+    ``no_new_privs`` and optionally a seccomp filter, and runs a single job: the
+    pool keeps ``size`` fresh workers forked ahead of time, so nothing one
+    program does to its worker's modules or pipe can reach a later run.
+    """
+
+    def __init__(self, size: int = POOL_SIZE, timeout: float = RUN_TIMEOUT,
+                 preloaded_modules: Optional[Sequence[str]] = None):
+        self.size = max(size, 1)
+        self.timeout = timeout
+        self.preloaded_modules = tuple(preloaded_modules or BenchmarkConfig().preloaded_modules)
+        self.idle: "queue.Queue[_Worker]" = queue.Queue()
+        self.lock = threading.Lock()
+        self.zygote: Optional[_Zygote] = None
+        self.started = 0
+        self.closed = False
+
+    def _get_zygote(self) -> _Zygote:
+        with self.lock:
+            if self.zygote is None or not self.zygote.alive():
+                self.zygote = _Zygote(self.preloaded_modules)
+            return self.zygote
+
+    def start(self) -> None:
+        """Start the fork server now, so it keeps the privileges the caller has, then workers in the background"""
+        try:
+            self._get_zygote()
+        except (OSError, ValueError) as e:
+            print(f"Sandbox fork server start failed: {str(e)}")
+        with self.lock:
+            missing = self.size - self.started
+            self.started = self.size
+        for _ in range(missing):
+            self._spawn_async()
+
+    def _spawn_async(self) -> None:
+        def spawn():
+            try:
+                self.idle.put(_Worker(self._get_zygote()))
+            except Exception as e:
+                if not self.closed:
+                    print(f"Sandbox worker start failed: {str(e)}")
+                with self.lock:
+                    self.started -= 1
+        thread = threading.Thread(target=spawn, name="sandbox-spawn")
+        thread.daemon = True
+        thread.start()
+
+    def _checkout(self) -> _Worker:
+        self.start()
+        while True:
+            try:
+                worker = self.idle.get(timeout=self.timeout)
+            except queue.Empty:
+                raise SandboxError("No sandbox worker became available")
+            if worker.alive():
+                return worker
+            worker.kill()
+            self._spawn_async()
+
+    def _checkin(self, worker: _Worker, healthy: bool) -> None:
+        """Retire a worker after its job and fork its replacement"""
+        if healthy:
+            worker.stop()
+        else:
+            worker.kill()
+        if not self.closed:
+            self._spawn_async()
+
+    def _deadline(self) -> float:
+        """Monotonic time by which a run started now must have finished"""
+        return time.monotonic() + self.timeout
+
+    def _wait(self, worker: _Worker, deadline: float) -> None:
+        """Wait for a worker message until the run's deadline, however many messages came before"""
+        if not worker.conn.poll(max(deadline - time.monotonic(), 0)):
+            raise SandboxError(f"Sandboxed run timed out after {self.timeout:.0f}s")
+
+    def _receive(self, worker: _Worker, deadline: float) -> Tuple[str, Any]:
+        """Next message from a worker, turning failures into exceptions"""
+        self._wait(worker, deadline)
+        kind, payload = _read_message(worker.conn)
+        if kind == "benchmark_error":
+            raise BenchmarkError(*payload)
+        if kind == "unshareable":
+            raise ParamsNotShareable(payload)
+        if kind == "failed":
+            raise SandboxError(payload)
+        return kind, payload
+
+    def _expect(self, worker: _Worker, expected: str, deadline: float) -> Any:
+        """Payload of the next worker message, which must be of the expected kind"""
+        kind, payload = self._receive(worker, deadline)
+        if kind != expected:
+            raise SandboxError(f"Sandbox worker sent {kind} where {expected} was expected")
+        return payload
+
+    @staticmethod
+    def _send_job(worker: _Worker, job: Tuple[Any, ...], params: Optional[Dict[str, Any]]) -> None:
+        """
+        Send a job ending in a params descriptor, then the file behind the descriptor
+
+        Workers run as a user that cannot open the application's segments or
+        cache files, so the parent opens the file and passes the descriptor.
+        """
+        fd = None
+        if params is not None:
+            try:
+                fd = os.open(params_path(params), os.O_RDONLY)
+            except OSError:
+                fd = None  # No file to pass: the worker copies the segment by name
+        try:
+            worker.conn.send((*job, params if fd is None else {**params, "pass_fd": True}))
+            if fd is not None:
+                send_handle(worker.conn, fd, worker.pid)
+        except (OSError, ValueError) as e:
+            raise SandboxError(f"Could not send the job to the sandbox: {str(e)}")
+        finally:
+            if fd is not None:
+                os.close(fd)
+
+    def publish_params(self, params_code: str, config: BenchmarkConfig) -> SharedParams:
+        """
+        Build parameters once in a sandbox worker and publish them in shared memory
+
+        The worker streams the pickle and each out-of-band buffer (NumPy arrays,
+        bytearrays) over its pipe straight into the new segment, so every later
+        run given the result attaches to the same pages instead of rebuilding or
+        unpickling a copy of the inputs. The caller closes the result when done.
+        The segment may not exceed the workers' memory limit, and the whole
+        transfer shares one deadline.
+
+        Raises:
+            BenchmarkError: If the parameters code failed inside the worker or are too large
+            ParamsNotShareable: If the parameters are lazily generated or cannot be pickled
+            SandboxError: If the worker crashed or timed out
+        """
+        worker = self._checkout()
+        deadline = self._deadline()
+        healthy = False
+        shared: Optional[SharedParams] = None
+        try:
+            try:
+                worker.conn.send(("build_params", params_code, config))
+            except (OSError, ValueError) as e:
+                raise SandboxError(f"Could not send the job to the sandbox: {str(e)}")
+            try:
+                meta_size, buffer_sizes, count = self._expect(worker, "params", deadline)
+            except (BenchmarkError, ParamsNotShareable):
+                healthy = True
+                raise
+            # The header is the worker's word; never allocate more than a worker may hold itself
+            size = layout([meta_size, *buffer_sizes])[1]
+            if MEMORY_LIMIT_MB > 0 and size > MEMORY_LIMIT_MB * 1024 * 1024:
+                raise BenchmarkError(f"Parameters take {size / 2 ** 20:.0f} MB, more than the sandbox limit "
+                                     f"of {MEMORY_LIMIT_MB} MB", "params")
+            shared = SharedParams(meta_size, buffer_sizes, count)
+            for index in range(len(shared.sizes)):
+                self._wait(worker, deadline)
+                with shared.region(index) as region:
+                    if worker.conn.recv_bytes_into(region) != len(region):
+                        raise SandboxError("Sandbox worker sent parameters of the wrong size")
+            healthy = True
+            return shared
+        except BufferTooShort:
+            raise SandboxError("Sandbox worker sent parameters of the wrong size")
+        except (EOFError, OSError) as e:
+            raise SandboxError(f"Sandbox worker crashed while sending parameters: {str(e)}")
+        finally:
+            if not healthy and shared is not None:
+                shared.close()
+            self._checkin(worker, healthy)
+
+    def run(self, compiled: List[Any], params_code: str, config: BenchmarkConfig,
+            emit: Callable[..., None], params: Optional[Dict[str, Any]] = None) -> BenchmarkResult:
+        """
+        Run already compiled programs in a sandbox worker
+
+        Args:
+            compiled: Code objects from compile(), sent to the worker with marshal
+            params_code: Parameters code defining ``params``
+            config: Engine settings for the run
+            emit: Receives the worker's progress and error events
+            params: Descriptor of published or cached parameters, sent instead of running params_code
+
+        Returns:
+            BenchmarkResult from the worker
+
+        Raises:
+            BenchmarkError: If the programs or parameters failed inside the worker
+            SandboxError: If the worker crashed, hit a limit or timed out
+        """
+        # Workers cannot write files; the caller fills the params cache and passes a descriptor instead
+        config = replace(config, executor="inline", cache_params=False, scaling_workers=0)
+        worker = self._checkout()
+        deadline = self._deadline()  # One budget for the whole run, not per progress message
+        healthy = False
+        try:
+            self._send_job(worker, ("run", [marshal.dumps(code) for code in compiled], params_code, config), params)
+            while True:
+                try:
+                    kind, payload = self._receive(worker, deadline)
+                except BenchmarkError:
+                    healthy = True
+                    raise
+                if kind == "event":
+                    emit(**payload)
+                elif kind == "result":
+                    healthy = True
+                    return payload
+                else:
+                    raise SandboxError(f"Sandbox worker sent {kind} during a run")
+        finally:
+            self._checkin(worker, healthy)
+
+    def run_load(self, code: Any, params_code: str, config: BenchmarkConfig, params: Optional[Dict[str, Any]],
+                 shapes: Sequence[Tuple[int, int]], duration: float,
+                 before_point: Optional[Callable[[int], None]] = None) -> List[List[Dict[str, Any]]]:
+        """
+        Run one program under concurrent load in dedicated sandbox workers
+
+        Workers are forked for this call alone, outside the pool, each runs the
+        points of this one program, and all are killed afterwards. At each point
+        every process prepares its inputs first, then all of them start calling
+        at the same moment.
+
+        Args:
+            code: Compiled program
+            params_code: Parameters code defining ``params``
+            config: Engine settings for the run
+            params: Descriptor of published or cached parameters, or None to build them from params_code
+            shapes: (processes, threads per process) of each point, in order
+            duration: Seconds of load per point
+            before_point: Called with the index of each point before it starts
+
+        Returns:
+            For each point, the utils.scaling.run_load outcome of every process
+
+        Raises:
+            BenchmarkError: If the parameters failed inside a worker
+            SandboxError: If a worker crashed, hit a limit or timed out
+        """
+        config = replace(config, executor="inline", cache_params=False, scaling_workers=0)
+        blob = marshal.dumps(code)
+        workers: List[_Worker] = []
+        try:
+            zygote = self._get_zygote()
+            for _ in range(max(processes for processes, _ in shapes)):
+                workers.append(_Worker(zygote))
+                self._send_job(workers[-1], ("load", blob, params_code, config), params)
+            results = []
+            for index, (processes, threads) in enumerate(shapes):
+                if before_point:
+                    before_point(index)
+                deadline = self._deadline() + duration
+                active = workers[:processes]
+                for worker in active:
+                    worker.conn.send((threads, duration))
+                for worker in active:
+                    self._expect(worker, "load_ready", deadline)
+                start_at = time.time() + LOAD_START_DELAY
+                for worker in active:
+                    worker.conn.send(start_at)
+                results.append([self._expect(worker, "load_result", deadline) for worker in active])
+            return results
+        except (OSError, ValueError) as e:
+            raise SandboxError(f"Could not run the load test in the sandbox: {str(e)}")
+        finally:
+            for worker in workers:
+                worker.kill()
+
+    def close(self) -> None:
+        self.closed = True
+        while True:
+            try:
+                self.idle.get_nowait().stop()
+            except queue.Empty:
+                break
+        with self.lock:
+            if self.zygote is not None:
+                self.zygote.close()
+                self.zygote = None
+
+# Process-wide pool, created on first use
+_pool: Optional[SandboxPool] = None
+_pool_lock = threading.Lock()
+
+def get_sandbox_pool() -> SandboxPool:
+    """Return the shared sandbox pool, creating it on first use"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = SandboxPool()
+        return _pool
+
+if __name__ == "__main__":
+    _zygote_main(int(sys.argv[1]), json.loads(sys.argv[2]))
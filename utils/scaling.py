@@ -0,0 +1,192 @@
+import math
+import threading
+import time
+from itertools import islice
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence, Tuple
+
+from utils.inputs import make_input_provider
+from utils.namespace import build_base_namespace, build_params, iterate_params
+from utils.shared_params import AttachedParams
+
+# "threads": one process running N threads; "processes": N processes with one thread each
+SCALING_MODES = ("threads", "processes")
+
+# Upper bound on the worker count a scaling run may ask for
+MAX_SCALING_WORKERS = 16
+
+# Test inputs each load worker cycles through; later inputs are not built
+SCALING_MAX_INPUTS = 100
+
+# Latency histogram resolution: buckets per doubling, about 4% wide
+_BUCKETS_PER_OCTAVE = 16
+
+def _bucket(nanoseconds: int) -> int:
+    return int(math.log2(max(nanoseconds, 1)) * _BUCKETS_PER_OCTAVE)
+
+def _bucket_seconds(bucket: int) -> float:
+    return 2 ** ((bucket + 0.5) / _BUCKETS_PER_OCTAVE) / 1e9
+
+def merge_histograms(histograms: Sequence[Mapping[int, int]]) -> Dict[int, int]:
+    merged: Dict[int, int] = {}
+    for histogram in histograms:
+        for bucket, count in histogram.items():
+            merged[bucket] = merged.get(bucket, 0) + count
+    return merged
+
+def percentile(histogram: Mapping[int, int], fraction: float) -> Optional[float]:
+    """Approximate latency in seconds below which ``fraction`` of the calls completed"""
+    total = sum(histogram.values())
+    if not total:
+        return None
+    rank = fraction * total
+    seen = 0
+    for bucket in sorted(histogram):
+        seen += histogram[bucket]
+        if seen >= rank:
+            return _bucket_seconds(bucket)
+    return _bucket_seconds(max(histogram))
+
+def prepare_inputs(params_code: str, config: Any,
+                   descriptor: Optional[Dict[str, Any]] = None) -> Tuple[List[Any], Optional[AttachedParams]]:
+    """
+    Test inputs for a load run, from a published or cached descriptor or by running the parameters code
+
+    Returns:
+        Tuple of (up to SCALING_MAX_INPUTS inputs, attachment to close afterwards or None)
+    """
+    attached = None
+    if descriptor is not None:
+        attached = AttachedParams(descriptor)
+        params, count = attached.params, attached.count
+    else:
+        params, count = build_params(params_code, build_base_namespace(config.preloaded_modules), config.params_seed)
+    params_iter, _ = iterate_params(params, count)
+    return list(islice(params_iter, SCALING_MAX_INPUTS)), attached
+
+def run_load(code: Any, inputs: Sequence[Any], namespace: Mapping[str, Any], input_mode: str, threads: int,
+             start_at: float, duration: float) -> Dict[str, Any]:
+    """
+    Call a program back to back from several threads for a fixed window
+
+    Each thread cycles through the test inputs and gets a fresh input for every
+    call (a copy, the shared object or a factory call, per ``input_mode``), so
+    no call sees what an earlier one did to its input. Preparing it stays out of
+    the timed span of the call, though in copy and factory modes it takes part
+    of the window and so lowers throughput.
+
+    Args:
+        code: Compiled program
+        inputs: Test inputs
+        namespace: Base namespace each call runs against
+        input_mode: One of INPUT_MODES
+        threads: Threads calling the program concurrently
+        start_at: time.time() at which every thread starts, shared with other processes
+        duration: Seconds each thread keeps calling
+
+    Returns:
+        Dict with total calls, elapsed seconds, latency histogram and the first error, if any
+    """
+    lock = threading.Lock()
+    outcome: Dict[str, Any] = {"calls": 0, "elapsed": 0.0, "histogram": {}, "error": None}
+
+    def call_repeatedly():
+        providers = [make_input_provider(param, input_mode) for param in inputs]
+        histogram: Dict[int, int] = {}
+        calls = 0
+        error = None
+        delay = start_at - time.time()
+        if delay > 0:
+            time.sleep(delay)
+        end = start_at + duration
+        clock = time.perf_counter_ns
+        try:
+            while time.time() < end:
+                scope = namespace.copy()
+                scope["params"] = providers[calls % len(providers)]()
+                start = clock()
+                exec(code, scope)
+                bucket = _bucket(clock() - start)
+                histogram[bucket] = histogram.get(bucket, 0) + 1
+                calls += 1
+        except Exception as e:
+            error = f"{type(e).__name__}: {str(e)}"
+        finished = time.time() - start_at
+        with lock:
+            outcome["calls"] += calls
+            outcome["elapsed"] = max(outcome["elapsed"], finished)
+            outcome["histogram"] = merge_histograms([outcome["histogram"], histogram])
+            outcome["error"] = outcome["error"] or error
+
+    workers = [threading.Thread(target=call_repeatedly, name=f"load-{index}") for index in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return outcome
+
+def summarize_point(mode: str, workers: int, outcomes: Sequence[Mapping[str, Any]],
+                    baseline: Optional[float]) -> Dict[str, Any]:
+    """
+    Combine the outcomes of every process at one worker count
+
+    Args:
+        mode: One of SCALING_MODES
+        workers: Threads or processes at this point
+        outcomes: run_load results, one per process
+        baseline: Throughput with one worker in the same mode, None for the first point
+
+    Returns:
+        JSON-safe point with throughput, latency percentiles and scaling efficiency
+    """
+    histogram = merge_histograms([outcome["histogram"] for outcome in outcomes])
+    calls = sum(outcome["calls"] for outcome in outcomes)
+    elapsed = max(outcome["elapsed"] for outcome in outcomes)
+    throughput = calls / elapsed if elapsed > 0 else 0.0
+    if baseline is None:
+        baseline = throughput
+    return {
+        "mode": mode,
+        "workers": workers,
+        "calls": calls,
+        "throughput": throughput,
+        "p50": percentile(histogram, 0.5),
+        "p90": percentile(histogram, 0.9),
+        "p99": percentile(histogram, 0.99),
+        "efficiency": throughput / (workers * baseline) if baseline else None,
+        "error": next((outcome["error"] for outcome in outcomes if outcome["error"]), None),
+    }
+
+def measure_scaling(pool: Any, code: Any, params_code: str, config: Any, params: Optional[Dict[str, Any]] = None,
+                    on_point: Optional[Callable[[str, int], None]] = None) -> List[Dict[str, Any]]:
+    """
+    Throughput of one program at 1..config.scaling_workers threads and processes
+
+    Every point runs in sandbox workers, so programs never share the web
+    process with the load they generate.
+
+    Args:
+        pool: SandboxPool providing the worker processes
+        code: Compiled program
+        params_code: Parameters code defining ``params``
+        config: Engine settings, scaling_workers, scaling_modes and scaling_duration in particular
+        params: Descriptor of published or cached parameters, built from params_code when None
+        on_point: Called with the mode and worker count before each point
+
+    Returns:
+        One summarize_point result per mode and worker count
+    """
+    points = [(mode, workers) for mode in config.scaling_modes for workers in range(1, config.scaling_workers + 1)]
+    shapes = [(workers, 1) if mode == "processes" else (1, workers) for mode, workers in points]
+
+    def before_point(index: int) -> None:
+        if on_point:
+            on_point(*points[index])
+
+    outcomes = pool.run_load(code, params_code, config, params, shapes, config.scaling_duration, before_point)
+    results = []
+    baselines: Dict[str, float] = {}
+    for (mode, workers), point_outcomes in zip(points, outcomes):
+        point = summarize_point(mode, workers, point_outcomes, baselines.get(mode))
+        baselines.setdefault(mode, point["throughput"])
+        results.append(point)
+    return results
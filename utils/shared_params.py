@@ -0,0 +1,144 @@
+import mmap
+import os
+import pickle
+from multiprocessing import shared_memory
+from typing import Any, Dict, List, Sequence, Tuple
+
+# Buffers start on this boundary so NumPy views are aligned for any dtype
+ALIGNMENT = 64
+
+# Where POSIX shared memory segments appear as files on Linux
+_SHM_DIR = "/dev/shm"
+
+class ParamsNotShareable(Exception):
+    """The parameters cannot be pickled, e.g. factory mode lambdas"""
+
+def dump_params(params: Sequence[Any]) -> Tuple[bytes, List[memoryview]]:
+    """
+    Pickle parameters with protocol 5, keeping large buffers out of band
+
+    NumPy arrays and bytearrays are not copied into the pickle; their memory is
+    returned separately so it can be placed in shared memory or a file as is.
+
+    Returns:
+        Tuple of (pickle bytes, raw out-of-band buffers in pickle order)
+
+    Raises:
+        ParamsNotShareable: If the parameters cannot be pickled
+    """
+    buffers: List[pickle.PickleBuffer] = []
+    try:
+        meta = pickle.dumps(list(params), protocol=5, buffer_callback=buffers.append)
+        return meta, [buffer.raw() for buffer in buffers]
+    except Exception as e:
+        raise ParamsNotShareable(f"Parameters cannot be shared between processes: {str(e)}")
+
+def layout(sizes: Sequence[int]) -> Tuple[List[int], int]:
+    """Aligned offset of each region and the total size of a segment holding them back to back"""
+    offsets = []
+    end = 0
+    for size in sizes:
+        end = -(-end // ALIGNMENT) * ALIGNMENT
+        offsets.append(end)
+        end += size
+    return offsets, max(end, 1)
+
+def load_regions(view: memoryview, offsets: Sequence[int], sizes: Sequence[int]) -> List[Any]:
+    """Unpickle parameters whose pickle and buffers lie at the given regions of ``view``, without copying"""
+    regions = [view[offset:offset + size] for offset, size in zip(offsets, sizes)]
+    return pickle.loads(regions[0], buffers=regions[1:])
+
+class SharedParams:
+    """
+    Parameters published once in a shared memory segment
+
+    The publishing process owns the segment and unlinks it on close(); workers
+    receive only the small ``descriptor`` and map the segment themselves.
+    """
+
+    def __init__(self, meta_size: int, buffer_sizes: Sequence[int], count: int):
+        self.sizes = [meta_size, *buffer_sizes]
+        self.offsets, size = layout(self.sizes)
+        self.count = count
+        self.segment = shared_memory.SharedMemory(create=True, size=size)
+
+    @classmethod
+    def publish(cls, params: Sequence[Any]) -> "SharedParams":
+        """Copy already built parameters into a new segment"""
+        meta, buffers = dump_params(params)
+        shared = cls(len(meta), [buffer.nbytes for buffer in buffers], len(params))
+        for index, data in enumerate([meta, *buffers]):
+            with shared.region(index) as region:
+                region[:] = data
+        return shared
+
+    def region(self, index: int) -> memoryview:
+        """Writable view of one region: 0 is the pickle, then each buffer. Release it before close()"""
+        offset = self.offsets[index]
+        return self.segment.buf[offset:offset + self.sizes[index]]
+
+    @property
+    def nbytes(self) -> int:
+        return self.segment.size
+
+    @property
+    def descriptor(self) -> Dict[str, Any]:
+        """Everything a worker needs to attach, small enough to send with every job"""
+        return {"name": self.segment.name, "size": self.segment.size, "offsets": self.offsets,
+                "sizes": self.sizes, "count": self.count}
+
+    def close(self) -> None:
+        try:
+            self.segment.close()
+            self.segment.unlink()
+        except FileNotFoundError:
+            pass
+
+def params_path(descriptor: Dict[str, Any]) -> str:
+    """File holding a published segment or cache entry; segments may have none where /dev/shm is missing"""
+    return descriptor.get("file") or os.path.join(_SHM_DIR, descriptor.get("name", "").lstrip("/"))
+
+def _map_private(descriptor: Dict[str, Any]) -> Any:
+    """
+    Map a published segment or cache file privately: reads share the page cache, writes stay in this process
+
+    A descriptor with an ``fd`` is mapped from that already open file, which
+    lets a process that may not open the file itself attach. Where segments are
+    not visible as files the bytes are copied instead.
+    """
+    size = descriptor["size"]
+    if descriptor.get("fd") is not None:
+        return mmap.mmap(descriptor["fd"], size, flags=mmap.MAP_PRIVATE, prot=mmap.PROT_READ | mmap.PROT_WRITE)
+    path = params_path(descriptor)
+    if os.path.exists(path):
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            return mmap.mmap(fd, size, flags=mmap.MAP_PRIVATE, prot=mmap.PROT_READ | mmap.PROT_WRITE)
+        finally:
+            os.close(fd)
+    segment = shared_memory.SharedMemory(name=descriptor["name"])
+    try:
+        return bytearray(segment.buf[:size])
+    finally:
+        segment.close()
+
+class AttachedParams:
+    """
+    A view of published or cached parameters; NumPy arrays in ``params`` point into the mapping
+
+    ``descriptor`` names either a shared memory segment or a params cache file
+    (see utils.params_cache), with the regions' offsets and sizes.
+    """
+
+    def __init__(self, descriptor: Dict[str, Any]):
+        self._mapping = _map_private(descriptor)
+        self.params: List[Any] = load_regions(memoryview(self._mapping), descriptor["offsets"], descriptor["sizes"])
+        self.count: int = descriptor["count"]
+
+    def close(self) -> None:
+        self.params = []
+        if isinstance(self._mapping, mmap.mmap):
+            try:
+                self._mapping.close()
+            except BufferError:
+                pass  # Arrays still reference it; unmapped when they are collected
@@ -0,0 +1,120 @@
+import json
+import queue
+import threading
+from typing import Any, Callable, Dict, Iterable
+
+# Progress and result events emitted by the benchmark engine are plain dicts:
+#   {"type": "status", "status": "running"}
+#   {"type": "progress", "progress": 40, "message": "...", "current_test": 3, "total_tests": 10}
+#   {"type": "result", "result": {...}}
+#   {"type": "error", "error": "..."}
+
+# Fields and their types that progress events relayed from another process may carry
+RELAYED_EVENT_FIELDS = {
+    "status": {"status": str},
+    "progress": {"progress": int, "message": str, "current_test": int, "total_tests": int},
+    "error": {"error": str},
+}
+
+class Sink:
+    """Base class for destinations of benchmark engine events"""
+
+    def emit(self, event: Dict[str, Any]) -> None:
+        raise NotImplementedError
+
+class DictSink(Sink):
+    """
+    Mirror engine events into a status dictionary
+
+    This is the shape the Flask polling endpoints read from
+    ``user_benchmark_status``.
+    """
+
+    def __init__(self, status: Dict[str, Any]):
+        self.status = status
+
+    def emit(self, event: Dict[str, Any]) -> None:
+        kind = event["type"]
+        if kind == "status":
+            self.status["status"] = event["status"]
+        elif kind == "progress":
+            for key in ("progress", "message", "current_test", "total_tests"):
+                if key in event:
+                    self.status[key] = event[key]
+        elif kind == "result":
+            self.status["status"] = "complete"
+            self.status["progress"] = 100
+        elif kind == "error":
+            self.status["status"] = "error"
+            self.status["error"] = event["error"]
+
+class QueueSink(Sink):
+    """Put every engine event on a queue for another thread or process to consume"""
+
+    def __init__(self, event_queue: "queue.Queue"):
+        self.queue = event_queue
+
+    def emit(self, event: Dict[str, Any]) -> None:
+        self.queue.put(event)
+
+class CallbackSink(Sink):
+    """Call a function with every engine event"""
+
+    def __init__(self, callback: Callable[[Dict[str, Any]], None]):
+        self.callback = callback
+
+    def emit(self, event: Dict[str, Any]) -> None:
+        self.callback(event)
+
+class FileSink(Sink):
+    """Append engine events to a file as JSON lines"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+
+    def emit(self, event: Dict[str, Any]) -> None:
+        line = json.dumps(event, default=_to_json)
+        with self.lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+def _to_json(obj: Any) -> Any:
+    """Serialize structured results through their to_dict, anything else as text"""
+    if hasattr(obj, "to_dict"):
+        return obj.to_dict()
+    return str(obj)
+
+def broadcast(sinks: Iterable[Sink], event: Dict[str, Any]) -> None:
+    """
+    Send an event to every sink, isolating the engine from sink failures
+
+    Args:
+        sinks: Sinks to notify
+        event: Event to send
+    """
+    for sink in sinks:
+        try:
+            sink.emit(event)
+        except Exception as e:
+            print(f"Warning: benchmark sink {type(sink).__name__} failed: {str(e)}")
+
+def relayed_event(data: Any) -> Dict[str, Any]:
+    """
+    Check an event received from a process running untrusted code before any sink sees it
+
+    Args:
+        data: Decoded JSON event from a sandbox worker or another interpreter
+
+    Returns:
+        The event, holding only RELAYED_EVENT_FIELDS of the expected types
+
+    Raises:
+        ValueError: If the event has another type, an unknown field or a mistyped value
+    """
+    if not isinstance(data, dict) or data.get("type") not in RELAYED_EVENT_FIELDS:
+        raise ValueError("Unexpected event type")
+    allowed = RELAYED_EVENT_FIELDS[data["type"]]
+    for key, value in data.items():
+        if key != "type" and (key not in allowed or not isinstance(value, allowed[key]) or isinstance(value, bool)):
+            raise ValueError(f"Unexpected event field: {key}")
+    return dict(data)
@@ -0,0 +1,126 @@
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+# Events kept per trace; later events are counted but dropped so huge runs stay bounded
+MAX_EVENTS = 20000
+
+class Tracer:
+    """
+    Records timed spans of one benchmark run, from submit to AI feedback
+
+    Spans are kept as Chrome trace events, so a run can be downloaded and
+    opened in chrome://tracing or Perfetto. Each span lands on a lane (the
+    current thread's name by default); concurrent work on one thread, such
+    as the AI requests sharing the event loop, passes its own lane so the
+    spans do not overlap on a single row.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.trace_id = uuid.uuid4().hex[:12]
+        self.started_at = time.time()
+        self.origin_ns = time.perf_counter_ns()
+        self.events: List[Dict[str, Any]] = []
+        self.dropped = 0
+        self.lanes: Dict[str, int] = {}
+        self.lock = threading.Lock()
+
+    def _lane_id(self, lane: Optional[str]) -> int:
+        lane = lane or threading.current_thread().name
+        if lane not in self.lanes:
+            self.lanes[lane] = len(self.lanes) + 1
+        return self.lanes[lane]
+
+    def _record(self, event: Dict[str, Any], lane: Optional[str]) -> None:
+        with self.lock:
+            if len(self.events) >= MAX_EVENTS:
+                self.dropped += 1
+                return
+            event["pid"] = 1
+            event["tid"] = self._lane_id(lane)
+            self.events.append(event)
+
+    def add(self, name: str, start_ns: int, end_ns: int, category: str = "app", lane: Optional[str] = None,
+            args: Optional[Dict[str, Any]] = None) -> None:
+        """Record a span from perf_counter_ns readings"""
+        self._record({"name": name, "cat": category, "ph": "X", "ts": (start_ns - self.origin_ns) / 1e3,
+                      "dur": (end_ns - start_ns) / 1e3, "args": args or {}}, lane)
+
+    @contextmanager
+    def span(self, name: str, category: str = "app", lane: Optional[str] = None, **args: Any) -> Iterator[Dict[str, Any]]:
+        """
+        Time the enclosed block as one span
+
+        Yields the span's args dict, so details learned inside the block
+        (model used, bytes returned...) can be attached to it.
+        """
+        start = time.perf_counter_ns()
+        try:
+            yield args
+        except BaseException as e:
+            args["error"] = type(e).__name__
+            raise
+        finally:
+            self.add(name, start, time.perf_counter_ns(), category, lane, args)
+
+    def instant(self, name: str, category: str = "app", lane: Optional[str] = None, **args: Any) -> None:
+        """Record a point in time, such as the moment a run was submitted"""
+        self._record({"name": name, "cat": category, "ph": "i", "s": "t",
+                      "ts": (time.perf_counter_ns() - self.origin_ns) / 1e3, "args": args}, lane)
+
+    def to_chrome_trace(self) -> Dict[str, Any]:
+        """
+        Export in the Chrome trace-event format
+
+        Returns:
+            Dict with traceEvents plus lane names and run metadata
+        """
+        with self.lock:
+            events = list(self.events)
+            lanes = dict(self.lanes)
+            dropped = self.dropped
+        metadata = [{"name": "process_name", "ph": "M", "pid": 1, "args": {"name": self.name}}]
+        metadata += [{"name": "thread_name", "ph": "M", "pid": 1, "tid": tid, "args": {"name": lane}}
+                     for lane, tid in lanes.items()]
+        return {
+            "traceEvents": metadata + events,
+            "displayTimeUnit": "ms",
+            "otherData": {"trace_id": self.trace_id, "started_at": self.started_at, "dropped_events": dropped},
+        }
+
+    def summary(self) -> List[Dict[str, Any]]:
+        """
+        Total time per stage, in the order stages first started
+
+        Returns:
+            List of dicts with category, name, count, start_ms, total_ms and max_ms
+        """
+        stages: Dict[tuple, Dict[str, Any]] = {}
+        with self.lock:
+            spans = [event for event in self.events if event["ph"] == "X"]
+        for event in sorted(spans, key=lambda e: e["ts"]):
+            key = (event["cat"], event["name"])
+            stage = stages.setdefault(key, {"category": event["cat"], "name": event["name"], "count": 0,
+                                            "start_ms": round(event["ts"] / 1e3, 3), "total_ms": 0.0, "max_ms": 0.0})
+            stage["count"] += 1
+            stage["total_ms"] += event["dur"] / 1e3
+            stage["max_ms"] = max(stage["max_ms"], event["dur"] / 1e3)
+        for stage in stages.values():
+            stage["total_ms"] = round(stage["total_ms"], 3)
+            stage["max_ms"] = round(stage["max_ms"], 3)
+        return list(stages.values())
+
+class NullTracer(Tracer):
+    """Tracer that records nothing, used when a run is not traced"""
+
+    def __init__(self):
+        super().__init__("untraced")
+
+    def _record(self, event: Dict[str, Any], lane: Optional[str]) -> None:
+        pass
+
+# Shared do-nothing tracer, the default wherever a tracer is optional
+NULL_TRACER = NullTracer()
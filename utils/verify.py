@@ -0,0 +1,74 @@
+import cmath
+import numpy as np
+from typing import Any
+
+# Default tolerances, matching numpy.allclose
+DEFAULT_RTOL = 1e-05
+DEFAULT_ATOL = 1e-08
+
+class MissingResultError(Exception):
+    """A program finished without assigning ``result``"""
+
+def outputs_match(a: Any, b: Any, rtol: float = DEFAULT_RTOL, atol: float = DEFAULT_ATOL) -> bool:
+    """
+    Compare two program results, with tolerance for floats and NumPy arrays
+
+    Args:
+        a: Result of the reference program
+        b: Result of the candidate program
+        rtol: Relative tolerance for floating point values
+        atol: Absolute tolerance for floating point values
+
+    Returns:
+        bool: True if the results are equivalent
+    """
+    if isinstance(a, np.ndarray) or isinstance(b, np.ndarray):
+        a, b = np.asarray(a), np.asarray(b)
+        if a.shape != b.shape:
+            return False
+        if np.issubdtype(a.dtype, np.number) and np.issubdtype(b.dtype, np.number):
+            return bool(np.allclose(a, b, rtol=rtol, atol=atol, equal_nan=True))
+        return bool(np.array_equal(a, b))
+    if isinstance(a, (float, complex, np.inexact)) or isinstance(b, (float, complex, np.inexact)):
+        if not isinstance(a, (int, float, complex, np.number)) or not isinstance(b, (int, float, complex, np.number)):
+            return False
+        # cmath so a complex result can be compared with a real one
+        if cmath.isnan(a) and cmath.isnan(b):
+            return True
+        return cmath.isclose(a, b, rel_tol=rtol, abs_tol=atol)
+    if isinstance(a, (list, tuple)) and isinstance(b, (list, tuple)):
+        return type(a) is type(b) and len(a) == len(b) and all(
+            outputs_match(x, y, rtol, atol) for x, y in zip(a, b))
+    if isinstance(a, dict) and isinstance(b, dict):
+        return a.keys() == b.keys() and all(outputs_match(a[k], b[k], rtol, atol) for k in a)
+    try:
+        return bool(a == b)
+    except Exception:
+        return False
+
+def describe_output(value: Any, limit: int = 80) -> str:
+    """Short repr of a result for error messages"""
+    text = repr(value)
+    return text if len(text) <= limit else text[:limit - 3] + "..."
+
+def capture_result(compiled, namespace, param_input: Any) -> Any:
+    """
+    Run a program once and return the value it assigned to ``result``
+
+    Args:
+        compiled: Compiled program
+        namespace: Prebuilt namespace to clone
+        param_input: Input bound to ``params``
+
+    Returns:
+        The program's ``result``
+
+    Raises:
+        MissingResultError: If the program never assigns ``result``
+    """
+    local_scope = namespace.copy()
+    local_scope["params"] = param_input
+    exec(compiled, local_scope)
+    if "result" not in local_scope:
+        raise MissingResultError("program does not assign `result`")
+    return local_scope["result"]